@@ -4,10 +4,17 @@ Shared eBay API functions for trading cards and luxury items
 import time
 import os
 import re
+import logging
 from typing import TypedDict, Optional
 import requests
 from lib.ebay_oauth import get_oauth_token
 
+logger = logging.getLogger(__name__)
+
+# Shared session for Browse API calls, so they reuse the keep-alive connection
+_SESSION = requests.Session()
+_SESSION.headers.update({"Accept": "application/json"})
+
 
 class EbayItem(TypedDict):
     item_id: str
@@ -26,6 +33,114 @@ class EbayItem(TypedDict):
     image_url: Optional[str]
 
 
+_CERT_RE = re.compile(r'^\d{6,9}$')
+
+
+def _aspect_value(value) -> Optional[str]:
+    """Return an aspect value as a string (eBay sends either a string or a list)."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list) and value:
+        return value[0]
+    return None
+
+
+def _parse_summary(
+    s: dict,
+    seen_ids: set[str]
+) -> Optional[tuple[str, float, float, str, str, str, str]]:
+    """
+    Parse an eBay item summary into its core fields.
+    
+    Args:
+        s: Item summary from the Browse API search response
+        seen_ids: Item IDs already parsed in this search (updated in place)
+    
+    Returns:
+        Tuple of (item_id, price, shipping, currency, title, url, item_href),
+        or None if the summary is a duplicate, has no ID, or is not priced in USD
+    """
+    item_id = s.get("itemId", "")
+    if not item_id or item_id in seen_ids:
+        return None
+    seen_ids.add(item_id)
+
+    price_obj = s.get("price", {})
+    currency = price_obj.get("currency", "")
+    if currency != "USD":
+        return None
+    price = float(price_obj.get("value", 0))
+
+    shipping = 0.0
+    shipping_options = s.get("shippingOptions", [])
+    if shipping_options:
+        shipping_cost = shipping_options[0].get("shippingCost", {})
+        shipping = float(shipping_cost.get("value", 0))
+
+    return (
+        item_id,
+        price,
+        shipping,
+        currency,
+        s.get("title", ""),
+        s.get("itemWebUrl", ""),
+        s.get("itemHref", ""),
+    )
+
+
+def _parse_details(
+    d: dict
+) -> tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    Parse full eBay item details for card metadata.
+    
+    Args:
+        d: Item details from the Browse API get_item response
+    
+    Returns:
+        Tuple of (cert, card_name, year, set_name, seller_username, image_url)
+    """
+    cert_number = None
+    card_name = None
+    year_extracted = None
+    set_name = None
+
+    for aspect in d.get("localizedAspects", []):
+        name = aspect.get("name", "").lower()
+        value = aspect.get("value", "")
+
+        # Look for cert number in aspects
+        if "cert" in name or "psa" in name:
+            cert_val = _aspect_value(value)
+            if cert_val is not None:
+                cert_val = str(cert_val).strip()
+                if _CERT_RE.match(cert_val):
+                    cert_number = cert_val
+
+        # Extract card metadata
+        if "card name" in name:
+            card_name = _aspect_value(value)
+        elif "year" in name:
+            year_extracted = _aspect_value(value)
+        elif "set" in name:
+            set_name = _aspect_value(value)
+
+    # Also check condition descriptors for cert
+    if not cert_number:
+        for descriptor in d.get("conditionDescriptors", []):
+            values = descriptor.get("values", [])
+            if values and "cert" in descriptor.get("name", "").lower():
+                cert_val = values[0].get("content", "") if isinstance(values[0], dict) else values[0]
+                cert_val = str(cert_val).strip()
+                if _CERT_RE.match(cert_val):
+                    cert_number = cert_val
+
+    seller_username = d.get("seller", {}).get("username")
+    image_url = d.get("image", {}).get("imageUrl")
+
+    return cert_number, card_name, year_extracted, set_name, seller_username, image_url
+
+
 def search_trading_cards(
     limit: int,
     env: dict[str, str],
@@ -74,39 +189,26 @@ def search_trading_cards(
     max_retries = 2
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = _SESSION.get(url, headers=headers, params=params, timeout=30)
 
             if response.status_code == 401:
-                print(f"eBay API Authentication Error (401):")
-                print(f"  Please regenerate your eBay User Access Token at:")
-                print(f"  https://developer.ebay.com/my/keys")
+                logger.warning(
+                    "eBay API Authentication Error (401): please regenerate your eBay "
+                    "User Access Token at https://developer.ebay.com/my/keys"
+                )
                 response.raise_for_status()
 
             response.raise_for_status()
             data = response.json()
 
             for summary in data.get("itemSummaries", []):
-                item_id = summary.get("itemId", "")
-                if not item_id or item_id in seen_ids:
-                    continue
-                seen_ids.add(item_id)
-
-                price_obj = summary.get("price", {})
-                price = float(price_obj.get("value", 0))
-                currency = price_obj.get("currency", "")
-
-                if currency != "USD":
+                parsed = _parse_summary(summary, seen_ids)
+                if parsed is None:
                     continue
-
-                shipping = 0.0
-                shipping_options = summary.get("shippingOptions", [])
-                if shipping_options:
-                    first_option = shipping_options[0]
-                    shipping_cost = first_option.get("shippingCost", {})
-                    shipping = float(shipping_cost.get("value", 0))
+                item_id, price, shipping, currency, title, web_url, item_href = parsed
 
                 # Check for 1st Edition in summary
-                title_lower = summary.get("title", "").lower()
+                title_lower = title.lower()
                 is_1st_edition = "1st" in title_lower or "first edition" in title_lower
 
                 if not is_1st_edition:
@@ -122,37 +224,12 @@ def search_trading_cards(
                 image_url = None
 
                 try:
-                    item_url = summary.get("itemHref", "")
-                    if item_url:
-                        item_response = requests.get(item_url, headers=headers, timeout=30)
+                    if item_href:
+                        item_response = _SESSION.get(item_href, headers=headers, timeout=30)
                         if item_response.status_code == 200:
                             item_data = item_response.json()
-
-                            image_url = item_data.get("image", {}).get("imageUrl")
-
-                            # Extract metadata
-                            for aspect in item_data.get("localizedAspects", []):
-                                name = aspect.get("name", "")
-                                value = aspect.get("value", "")
-                                if "card name" in name.lower():
-                                    card_name = value if isinstance(value, str) else (value[0] if isinstance(value, list) and value else None)
-                                elif "year" in name.lower():
-                                    year_extracted = value if isinstance(value, str) else (value[0] if isinstance(value, list) and value else None)
-                                elif "set" in name.lower():
-                                    set_name = value if isinstance(value, str) else (value[0] if isinstance(value, list) and value else None)
-
-                            # Get cert number
-                            for descriptor in item_data.get("conditionDescriptors", []):
-                                name = descriptor.get("name", "")
-                                values = descriptor.get("values", [])
-                                if "certification" in name.lower() or "cert" in name.lower():
-                                    if values:
-                                        cert_value = values[0].get("content", "") if isinstance(values[0], dict) else str(values[0])
-                                        if cert_value:
-                                            cert_number = cert_value
-
-                            seller = item_data.get("seller", {})
-                            seller_username = seller.get("username")
+                            (cert_number, card_name, year_extracted, set_name,
+                             seller_username, image_url) = _parse_details(item_data)
                             item_condition = item_data.get("condition", "")
 
                 except Exception:
@@ -160,8 +237,8 @@ def search_trading_cards(
 
                 item: EbayItem = {
                     "item_id": item_id,
-                    "title": summary.get("title", ""),
-                    "url": summary.get("itemWebUrl", ""),
+                    "title": title,
+                    "url": web_url,
                     "price": price,
                     "shipping": shipping,
                     "currency": currency,
@@ -235,8 +312,8 @@ def _save_token_to_env_local(token: str) -> None:
         with open(env_path, "w") as f:
             f.writelines(updated_lines)
     except Exception as e:
-        print(f"[WARNING] Could not save token to .env.local: {e}")
-        print(f"[WARNING] Token will work for this session but may need to be regenerated next time")
+        logger.warning("Could not save token to .env.local: %s", e)
+        logger.warning("Token will work for this session but may need to be regenerated next time")
 
 
 def get_ebay_item_details(item_id: str, env: dict[str, str]) -> Optional[dict]:
@@ -268,7 +345,7 @@ def get_ebay_item_details(item_id: str, env: dict[str, str]) -> Optional[dict]:
     headers = {"Authorization": f"Bearer {oauth_token}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        response = _SESSION.get(url, headers=headers, timeout=30)
         if response.status_code == 200:
             return response.json()
         return None
@@ -317,7 +394,7 @@ def search_ebay_generic(
             env['EBAY_OAUTH'] = new_token
             # Automatically save to .env.local
             _save_token_to_env_local(new_token)
-            print(f"[INFO] ✅ Auto-generated and saved fresh eBay OAuth token (expires in ~2 hours)")
+            logger.info("Auto-generated and saved fresh eBay OAuth token (expires in ~2 hours)")
         elif not oauth_token:
             raise ValueError("Unable to generate eBay OAuth token. Please check EBAY_CLIENT_ID and EBAY_CLIENT_SECRET")
     elif not oauth_token:
@@ -344,12 +421,12 @@ def search_ebay_generic(
     max_retries = 2
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = _SESSION.get(url, headers=headers, params=params, timeout=30)
 
             if response.status_code == 401:
                 # Token expired - automatically refresh if we have credentials
                 if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET') and attempt == 0:
-                    print(f"[INFO] Token expired (401), auto-refreshing...")
+                    logger.info("Token expired (401), auto-refreshing...")
                     new_token = get_oauth_token(
                         client_id=env.get('EBAY_CLIENT_ID'),
                         client_secret=env.get('EBAY_CLIENT_SECRET'),
@@ -361,56 +438,43 @@ def search_ebay_generic(
                         env['EBAY_OAUTH'] = new_token  # Update for future calls
                         _save_token_to_env_local(new_token)  # Save to file
                         # Retry the request with new token
-                        response = requests.get(url, headers=headers, params=params, timeout=30)
+                        response = _SESSION.get(url, headers=headers, params=params, timeout=30)
                         if response.status_code == 200:
-                            print(f"[INFO] ✅ Token auto-refreshed and saved successfully")
+                            logger.info("Token auto-refreshed and saved successfully")
                         elif response.status_code == 401:
-                            print(f"eBay API Authentication Error (401) even after refresh:")
-                            print(f"  Please check your credentials")
+                            logger.warning(
+                                "eBay API Authentication Error (401) even after refresh: "
+                                "please check your credentials"
+                            )
                             response.raise_for_status()
                     else:
-                        print(f"eBay API Authentication Error (401):")
-                        print(f"  Auto-refresh failed. Please check EBAY_CLIENT_ID and EBAY_CLIENT_SECRET")
+                        logger.warning(
+                            "eBay API Authentication Error (401): auto-refresh failed. "
+                            "Please check EBAY_CLIENT_ID and EBAY_CLIENT_SECRET"
+                        )
                         response.raise_for_status()
                 else:
-                    print(f"eBay API Authentication Error (401):")
                     if not (env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET')):
-                        print(f"  Token expired. Add EBAY_CLIENT_ID and EBAY_CLIENT_SECRET to .env.local")
-                        print(f"  for automatic token refresh")
+                        logger.warning(
+                            "eBay API Authentication Error (401): token expired. Add "
+                            "EBAY_CLIENT_ID and EBAY_CLIENT_SECRET to .env.local for "
+                            "automatic token refresh"
+                        )
+                    else:
+                        logger.warning("eBay API Authentication Error (401)")
                     response.raise_for_status()
 
             response.raise_for_status()
             data = response.json()
 
             for summary in data.get("itemSummaries", []):
-                item_id = summary.get("itemId", "")
-                if not item_id or item_id in seen_ids:
+                parsed = _parse_summary(summary, seen_ids)
+                if parsed is None:
                     continue
-                seen_ids.add(item_id)
-
-                price_obj = summary.get("price", {})
-                price = float(price_obj.get("value", 0))
-                currency = price_obj.get("currency", "")
+                item_id, price, shipping, currency, title, web_url, _ = parsed
 
-                if currency != "USD":
-                    continue
-
-                shipping = 0.0
-                shipping_options = summary.get("shippingOptions", [])
-                if shipping_options:
-                    first_option = shipping_options[0]
-                    shipping_cost = first_option.get("shippingCost", {})
-                    shipping = float(shipping_cost.get("value", 0))
-
-                image_url = None
-                item_condition = None
-                
-                # Try to get image from summary
-                image = summary.get("image", {})
-                if image:
-                    image_url = image.get("imageUrl")
-                
-                # Get condition from summary
+                # Image and condition from summary
+                image_url = summary.get("image", {}).get("imageUrl")
                 item_condition = summary.get("condition", "")
                 
                 # Fetch full item details to get cert number and aspects
@@ -424,46 +488,14 @@ def search_ebay_generic(
                 try:
                     item_details = get_ebay_item_details(item_id, env)
                     if item_details:
-                        # Extract aspects
-                        for aspect in item_details.get("localizedAspects", []):
-                            aspect_name = aspect.get("name", "")
-                            aspect_value = aspect.get("value", "")
-                            aspects_dict[aspect_name] = aspect_value
-                            
-                            # Look for cert number in aspects
-                            if any(keyword in aspect_name.lower() for keyword in ['cert', 'certification', 'psa']):
-                                if isinstance(aspect_value, str) and re.match(r'^\d{6,9}$', aspect_value.strip()):
-                                    cert_number = aspect_value.strip()
-                                elif isinstance(aspect_value, list) and aspect_value:
-                                    cert_val = str(aspect_value[0]).strip()
-                                    if re.match(r'^\d{6,9}$', cert_val):
-                                        cert_number = cert_val
-                            
-                            # Extract card metadata
-                            if "card name" in aspect_name.lower():
-                                card_name = aspect_value if isinstance(aspect_value, str) else (aspect_value[0] if isinstance(aspect_value, list) and aspect_value else None)
-                            elif "year" in aspect_name.lower():
-                                year_extracted = aspect_value if isinstance(aspect_value, str) else (aspect_value[0] if isinstance(aspect_value, list) and aspect_value else None)
-                            elif "set" in aspect_name.lower() or "set name" in aspect_name.lower():
-                                set_name = aspect_value if isinstance(aspect_value, str) else (aspect_value[0] if isinstance(aspect_value, list) and aspect_value else None)
-                        
-                        # Also check condition descriptors for cert
-                        if not cert_number:
-                            for descriptor in item_details.get("conditionDescriptors", []):
-                                desc_name = descriptor.get("name", "")
-                                desc_values = descriptor.get("values", [])
-                                if any(keyword in desc_name.lower() for keyword in ['cert', 'certification']):
-                                    if desc_values:
-                                        cert_val = desc_values[0].get("content", "") if isinstance(desc_values[0], dict) else str(desc_values[0])
-                                        if cert_val and re.match(r'^\d{6,9}$', str(cert_val).strip()):
-                                            cert_number = str(cert_val).strip()
-                        
-                        # Get seller info
-                        seller = item_details.get("seller", {})
-                        seller_username = seller.get("username")
+                        aspects_dict = {
+                            aspect.get("name", ""): aspect.get("value", "")
+                            for aspect in item_details.get("localizedAspects", [])
+                        }
+                        (cert_number, card_name, year_extracted, set_name,
+                         seller_username, detail_image) = _parse_details(item_details)
                         
                         # Update image if available in details
-                        detail_image = item_details.get("image", {}).get("imageUrl")
                         if detail_image:
                             image_url = detail_image
                 except Exception as e:
@@ -472,8 +504,8 @@ def search_ebay_generic(
 
                 item: EbayItem = {
                     "item_id": item_id,
-                    "title": summary.get("title", ""),
-                    "url": summary.get("itemWebUrl", ""),
+                    "title": title,
+                    "url": web_url,
                     "price": price,
                     "shipping": shipping,
                     "currency": currency,
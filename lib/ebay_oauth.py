@@ -4,10 +4,84 @@ Automatically generate and refresh eBay OAuth tokens
 """
 import os
 import base64
-import requests
+import functools
+import logging
+import threading
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlencode, quote
+import orjson
 from dotenv import load_dotenv
+from lib.http_session import create_session
+
+logger = logging.getLogger(__name__)
+
+# Pooled session so token requests reuse the TLS connection to eBay.
+# POSTs are retried only on 429 and connection errors, where eBay never ran the request:
+# an authorization code is single-use, so re-sending it after a timeout or 5xx would fail with invalid_grant.
+_SESSION = create_session(
+    allowed_methods=("GET", "POST"),
+    status_forcelist=(429,),
+    read_retries=0,
+)
+
+# Token and user-consent endpoints per environment
+_TOKEN_URLS = {
+    "production": "https://api.ebay.com/identity/v1/oauth2/token",
+    "sandbox": "https://api.sandbox.ebay.com/identity/v1/oauth2/token",
+}
+_AUTH_URLS = {
+    "production": "https://auth.ebay.com/oauth2/authorize",
+    "sandbox": "https://auth.sandbox.ebay.com/oauth2/authorize",
+}
+
+# Refresh cached tokens this many seconds before eBay says they expire
+_TOKEN_EXPIRY_MARGIN = 60
+
+# (client_id, environment) -> (access_token, monotonic expiry time)
+_TOKEN_CACHE: Dict[Tuple[str, str], Tuple[str, float]] = {}
+# Held while fetching a new token so concurrent callers share one refresh
+_REFRESH_LOCK = threading.Lock()
+
+# OAuth 2.0 Client Credentials Grant scope formats, in order of preference
+_SCOPE_OPTIONS = (
+    "https://api.ebay.com/oauth/api_scope/buy.browse",  # Full scope URL
+    "buy.browse",  # Short format
+    "https://api.ebay.com/oauth/api_scope",  # Base scope
+)
+
+# (client_id, environment) -> scope format that last produced a token for that app
+_WORKING_SCOPE: Dict[Tuple[str, str], str] = {}
+
+_DOTENV_LOADED = False
+_DOTENV_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def _basic_auth_header(client_id: str, client_secret: str) -> str:
+    """Build the Basic Auth header value (base64 encoded client_id:client_secret)."""
+    credentials = f"{client_id}:{client_secret}"
+    return f"Basic {base64.b64encode(credentials.encode()).decode()}"
+
+
+@functools.lru_cache(maxsize=8)
+def _token_request_headers(client_id: str, client_secret: str) -> Dict[str, str]:
+    """Headers for token endpoint requests, built once per set of credentials."""
+    return {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Authorization": _basic_auth_header(client_id, client_secret),
+    }
+
+
+def _ensure_dotenv() -> None:
+    """Load .env.local into the process environment once."""
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    with _DOTENV_LOCK:
+        if not _DOTENV_LOADED:
+            load_dotenv(".env.local")
+            _DOTENV_LOADED = True
 
 
 def get_oauth_token(
@@ -29,101 +103,219 @@ def get_oauth_token(
     Returns:
         Access token string, or None if failed
     """
-    # Load from env if not provided
+    token_data = _request_client_credentials_token(client_id, client_secret, environment)
+    if not token_data:
+        return None
+    return token_data[0]
+
+
+def get_cached_oauth_token(
+    client_id: Optional[str] = None,
+    client_secret: Optional[str] = None,
+    environment: str = "production",
+    stale_token: Optional[str] = None
+) -> Optional[str]:
+    """
+    Get an eBay OAuth access token, reusing a cached token until it expires.
+    
+    Tokens are cached in-process per (client_id, environment) and refreshed
+    shortly before the expiry reported by eBay (usually 7200 seconds).
+    Refreshes are serialized, so threads that find the token expired at the
+    same time trigger a single token request.
+    
+    Args:
+        client_id: eBay App ID (Client ID). If None, reads from EBAY_CLIENT_ID env var
+        client_secret: eBay Cert ID (Client Secret). If None, reads from EBAY_CLIENT_SECRET env var
+        environment: "production" or "sandbox"
+        stale_token: Token eBay just rejected (e.g. with a 401); it will not be
+            returned again, but a newer token fetched by another thread will be
+        
+    Returns:
+        Access token string, or None if failed
+    """
     if not client_id:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_id = os.getenv("EBAY_CLIENT_ID", "")
     
-    if not client_secret:
-        load_dotenv(".env.local")
-        client_secret = os.getenv("EBAY_CLIENT_SECRET", "")
+    key = (client_id, environment.lower())
     
-    if not client_id or not client_secret:
-        print("[ERROR] EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required")
-        print("Get them from: https://developer.ebay.com/my/keys")
-        return None
+    token = _get_fresh_cached_token(key, stale_token)
+    if token:
+        return token
     
-    # Choose endpoint based on environment
-    if environment.lower() == "sandbox":
-        token_url = "https://api.sandbox.ebay.com/identity/v1/oauth2/token"
-    else:
-        token_url = "https://api.ebay.com/identity/v1/oauth2/token"
-    
-    # Create Basic Auth header (base64 encoded client_id:client_secret)
-    credentials = f"{client_id}:{client_secret}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
+    with _REFRESH_LOCK:
+        # Another thread may have refreshed while we waited for the lock
+        token = _get_fresh_cached_token(key, stale_token)
+        if token:
+            return token
+        
+        token_data = _request_client_credentials_token(client_id, client_secret, environment)
+        if not token_data or not token_data[0]:
+            return None
+        
+        access_token, expires_in = token_data
+        _TOKEN_CACHE[key] = (access_token, time.monotonic() + expires_in)
+        return access_token
+
+
+def peek_cached_oauth_token(
+    client_id: str,
+    environment: str = "production",
+    stale_token: Optional[str] = None
+) -> Optional[str]:
+    """
+    Return the in-process cached token if it is still fresh, without ever requesting one.
     
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Authorization": f"Basic {encoded_credentials}"
-    }
+    Cheap enough to call before taking a lock (or hopping to a thread) around get_cached_oauth_token.
     
-    # OAuth 2.0 Client Credentials Grant
-    # Try different scope formats
-    scope_options = [
-        "https://api.ebay.com/oauth/api_scope/buy.browse",  # Full scope URL
-        "buy.browse",  # Short format
-        "https://api.ebay.com/oauth/api_scope",  # Base scope
-    ]
-    
-    # Try each scope format
-    for scope in scope_options:
-        data = {
-            "grant_type": "client_credentials",
-            "scope": scope
-        }
+    Args:
+        client_id: eBay App ID (Client ID)
+        environment: "production" or "sandbox"
+        stale_token: Token eBay just rejected; never returned
         
-        try:
-            print(f"[DEBUG] Trying scope: {scope}")
-            response = requests.post(token_url, headers=headers, data=data, timeout=30)
-            
-            if response.status_code == 200:
-                token_data = response.json()
-                access_token = token_data.get("access_token")
-                expires_in = token_data.get("expires_in", 7200)
-                
-                print(f"[SUCCESS] OAuth token obtained with scope: {scope}")
-                print(f"[SUCCESS] Token expires in {expires_in} seconds")
-                return access_token
-            elif response.status_code == 400:
-                error_data = response.json()
-                error_msg = error_data.get("error_description", "")
-                if "scope" in error_msg.lower():
-                    print(f"[DEBUG] Scope '{scope}' rejected: {error_msg}")
-                    continue  # Try next scope
-                else:
-                    print(f"[ERROR] Failed: {error_msg}")
-                    return None
-            else:
-                print(f"[ERROR] Status {response.status_code}: {response.text[:200]}")
-                return None
-        except Exception as e:
-            print(f"[ERROR] Exception: {e}")
-            continue
+    Returns:
+        Access token string, or None if there is no fresh cached token
+    """
+    return _get_fresh_cached_token((client_id, environment.lower()), stale_token)
+
+
+def _get_fresh_cached_token(key: Tuple[str, str], stale_token: Optional[str]) -> Optional[str]:
+    """Return the cached token for key if it is not expired and not the stale token."""
+    cached = _TOKEN_CACHE.get(key)
+    if not cached or cached[0] == stale_token:
+        return None
+    if cached[1] - _TOKEN_EXPIRY_MARGIN <= time.monotonic():
+        return None
+    return cached[0]
+
+
+def _post_token(
+    data: Dict[str, str],
+    client_id: str,
+    client_secret: str,
+    environment: str
+) -> Optional[Dict]:
+    """
+    POST a grant request to eBay's token endpoint.
     
-    # If all scopes failed, return None
-    print("[ERROR] All scope formats failed. Your app may need to be configured with OAuth scopes in eBay Developer Portal.")
-    return None
+    Args:
+        data: Form fields for the grant (grant_type, scope, code, ...)
+        client_id: eBay App ID
+        client_secret: eBay Cert ID
+        environment: "production" or "sandbox"
+        
+    Returns:
+        Parsed token response, an empty dict if eBay rejected the requested scope,
+        or None if the request failed
+    """
+    token_url = _TOKEN_URLS.get(environment.lower(), _TOKEN_URLS["production"])
+    headers = _token_request_headers(client_id, client_secret)
     
     try:
-        print(f"[DEBUG] Requesting OAuth token from {token_url}...")
-        response = requests.post(token_url, headers=headers, data=data, timeout=30)
+        response = _SESSION.post(token_url, headers=headers, data=data, timeout=30)
+        body = response.content
         
         if response.status_code == 200:
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            expires_in = token_data.get("expires_in", 7200)  # Default 2 hours
-            
-            print(f"[SUCCESS] OAuth token obtained! Expires in {expires_in} seconds")
-            return access_token
+            return orjson.loads(body)
+        elif response.status_code == 400:
+            error_msg = orjson.loads(body).get("error_description", "")
+            if "scope" in error_msg.lower():
+                logger.debug("Scope '%s' rejected: %s", data.get("scope"), error_msg)
+                return {}
+            else:
+                logger.error("%s grant failed: %s", data["grant_type"], error_msg)
         else:
-            print(f"[ERROR] Failed to get OAuth token: {response.status_code}")
-            print(f"Response: {response.text[:500]}")
-            return None
-            
+            logger.error(
+                "%s grant failed: %s\nResponse: %s",
+                data["grant_type"], response.status_code, body[:200].decode("utf-8", "replace")
+            )
     except Exception as e:
-        print(f"[ERROR] Exception getting OAuth token: {e}")
+        logger.error("Exception requesting %s token: %s", data["grant_type"], e)
+    
+    return None
+
+
+def _request_token_with_scope(
+    scope: str,
+    client_id: str,
+    client_secret: str,
+    environment: str
+) -> Optional[Tuple[str, int]]:
+    """
+    Request a Client Credentials token for a single scope format.
+    
+    Returns:
+        Tuple of (access_token, expires_in seconds), an empty tuple if eBay rejected
+        this scope format, or None if the request failed
+    """
+    logger.debug("Trying scope: %s", scope)
+    token_data = _post_token(
+        {"grant_type": "client_credentials", "scope": scope},
+        client_id, client_secret, environment
+    )
+    if token_data is None:
         return None
+    if not token_data:
+        return ()
+    
+    access_token = token_data.get("access_token")
+    expires_in = token_data.get("expires_in", 7200)
+    if not access_token:
+        logger.error("No access_token in response for scope: %s", scope)
+        return None
+    
+    logger.info("OAuth token obtained with scope: %s (expires in %s seconds)", scope, expires_in)
+    return access_token, int(expires_in)
+
+
+def _request_client_credentials_token(
+    client_id: Optional[str],
+    client_secret: Optional[str],
+    environment: str
+) -> Optional[Tuple[str, int]]:
+    """
+    Request a new Client Credentials token from eBay.
+    
+    Returns:
+        Tuple of (access_token, expires_in seconds), or None if failed
+    """
+    # Load from env if not provided
+    if not client_id:
+        _ensure_dotenv()
+        client_id = os.getenv("EBAY_CLIENT_ID", "")
+    
+    if not client_secret:
+        _ensure_dotenv()
+        client_secret = os.getenv("EBAY_CLIENT_SECRET", "")
+    
+    if not client_id or not client_secret:
+        logger.error("EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required (get them from https://developer.ebay.com/my/keys)")
+        return None
+    
+    # Once a scope format has worked, it keeps working for this app
+    key = (client_id, environment.lower())
+    working_scope = _WORKING_SCOPE.get(key)
+    if working_scope:
+        token = _request_token_with_scope(working_scope, client_id, client_secret, environment)
+        if token != ():
+            return token
+        _WORKING_SCOPE.pop(key, None)
+    
+    # Otherwise try each scope format in order of preference, moving on only when eBay rejects the scope
+    for scope in _SCOPE_OPTIONS:
+        if scope == working_scope:
+            continue
+        token = _request_token_with_scope(scope, client_id, client_secret, environment)
+        if token is None:
+            # Not a scope problem (e.g. bad credentials); other formats would fail the same way
+            return None
+        if token:
+            _WORKING_SCOPE[key] = scope
+            return token
+    
+    # If all scopes failed, return None
+    logger.error("All scope formats failed. Your app may need to be configured with OAuth scopes in eBay Developer Portal.")
+    return None
 
 
 def refresh_oauth_token(
@@ -146,52 +338,25 @@ def refresh_oauth_token(
     """
     # Load from env if not provided
     if not client_id:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_id = os.getenv("EBAY_CLIENT_ID", "")
     
     if not client_secret:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_secret = os.getenv("EBAY_CLIENT_SECRET", "")
     
     if not client_id or not client_secret:
-        print("[ERROR] EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required")
+        logger.error("EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required")
         return None
     
-    # Choose endpoint
-    if environment.lower() == "sandbox":
-        token_url = "https://api.sandbox.ebay.com/identity/v1/oauth2/token"
-    else:
-        token_url = "https://api.ebay.com/identity/v1/oauth2/token"
-    
-    # Create Basic Auth header
-    credentials = f"{client_id}:{client_secret}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
-    
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Authorization": f"Basic {encoded_credentials}"
-    }
-    
     data = {
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
         "scope": "https://api.ebay.com/oauth/api_scope/buy.browse"
     }
     
-    try:
-        response = requests.post(token_url, headers=headers, data=data, timeout=30)
-        
-        if response.status_code == 200:
-            token_data = response.json()
-            return token_data.get("access_token")
-        else:
-            print(f"[ERROR] Failed to refresh token: {response.status_code}")
-            print(f"Response: {response.text[:500]}")
-            return None
-            
-    except Exception as e:
-        print(f"[ERROR] Exception refreshing token: {e}")
-        return None
+    token_data = _post_token(data, client_id, client_secret, environment)
+    return token_data.get("access_token") if token_data else None
 
 
 def get_authorization_url(
@@ -213,18 +378,19 @@ def get_authorization_url(
         Authorization URL
     """
     if not client_id:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_id = os.getenv("EBAY_CLIENT_ID", "")
     
     if not client_id:
         raise ValueError("EBAY_CLIENT_ID is required")
     
-    # Choose endpoint
-    if environment.lower() == "sandbox":
-        auth_url = "https://auth.sandbox.ebay.com/oauth2/authorize"
-    else:
-        auth_url = "https://auth.ebay.com/oauth2/authorize"
-    
+    return _build_authorization_url(client_id, redirect_uri, environment.lower())
+
+
+@functools.lru_cache(maxsize=8)
+def _build_authorization_url(client_id: str, redirect_uri: str, environment: str) -> str:
+    """Build the URL-encoded authorization URL, once per (client_id, redirect_uri, environment)."""
+    auth_url = _AUTH_URLS.get(environment, _AUTH_URLS["production"])
     scope = "https://api.ebay.com/oauth/api_scope/buy.browse"
     
     params = {
@@ -234,8 +400,8 @@ def get_authorization_url(
         "scope": scope
     }
     
-    query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-    return f"{auth_url}?{query_string}"
+    # quote (not quote_plus) so spaces become %20 as eBay expects
+    return f"{auth_url}?{urlencode(params, quote_via=quote)}"
 
 
 def exchange_code_for_token(
@@ -259,54 +425,29 @@ def exchange_code_for_token(
         Dict with 'access_token' and 'refresh_token', or None if failed
     """
     if not client_id:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_id = os.getenv("EBAY_CLIENT_ID", "")
     
     if not client_secret:
-        load_dotenv(".env.local")
+        _ensure_dotenv()
         client_secret = os.getenv("EBAY_CLIENT_SECRET", "")
     
     if not client_id or not client_secret:
-        print("[ERROR] EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required")
+        logger.error("EBAY_CLIENT_ID and EBAY_CLIENT_SECRET are required")
         return None
     
-    # Choose endpoint
-    if environment.lower() == "sandbox":
-        token_url = "https://api.sandbox.ebay.com/identity/v1/oauth2/token"
-    else:
-        token_url = "https://api.ebay.com/identity/v1/oauth2/token"
-    
-    # Create Basic Auth header
-    credentials = f"{client_id}:{client_secret}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
-    
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Authorization": f"Basic {encoded_credentials}"
-    }
-    
     data = {
         "grant_type": "authorization_code",
         "code": authorization_code,
         "redirect_uri": redirect_uri
     }
     
-    try:
-        response = requests.post(token_url, headers=headers, data=data, timeout=30)
-        
-        if response.status_code == 200:
-            token_data = response.json()
-            return {
-                "access_token": token_data.get("access_token"),
-                "refresh_token": token_data.get("refresh_token"),
-                "expires_in": token_data.get("expires_in", 7200)
-            }
-        else:
-            print(f"[ERROR] Failed to exchange code: {response.status_code}")
-            print(f"Response: {response.text[:500]}")
-            return None
-            
-    except Exception as e:
-        print(f"[ERROR] Exception exchanging code: {e}")
+    token_data = _post_token(data, client_id, client_secret, environment)
+    if not token_data:
         return None
+    return {
+        "access_token": token_data.get("access_token"),
+        "refresh_token": token_data.get("refresh_token"),
+        "expires_in": token_data.get("expires_in", 7200)
+    }
 
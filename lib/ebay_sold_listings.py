@@ -4,10 +4,81 @@ Search for sold/completed listings to get market reference prices.
 Note: eBay Browse API doesn't directly support sold listings.
 This module uses active listings as a proxy, or can be extended for Marketplace Insights API.
 """
+import array
+import logging
+import os
+import threading
 import time
-from typing import TypedDict, Optional
-import requests
-from lib.ebay_oauth import get_oauth_token
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, Optional, Union
+import msgspec
+import numpy as np
+from lib.ebay_oauth import get_cached_oauth_token
+from lib.file_cache import atomic_write
+from lib.http_session import create_session
+
+logger = logging.getLogger(__name__)
+
+# Pooled session so repeated searches reuse the TLS connection to api.ebay.com.
+# Searches are rate limited, so allow one more retry with a longer backoff.
+_SESSION = create_session(total_retries=3, backoff_factor=0.5, allowed_methods=("GET",))
+
+# Market price cache: (normalized query, limit) -> (average price, monotonic expiry time)
+_PRICE_CACHE_TTL = 3600
+_PRICE_CACHE_MAXSIZE = 1024
+_PRICE_CACHE: dict[tuple[str, int], tuple[Optional[float], float]] = {}
+_PRICE_CACHE_LOCK = threading.Lock()
+
+# Serializes our .env.local rewrites (the file is re-read each time, so other edits are kept)
+_ENV_LOCAL_PATH = ".env.local"
+_ENV_FILE_LOCK = threading.Lock()
+
+
+# Typed schema for the fields we read; msgspec skips everything else while decoding.
+# Fields are nullable (and amounts may be numbers) so odd items still decode.
+class _Amount(msgspec.Struct):
+    value: Union[str, float, None] = None
+    currency: Optional[str] = ""
+
+
+class _ShippingOption(msgspec.Struct):
+    shippingCost: Optional[_Amount] = None
+
+
+class _Summary(msgspec.Struct):
+    itemId: Optional[str] = ""
+    title: Optional[str] = ""
+    price: Optional[_Amount] = None
+    shippingOptions: Optional[list[_ShippingOption]] = None
+    itemWebUrl: Optional[str] = ""
+
+
+class _SearchResponse(msgspec.Struct):
+    itemSummaries: Optional[list[_Summary]] = None
+
+
+_SEARCH_DECODER = msgspec.json.Decoder(_SearchResponse)
+
+
+def _decode_summaries(content: bytes) -> list[tuple]:
+    """
+    Decode a Browse API search response into summary tuples.
+    
+    Returns:
+        List of (item_id, title, currency, price, shipping_cost, url) tuples; missing amounts are None
+    """
+    summaries = []
+    for s in _SEARCH_DECODER.decode(content).itemSummaries or ():
+        shipping_cost = s.shippingOptions[0].shippingCost if s.shippingOptions else None
+        summaries.append((
+            s.itemId,
+            s.title,
+            s.price.currency if s.price else "",
+            s.price.value if s.price else None,
+            shipping_cost.value if shipping_cost else None,
+            s.itemWebUrl,
+        ))
+    return summaries
 
 
 class SoldListingResult(TypedDict):
@@ -19,28 +90,90 @@ class SoldListingResult(TypedDict):
     listings: list[dict]
 
 
+def _load_env_local() -> dict[str, str]:
+    """Parse the current contents of .env.local (caller holds _ENV_FILE_LOCK)."""
+    env_vars = {}
+    if os.path.exists(_ENV_LOCAL_PATH):
+        with open(_ENV_LOCAL_PATH, 'r') as f:
+            for line in f:
+                key, sep, value = line.partition('=')
+                key = key.strip()
+                if sep and key and not key.startswith('#'):
+                    env_vars[key] = value.strip()
+    return env_vars
+
+
 def _save_token_to_env_local(token: str):
     """Save token to .env.local file"""
-    import os
-    env_local_path = ".env.local"
+    with _ENV_FILE_LOCK:
+        env_vars = _load_env_local()
+        env_vars['EBAY_OAUTH'] = token
+        
+        atomic_write(_ENV_LOCAL_PATH, "".join(f"{key}={value}\n" for key, value in env_vars.items()).encode())
+
+
+def _build_result(content: bytes) -> SoldListingResult:
+    """
+    Build listings and price statistics from a raw Browse API search response.
     
-    # Read existing .env.local if it exists
-    env_vars = {}
-    if os.path.exists(env_local_path):
-        with open(env_local_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    env_vars[key.strip()] = value.strip()
+    Args:
+        content: Response body bytes
     
-    # Update EBAY_OAUTH
-    env_vars['EBAY_OAUTH'] = token
+    Returns:
+        SoldListingResult with price statistics and listings
+    """
+    listings = []
+    # Total costs kept in a flat double array so stats skip the listing dicts
+    total_costs = array.array('d')
+    
+    for item_id, title, currency, price_value, shipping_value, item_url in _decode_summaries(content):
+        # The Browse API filter can't exclude other currencies (priceCurrency only scopes price ranges)
+        if currency != "USD":
+            continue
+        
+        price = float(price_value or 0)
+        if price <= 0:
+            continue
+        
+        shipping = float(shipping_value or 0)
+        total_cost = price + shipping
+        listing = {
+            "item_id": item_id,
+            "title": title,
+            "price": price,
+            "shipping": shipping,
+            "total_cost": total_cost,
+            "url": item_url,
+        }
+        listings.append(listing)
+        total_costs.append(total_cost)
     
-    # Write back to file
-    with open(env_local_path, 'w') as f:
-        for key, value in env_vars.items():
-            f.write(f"{key}={value}\n")
+    # Calculate statistics
+    if not listings:
+        return {
+            "average_price": None,
+            "min_price": None,
+            "max_price": None,
+            "median_price": None,
+            "count": 0,
+            "listings": []
+        }
+    
+    prices = np.frombuffer(total_costs, dtype=np.float64)
+    
+    average_price = float(prices.mean())
+    min_price = float(prices.min())
+    max_price = float(prices.max())
+    median_price = float(np.median(prices))
+    
+    return {
+        "average_price": average_price,
+        "min_price": min_price,
+        "max_price": max_price,
+        "median_price": median_price,
+        "count": len(listings),
+        "listings": listings
+    }
 
 
 def search_sold_listings(
@@ -69,18 +202,19 @@ def search_sold_listings(
     # Get or automatically generate token
     oauth_token = env.get('EBAY_OAUTH', '')
     
-    # If we have Client ID and Secret, always generate a fresh token
+    # If we have Client ID and Secret, use a cached token (refreshed when it expires)
     if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET'):
-        new_token = get_oauth_token(
+        new_token = get_cached_oauth_token(
             client_id=env.get('EBAY_CLIENT_ID'),
             client_secret=env.get('EBAY_CLIENT_SECRET'),
             environment='production'
         )
         if new_token:
             oauth_token = new_token
-            env['EBAY_OAUTH'] = new_token
-            _save_token_to_env_local(new_token)
-            print(f"[INFO] ✅ Auto-generated and saved fresh eBay OAuth token")
+            if env.get('EBAY_OAUTH') != new_token:
+                env['EBAY_OAUTH'] = new_token
+                _save_token_to_env_local(new_token)
+                logger.info("Auto-generated and saved fresh eBay OAuth token")
         elif not oauth_token:
             raise ValueError("Unable to generate eBay OAuth token")
     elif not oauth_token:
@@ -92,141 +226,53 @@ def search_sold_listings(
         "q": query,
         "limit": str(min(limit, 200)),  # eBay API max is 200
         "filter": "buyingOptions:{FIXED_PRICE}",  # Only Buy It Now items
+        "fieldgroups": "MATCHING_ITEMS",  # Skip refinements/aspect histograms we never read
     }
     
     if category_ids:
         params["category_ids"] = category_ids
     
-    listings = []
-    max_retries = 2
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            
-            if response.status_code == 401:
-                # Token expired - automatically refresh if we have credentials
-                if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET') and attempt == 0:
-                    print(f"[INFO] Token expired (401), auto-refreshing...")
-                    new_token = get_oauth_token(
-                        client_id=env.get('EBAY_CLIENT_ID'),
-                        client_secret=env.get('EBAY_CLIENT_SECRET'),
-                        environment='production'
-                    )
-                    if new_token:
-                        headers["Authorization"] = f"Bearer {new_token}"
-                        oauth_token = new_token
-                        env['EBAY_OAUTH'] = new_token
-                        _save_token_to_env_local(new_token)
-                        response = requests.get(url, headers=headers, params=params, timeout=30)
-                        if response.status_code == 200:
-                            print(f"[INFO] ✅ Token auto-refreshed")
-                        else:
-                            response.raise_for_status()
-                    else:
-                        response.raise_for_status()
-                else:
-                    print(f"eBay API Authentication Error (401)")
-                    response.raise_for_status()
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            for summary in data.get("itemSummaries", []):
-                price_obj = summary.get("price", {})
-                if price_obj.get("currency") != "USD":
-                    continue
-                
-                price = float(price_obj.get("value", 0))
-                if price <= 0:
-                    continue
-                
-                # Extract shipping cost
-                shipping = 0.0
-                shipping_options = summary.get("shippingOptions", [])
-                if shipping_options:
-                    first_option = shipping_options[0]
-                    shipping_cost = first_option.get("shippingCost", {})
-                    shipping = float(shipping_cost.get("value", 0))
-                
-                listing = {
-                    "item_id": summary.get("itemId", ""),
-                    "title": summary.get("title", ""),
-                    "price": price,
-                    "shipping": shipping,
-                    "total_cost": price + shipping,
-                    "url": summary.get("itemWebUrl", ""),
-                }
-                listings.append(listing)
-            
-            break  # Success, exit retry loop
-            
-        except requests.exceptions.HTTPError as e:
-            if e.response and e.response.status_code in (429, 500, 502, 503, 504):
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) + (0.1 * attempt)
-                    time.sleep(wait_time)
-                    continue
-            raise
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = (2 ** attempt) + (0.1 * attempt)
-                time.sleep(wait_time)
-                continue
-            raise
-    
-    # Calculate statistics
-    if not listings:
-        return {
-            "average_price": None,
-            "min_price": None,
-            "max_price": None,
-            "median_price": None,
-            "count": 0,
-            "listings": []
-        }
-    
-    prices = [listing["total_cost"] for listing in listings]
-    prices_sorted = sorted(prices)
-    
-    average_price = sum(prices) / len(prices)
-    min_price = min(prices)
-    max_price = max(prices)
+    # Transient 429/5xx errors are retried by the session's urllib3 Retry policy
+    response = _SESSION.get(url, headers=headers, params=params, timeout=30)
     
-    # Calculate median
-    n = len(prices_sorted)
-    if n % 2 == 0:
-        median_price = (prices_sorted[n // 2 - 1] + prices_sorted[n // 2]) / 2
-    else:
-        median_price = prices_sorted[n // 2]
+    if response.status_code == 401:
+        # Token expired - automatically refresh if we have credentials
+        if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET'):
+            logger.info("Token expired (401), auto-refreshing...")
+            new_token = get_cached_oauth_token(
+                client_id=env.get('EBAY_CLIENT_ID'),
+                client_secret=env.get('EBAY_CLIENT_SECRET'),
+                environment='production',
+                stale_token=oauth_token
+            )
+            if new_token:
+                headers["Authorization"] = f"Bearer {new_token}"
+                oauth_token = new_token
+                env['EBAY_OAUTH'] = new_token
+                _save_token_to_env_local(new_token)
+                response = _SESSION.get(url, headers=headers, params=params, timeout=30)
+                if response.status_code == 200:
+                    logger.info("Token auto-refreshed")
+        else:
+            logger.error("eBay API Authentication Error (401)")
     
-    return {
-        "average_price": average_price,
-        "min_price": min_price,
-        "max_price": max_price,
-        "median_price": median_price,
-        "count": len(listings),
-        "listings": listings
-    }
+    response.raise_for_status()
+    return _build_result(response.content)
 
 
-def get_market_price_from_sold_listings(
-    watch_info: dict,
-    env: dict[str, str],
-    limit: int = 50
-) -> Optional[float]:
+def _build_watch_query(watch_info: dict) -> Optional[str]:
     """
-    Get market reference price for a watch by searching sold listings.
+    Build a normalized eBay search query from watch metadata.
+    
+    The query is lowercased with whitespace collapsed so that equivalent
+    watches share one cache entry.
     
     Args:
         watch_info: Dictionary with watch metadata (brand, model, etc.)
-        env: Environment variables dict
-        limit: Maximum number of listings to search
     
     Returns:
-        Average market price, or None if not found
+        Normalized query string, or None if there is nothing to search for
     """
-    # Build search query from watch info
     query_parts = []
     
     if watch_info.get("brand"):
@@ -239,21 +285,105 @@ def get_market_price_from_sold_listings(
     
     if not query_parts:
         # Fallback to title if available
-        if watch_info.get("title"):
-            query = watch_info["title"]
-        else:
+        if not watch_info.get("title"):
             return None
-    else:
-        query = " ".join(query_parts)
+        query_parts.append(watch_info["title"])
+    
+    query = " ".join(" ".join(query_parts).lower().split())
+    return query or None
+
+
+def _cached_search(query_key: str, env: dict[str, str], limit: int) -> Optional[float]:
+    """
+    Average market price for a normalized query, cached for _PRICE_CACHE_TTL seconds.
+    """
+    key = (query_key, limit)
+    now = time.monotonic()
+    
+    with _PRICE_CACHE_LOCK:
+        cached = _PRICE_CACHE.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
     
-    # Search for similar watches
     result = search_sold_listings(
-        query=query,
+        query=query_key,
         env=env,
         limit=limit,
         category_ids="260324"  # Watches category
     )
+    average_price = result.get("average_price")
+    
+    with _PRICE_CACHE_LOCK:
+        _PRICE_CACHE.pop(key, None)
+        if len(_PRICE_CACHE) >= _PRICE_CACHE_MAXSIZE:
+            # Evict the oldest entry (dicts keep insertion order)
+            _PRICE_CACHE.pop(next(iter(_PRICE_CACHE)))
+        _PRICE_CACHE[key] = (average_price, now + _PRICE_CACHE_TTL)
     
-    # Return average price if available
-    return result.get("average_price")
+    return average_price
 
+
+def get_market_price_from_sold_listings(
+    watch_info: dict,
+    env: dict[str, str],
+    limit: int = 50
+) -> Optional[float]:
+    """
+    Get market reference price for a watch by searching sold listings.
+    
+    Results are cached per normalized query for an hour, so repeated
+    lookups for the same brand/model don't hit eBay again.
+    
+    Args:
+        watch_info: Dictionary with watch metadata (brand, model, etc.)
+        env: Environment variables dict
+        limit: Maximum number of listings to search
+    
+    Returns:
+        Average market price, or None if not found
+    """
+    query = _build_watch_query(watch_info)
+    if not query:
+        return None
+    
+    return _cached_search(query, env, limit)
+
+
+def get_market_prices_bulk(
+    watch_infos: list[dict],
+    env: dict[str, str],
+    limit: int = 50,
+    max_workers: int = 8
+) -> list[Optional[float]]:
+    """
+    Get market reference prices for many watches concurrently.
+    
+    Args:
+        watch_infos: List of watch metadata dictionaries (brand, model, etc.)
+        env: Environment variables dict
+        limit: Maximum number of listings to search per watch
+        max_workers: Number of concurrent eBay searches (keep <= the session pool size)
+    
+    Returns:
+        Average market prices in the same order as watch_infos (None where not found)
+    """
+    if not watch_infos:
+        return []
+    
+    # Fetch the OAuth token once up front so workers all hit the cache
+    if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET'):
+        get_cached_oauth_token(
+            client_id=env.get('EBAY_CLIENT_ID'),
+            client_secret=env.get('EBAY_CLIENT_SECRET'),
+            environment='production'
+        )
+    
+    def price_one(watch_info: dict) -> Optional[float]:
+        try:
+            return get_market_price_from_sold_listings(watch_info, env, limit)
+        except Exception as e:
+            logger.warning("Market price lookup failed for %s: %s", _build_watch_query(watch_info), e)
+            return None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(price_one, watch_infos))
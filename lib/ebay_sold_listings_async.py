@@ -0,0 +1,177 @@
+"""
+eBay Sold Listings Search (async)
+asyncio/httpx variant of lib.ebay_sold_listings for pricing many watches at once.
+All searches in a batch share one AsyncClient (HTTP/2 keep-alive) and one OAuth token.
+"""
+import asyncio
+import logging
+import weakref
+from typing import Optional
+import httpx
+from lib.ebay_oauth import get_cached_oauth_token, peek_cached_oauth_token
+from lib.ebay_sold_listings import (
+    SoldListingResult,
+    _build_result,
+    _build_watch_query,
+    _save_token_to_env_local,
+)
+from lib.http_session import create_async_client
+
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = "https://api.ebay.com/buy/browse/v1/item_summary/search"
+
+# One token lock per event loop (asyncio locks can't be shared across loops)
+_TOKEN_LOCKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _token_lock() -> asyncio.Lock:
+    """Token lock for the running event loop."""
+    loop = asyncio.get_running_loop()
+    lock = _TOKEN_LOCKS.get(loop)
+    if lock is None:
+        lock = _TOKEN_LOCKS[loop] = asyncio.Lock()
+    return lock
+
+
+async def _get_token(env: dict[str, str], stale_token: Optional[str] = None) -> str:
+    """
+    Get the OAuth token for a search; concurrent searches share a single refresh.
+    
+    Args:
+        env: Environment variables dict with EBAY_OAUTH (or EBAY_CLIENT_ID/SECRET for auto-refresh)
+        stale_token: Token eBay just rejected with a 401
+    
+    Returns:
+        OAuth token string
+    """
+    oauth_token = env.get('EBAY_OAUTH', '')
+    
+    if not (env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET')):
+        if not oauth_token:
+            raise ValueError("EBAY_OAUTH not found. Please set EBAY_OAUTH or add EBAY_CLIENT_ID/SECRET")
+        return oauth_token
+    
+    # Fast path: the cached token is still fresh and already in env, so skip the lock and thread hop
+    if oauth_token and peek_cached_oauth_token(env['EBAY_CLIENT_ID'], 'production', stale_token) == oauth_token:
+        return oauth_token
+    
+    async with _token_lock():
+        # Another task may have replaced the rejected token while we waited
+        current = env.get('EBAY_OAUTH', '')
+        if stale_token and current and current != stale_token:
+            return current
+        if current and peek_cached_oauth_token(env['EBAY_CLIENT_ID'], 'production', stale_token) == current:
+            return current
+        
+        new_token = await asyncio.to_thread(
+            get_cached_oauth_token,
+            client_id=env.get('EBAY_CLIENT_ID'),
+            client_secret=env.get('EBAY_CLIENT_SECRET'),
+            environment='production',
+            stale_token=stale_token
+        )
+        if not new_token:
+            if stale_token or not current:
+                raise ValueError("Unable to generate eBay OAuth token")
+            return current
+        
+        if new_token != current:
+            env['EBAY_OAUTH'] = new_token
+            await asyncio.to_thread(_save_token_to_env_local, new_token)
+            logger.info("Auto-generated and saved fresh eBay OAuth token")
+        return new_token
+
+
+async def search_sold_listings_async(
+    query: str,
+    env: dict[str, str],
+    client: httpx.AsyncClient,
+    limit: int = 50,
+    category_ids: Optional[str] = None
+) -> SoldListingResult:
+    """
+    Async version of search_sold_listings using a shared httpx.AsyncClient.
+    
+    Args:
+        query: Search query string
+        env: Environment variables dict with EBAY_OAUTH (or EBAY_CLIENT_ID/SECRET for auto-refresh)
+        client: Shared AsyncClient (see create_async_client)
+        limit: Maximum number of items to return
+        category_ids: Optional category ID filter (comma-separated)
+    
+    Returns:
+        SoldListingResult with price statistics and listings
+    """
+    oauth_token = await _get_token(env)
+    
+    params = {
+        "q": query,
+        "limit": str(min(limit, 200)),  # eBay API max is 200
+        "filter": "buyingOptions:{FIXED_PRICE}",  # Only Buy It Now items
+        "fieldgroups": "MATCHING_ITEMS",  # Skip refinements/aspect histograms we never read
+    }
+    
+    if category_ids:
+        params["category_ids"] = category_ids
+    
+    response = await client.get(SEARCH_URL, headers={"Authorization": f"Bearer {oauth_token}"}, params=params)
+    
+    if response.status_code == 401:
+        if env.get('EBAY_CLIENT_ID') and env.get('EBAY_CLIENT_SECRET'):
+            logger.info("Token expired (401), auto-refreshing...")
+            oauth_token = await _get_token(env, stale_token=oauth_token)
+            response = await client.get(SEARCH_URL, headers={"Authorization": f"Bearer {oauth_token}"}, params=params)
+        else:
+            logger.error("eBay API Authentication Error (401)")
+    
+    response.raise_for_status()
+    return _build_result(response.content)
+
+
+async def get_market_prices_bulk_async(
+    watch_infos: list[dict],
+    env: dict[str, str],
+    limit: int = 50,
+    client: Optional[httpx.AsyncClient] = None
+) -> list[Optional[float]]:
+    """
+    Get market reference prices for many watches concurrently on one AsyncClient.
+    
+    Args:
+        watch_infos: List of watch metadata dictionaries (brand, model, etc.)
+        env: Environment variables dict
+        limit: Maximum number of listings to search per watch
+        client: Optional shared AsyncClient; a temporary one is created if omitted
+    
+    Returns:
+        Average market prices in the same order as watch_infos (None where not found)
+    """
+    if not watch_infos:
+        return []
+    
+    queries = [_build_watch_query(watch_info) for watch_info in watch_infos]
+    
+    async def price_one(http_client: httpx.AsyncClient, query: Optional[str]) -> Optional[float]:
+        if not query:
+            return None
+        try:
+            result = await search_sold_listings_async(
+                query=query,
+                env=env,
+                client=http_client,
+                limit=limit,
+                category_ids="260324"  # Watches category
+            )
+        except Exception as e:
+            logger.warning("Market price lookup failed for %s: %s", query, e)
+            return None
+        return result.get("average_price")
+    
+    async def run(http_client: httpx.AsyncClient) -> list[Optional[float]]:
+        return list(await asyncio.gather(*(price_one(http_client, query) for query in queries)))
+    
+    if client is not None:
+        return await run(client)
+    async with create_async_client() as http_client:
+        return await run(http_client)
@@ -1,9 +1,12 @@
 """
 Facebook Marketplace API integration using RapidAPI
 """
+import hashlib
+import os
 import time
 import re
 from typing import TypedDict, Optional
+import orjson
 import requests
 
 # Import usage tracker
@@ -16,6 +19,29 @@ except ImportError:
     def print_usage_stats():
         pass
 
+# Set FB_DEBUG=1 to print request/response diagnostics and dump responses to data/
+_FB_DEBUG = os.environ.get("FB_DEBUG") == "1"
+
+# Patterns used when normalizing listings, compiled once at import
+_CERT_RE = re.compile(r'(?:cert|certification|psa)[\s#:]*(\d{6,8})')
+_PSA_GRADE_RE = re.compile(r'psa[\s-]*(\d+)')
+_YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+_SIZE_RE = re.compile(r'\b(?:size|sz)[\s:]*(\d+(?:\.\d+)?)')
+_PRICE_RE = re.compile(r'[\d,]+\.?\d*')
+_FB_URL_ID_RE = re.compile(r'/item/([^/?#]+)')
+
+# Luxury brands detected in titles, mapped to their display names
+_LUX_BRAND_TITLE = {
+    "gucci": "Gucci",
+    "ysl": "YSL",
+    "saint laurent": "Saint Laurent",
+    "louis vuitton": "Louis Vuitton",
+    "prada": "Prada",
+    "chanel": "Chanel",
+    "dior": "Dior",
+}
+_LUX_BRAND_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _LUX_BRAND_TITLE)) + r')\b')
+
 
 class FacebookMarketplaceItem(TypedDict):
     item_id: str
@@ -41,6 +67,10 @@ class FacebookMarketplaceItem(TypedDict):
     set_name: Optional[str]
 
 
+# All FacebookMarketplaceItem keys, pre-sized; normalize_facebook_item copies and fills it
+_EMPTY_FB_ITEM = dict.fromkeys(FacebookMarketplaceItem.__annotations__)
+
+
 def extract_city_from_location(location: str) -> str:
     """Extract city name from location string (e.g., 'Los Angeles, CA' -> 'los angeles')"""
     if not location:
@@ -51,6 +81,15 @@ def extract_city_from_location(location: str) -> str:
     return city
 
 
+def _first(data: dict, *keys: str, default=""):
+    """Return the first non-empty value among keys in data, or default."""
+    for key in keys:
+        value = data.get(key)
+        if value:
+            return value
+    return default
+
+
 def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
     """
     Normalize RapidAPI Facebook Marketplace response to our standard format.
@@ -62,22 +101,12 @@ def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
         Normalized FacebookMarketplaceItem
     """
     # Extract item ID - try multiple possible fields
-    item_id = (
-        item_data.get("id", "") or 
-        item_data.get("itemId", "") or 
-        item_data.get("item_id", "") or
-        item_data.get("listing_id", "") or
-        str(item_data.get("marketplace_listing_id", "")) if item_data.get("marketplace_listing_id") else ""
-    )
+    item_id = str(_first(item_data, "id", "itemId", "item_id", "listing_id", "marketplace_listing_id"))
     
     # Extract title - RapidAPI uses marketplace_listing_title
-    title = (
-        item_data.get("marketplace_listing_title", "") or 
-        item_data.get("title", "") or 
-        item_data.get("name", "") or
-        item_data.get("listing_title", "") or
-        item_data.get("product_title", "")
-    )
+    title = item_data.get("marketplace_listing_title")
+    if not title:
+        title = _first(item_data, "title", "name", "listing_title", "product_title")
     
     # Extract price - RapidAPI uses listing_price dict
     price = 0.0
@@ -93,7 +122,7 @@ def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
         # Fallback to formatted_amount
         if price == 0.0 and "formatted_amount" in listing_price:
             price_text = listing_price["formatted_amount"]
-            price_match = re.search(r'[\d,]+\.?\d*', str(price_text).replace(',', ''))
+            price_match = _PRICE_RE.search(str(price_text).replace(',', ''))
             if price_match:
                 try:
                     price = float(price_match.group().replace(',', ''))
@@ -101,14 +130,7 @@ def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
                     price = 0.0
     
     # Extract URL - try multiple possible fields first
-    url = (
-        item_data.get("url", "") or
-        item_data.get("item_url", "") or
-        item_data.get("listing_url", "") or
-        item_data.get("marketplace_listing_url", "") or
-        item_data.get("link", "") or
-        item_data.get("web_url", "")
-    )
+    url = _first(item_data, "url", "item_url", "listing_url", "marketplace_listing_url", "link", "web_url")
     
     # If no URL found, try to construct from item ID
     # Format: https://www.facebook.com/marketplace/item/{item_id}
@@ -173,34 +195,40 @@ def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
     year = None
     set_name = None
     
+    # Lowercase once; the title-only patterns use title_lower, cert also searches the description
+    title_lower = title.lower()
+    text_lower = title_lower + " " + description.lower()
+    
+    # Substring checks are much cheaper than a regex search, so most
+    # non-card/non-apparel listings skip the cert, grade and size patterns
+    
     # Extract cert from title or description
-    cert_pattern = r'(?:cert|certification|psa)[\s#:]*(\d{6,8})'
-    cert_match = re.search(cert_pattern, (title + " " + description).lower())
-    if cert_match:
-        cert = cert_match.group(1)
+    if "psa" in text_lower or "cert" in text_lower:
+        cert_match = _CERT_RE.search(text_lower)
+        if cert_match:
+            cert = cert_match.group(1)
     
     # Extract PSA grade
-    psa_match = re.search(r'psa[\s-]*(\d+)', title.lower())
+    psa_match = _PSA_GRADE_RE.search(title_lower) if "psa" in title_lower else None
     
     # Extract year
-    year_match = re.search(r'\b(19\d{2}|20\d{2})\b', title)
+    year_match = _YEAR_RE.search(title)
     if year_match:
         year = year_match.group(1)
     
     # For luxury items, try to extract brand from title
-    luxury_brands = ["gucci", "ysl", "saint laurent", "louis vuitton", "prada", "chanel", "dior"]
-    title_lower = title.lower()
-    for brand_name in luxury_brands:
-        if brand_name in title_lower:
-            brand = brand_name.title()
-            break
+    brand_match = _LUX_BRAND_RE.search(title_lower)
+    if brand_match:
+        brand = _LUX_BRAND_TITLE[brand_match.group(1)]
     
     # Extract size (for shoes/clothing)
-    size_match = re.search(r'\b(size|sz)[\s:]*(\d+(?:\.\d+)?)', title_lower)
-    if size_match:
-        size = size_match.group(2)
+    if "size" in title_lower or "sz" in title_lower:
+        size_match = _SIZE_RE.search(title_lower)
+        if size_match:
+            size = size_match.group(1)
     
-    return FacebookMarketplaceItem(
+    result = _EMPTY_FB_ITEM.copy()
+    result.update(
         item_id=item_id,
         title=title,
         url=url,
@@ -221,6 +249,91 @@ def normalize_facebook_item(item_data: dict) -> FacebookMarketplaceItem:
         year=year,
         set_name=set_name,
     )
+    return result
+
+
+def _dump_first_item(raw_item: dict):
+    """Print the first raw item's structure and save it to data/ for analysis."""
+    print(f"[DEBUG] First raw item structure:")
+    print(f"  Keys: {list(raw_item.keys())}")
+    print(f"  Sample values: {[(k, str(v)[:50]) for k, v in list(raw_item.items())[:5]]}")
+    os.makedirs('data', exist_ok=True)
+    raw_item_file = 'data/rapidapi_fb_raw_item.json'
+    with open(raw_item_file, 'wb') as f:
+        f.write(orjson.dumps(raw_item, option=orjson.OPT_INDENT_2))
+    print(f"[DEBUG] First raw item saved to: {raw_item_file}")
+
+
+def normalize_facebook_items(raw_items: list, debug: bool = False) -> list[FacebookMarketplaceItem]:
+    """
+    Normalize a batch of RapidAPI Facebook Marketplace items.
+    
+    Items without a title are dropped. Missing item IDs are recovered from the
+    listing URL (or generated), and missing URLs are built from real item IDs.
+    
+    Args:
+        raw_items: Raw item dicts from RapidAPI
+        debug: Print per-item diagnostics (first item dump, skips, errors)
+        
+    Returns:
+        List of normalized FacebookMarketplaceItem dictionaries
+    """
+    normalize = normalize_facebook_item
+    
+    try:
+        normalized_items = [normalize(raw_item) for raw_item in raw_items]
+    except Exception:
+        # Slow path: normalize one at a time so a bad listing doesn't drop the batch
+        normalized_items = []
+        for idx, raw_item in enumerate(raw_items):
+            try:
+                normalized_items.append(normalize(raw_item))
+            except Exception as e:
+                normalized_items.append(None)
+                if debug:
+                    print(f"[DEBUG] Failed to normalize Facebook item {idx}: {e}")
+                    if idx < 2:  # Show first 2 errors in detail
+                        import traceback
+                        traceback.print_exc()
+    
+    items: list[FacebookMarketplaceItem] = []
+    # Debug: show raw item structure for first item and save to file
+    if debug and raw_items and isinstance(raw_items[0], dict):
+        _dump_first_item(raw_items[0])
+    
+    for idx, (raw_item, normalized) in enumerate(zip(raw_items, normalized_items)):
+        if normalized is None:
+            continue
+        
+        # Be more lenient - only require title, item_id can be generated
+        if not normalized["title"]:
+            if debug:
+                print(f"[DEBUG] Item {idx} skipped: missing title")
+                print(f"  Available keys: {list(raw_item.keys()) if isinstance(raw_item, dict) else 'Not a dict'}")
+            continue
+        
+        # If no item_id, try to extract from URL first
+        if not normalized["item_id"]:
+            # Try to extract from URL if available
+            url_match = _FB_URL_ID_RE.search(normalized.get("url") or "")
+            if url_match:
+                normalized["item_id"] = url_match.group(1)
+        
+        # If still no URL, try to construct from item_id (but only if it's a real ID)
+        if not normalized.get("url") and normalized.get("item_id"):
+            # Only construct URL if item_id looks like a real Facebook ID (not our generated format)
+            if not normalized["item_id"].startswith("fb_"):
+                normalized["url"] = f"https://www.facebook.com/marketplace/item/{normalized['item_id']}"
+        
+        # Fallback: generate item_id only if we still don't have one (for tracking purposes)
+        if not normalized["item_id"]:
+            # blake2b rather than hash(), which is salted per process
+            title_digest = hashlib.blake2b(normalized["title"].encode("utf-8"), digest_size=6).hexdigest()
+            normalized["item_id"] = f"fb_{idx}_{title_digest}"
+        
+        items.append(normalized)
+    
+    return items
 
 
 def search_facebook_marketplace(
@@ -301,18 +414,20 @@ def search_facebook_marketplace(
     
     for attempt in range(max_retries):
         try:
-            print(f"[DEBUG] Facebook Marketplace API Request:")
-            print(f"  URL: {url}")
-            print(f"  Query: {query}")
-            print(f"  City: {city}")
-            print(f"  Params: {params}")
+            if _FB_DEBUG:
+                print(f"[DEBUG] Facebook Marketplace API Request:")
+                print(f"  URL: {url}")
+                print(f"  Query: {query}")
+                print(f"  City: {city}")
+                print(f"  Params: {params}")
             
             # RapidAPI should be faster than Apify
             response = requests.get(url, headers=headers, params=params, timeout=30)
             
-            print(f"[DEBUG] Facebook Marketplace API Response:")
-            print(f"  Status Code: {response.status_code}")
-            print(f"  Headers: {dict(response.headers)}")
+            if _FB_DEBUG:
+                print(f"[DEBUG] Facebook Marketplace API Response:")
+                print(f"  Status Code: {response.status_code}")
+                print(f"  Headers: {dict(response.headers)}")
             
             if response.status_code == 401 or response.status_code == 403:
                 error_msg = f"RapidAPI Authentication Error ({response.status_code})"
@@ -333,33 +448,32 @@ def search_facebook_marketplace(
                 raise ValueError(error_msg)
             
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
-            print(f"[DEBUG] Facebook Marketplace API response type: {type(data)}")
-            
-            # Save full response to file for analysis
-            import json
-            import os
-            os.makedirs('data', exist_ok=True)
-            debug_file = 'data/rapidapi_fb_response.json'
-            with open(debug_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            print(f"[DEBUG] Full response saved to: {debug_file}")
-            
-            if isinstance(data, dict):
-                print(f"[DEBUG] Response keys: {list(data.keys())}")
-                # Print first 1000 chars of response for debugging
-                print(f"[DEBUG] Response sample: {json.dumps(data, indent=2)[:1000]}")
-            elif isinstance(data, list):
-                print(f"[DEBUG] Response is list with {len(data)} items")
-                if len(data) > 0:
-                    print(f"[DEBUG] First item keys: {list(data[0].keys()) if isinstance(data[0], dict) else 'Not a dict'}")
-                    # Save first item structure for analysis
-                    if isinstance(data[0], dict):
-                        first_item_file = 'data/rapidapi_fb_first_item.json'
-                        with open(first_item_file, 'w', encoding='utf-8') as f:
-                            json.dump(data[0], f, indent=2, ensure_ascii=False)
-                        print(f"[DEBUG] First item structure saved to: {first_item_file}")
+            if _FB_DEBUG:
+                print(f"[DEBUG] Facebook Marketplace API response type: {type(data)}")
+                
+                # Save full response to file for analysis
+                os.makedirs('data', exist_ok=True)
+                debug_file = 'data/rapidapi_fb_response.json'
+                with open(debug_file, 'wb') as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+                print(f"[DEBUG] Full response saved to: {debug_file}")
+                
+                if isinstance(data, dict):
+                    print(f"[DEBUG] Response keys: {list(data.keys())}")
+                    # Print first 1000 chars of response for debugging
+                    print(f"[DEBUG] Response sample: {orjson.dumps(data, option=orjson.OPT_INDENT_2)[:1000].decode('utf-8', 'replace')}")
+                elif isinstance(data, list):
+                    print(f"[DEBUG] Response is list with {len(data)} items")
+                    if len(data) > 0:
+                        print(f"[DEBUG] First item keys: {list(data[0].keys()) if isinstance(data[0], dict) else 'Not a dict'}")
+                        # Save first item structure for analysis
+                        if isinstance(data[0], dict):
+                            first_item_file = 'data/rapidapi_fb_first_item.json'
+                            with open(first_item_file, 'wb') as f:
+                                f.write(orjson.dumps(data[0], option=orjson.OPT_INDENT_2))
+                            print(f"[DEBUG] First item structure saved to: {first_item_file}")
             
             # Handle different response formats
             if isinstance(data, list):
@@ -377,69 +491,18 @@ def search_facebook_marketplace(
                 else:
                     # If it's a dict but no wrapper, might be a single item or different structure
                     raw_items = [data] if data else []
-                    print(f"[DEBUG] No recognized wrapper field found, treating as single item or empty")
+                    if _FB_DEBUG:
+                        print(f"[DEBUG] No recognized wrapper field found, treating as single item or empty")
             else:
                 raw_items = []
             
-            print(f"[DEBUG] Extracted {len(raw_items)} raw items from response")
-            
-            # Normalize each item
-            normalization_errors = 0
-            for idx, raw_item in enumerate(raw_items):
-                try:
-                    # Debug: show raw item structure for first item and save to file
-                    if idx == 0 and isinstance(raw_item, dict):
-                        print(f"[DEBUG] First raw item structure:")
-                        print(f"  Keys: {list(raw_item.keys())}")
-                        print(f"  Sample values: {[(k, str(v)[:50]) for k, v in list(raw_item.items())[:5]]}")
-                        # Save first raw item for detailed analysis
-                        import json
-                        import os
-                        os.makedirs('data', exist_ok=True)
-                        raw_item_file = 'data/rapidapi_fb_raw_item.json'
-                        with open(raw_item_file, 'w', encoding='utf-8') as f:
-                            json.dump(raw_item, f, indent=2, ensure_ascii=False)
-                        print(f"[DEBUG] First raw item saved to: {raw_item_file}")
-                    
-                    normalized = normalize_facebook_item(raw_item)
-                    
-                    # Be more lenient - only require title, item_id can be generated
-                    if normalized["title"]:
-                        # If no item_id, try to extract from URL first
-                        if not normalized["item_id"]:
-                            # Try to extract from URL if available
-                            url = normalized.get("url", "")
-                            if url and "item/" in url:
-                                item_id_from_url = url.split("item/")[-1].split("/")[0].split("?")[0]
-                                if item_id_from_url:
-                                    normalized["item_id"] = item_id_from_url
-                        
-                        # If still no URL, try to construct from item_id (but only if it's a real ID)
-                        if not normalized.get("url") and normalized.get("item_id"):
-                            # Only construct URL if item_id looks like a real Facebook ID (not our generated format)
-                            if not normalized["item_id"].startswith("fb_"):
-                                normalized["url"] = f"https://www.facebook.com/marketplace/item/{normalized['item_id']}"
-                        
-                        # Fallback: generate item_id only if we still don't have one (for tracking purposes)
-                        if not normalized["item_id"]:
-                            normalized["item_id"] = f"fb_{idx}_{hash(normalized['title'])}"
-                        
-                        items.append(normalized)
-                    else:
-                        print(f"[DEBUG] Item {idx} skipped: missing title")
-                        print(f"  Available keys: {list(raw_item.keys()) if isinstance(raw_item, dict) else 'Not a dict'}")
-                except Exception as e:
-                    normalization_errors += 1
-                    print(f"[DEBUG] Failed to normalize Facebook item {idx}: {e}")
-                    if idx < 2:  # Show first 2 errors in detail
-                        import traceback
-                        traceback.print_exc()
-                    continue
+            items = normalize_facebook_items(raw_items, debug=_FB_DEBUG)
             
-            print(f"[DEBUG] Facebook Marketplace Summary:")
-            print(f"  Raw items received: {len(raw_items)}")
-            print(f"  Successfully normalized: {len(items)}")
-            print(f"  Normalization errors: {normalization_errors}")
+            if _FB_DEBUG:
+                print(f"[DEBUG] Facebook Marketplace Summary:")
+                print(f"  Raw items received: {len(raw_items)}")
+                print(f"  Successfully normalized: {len(items)}")
+                print(f"  Skipped (missing title or normalization error): {len(raw_items) - len(items)}")
             
             # Record API usage
             record_request(query, len(items))
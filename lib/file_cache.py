@@ -0,0 +1,79 @@
+"""
+Small helpers for the files kept under data/ (and .env.local)
+Atomic writes, JSON loading/printing, plus TTL entries for JSON caches shaped as {key: [value, unix expiry time]}.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+import orjson
+
+# Returned by ttl_get for missing or expired keys (cached values may themselves be None)
+CACHE_MISS = object()
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """
+    Write data to path via a temp file and rename, so readers never see a partial file.
+    
+    Args:
+        path: Destination file; its directory is created if needed
+        data: Full file contents
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_json_file(path: str, default: Any) -> Any:
+    """Parse a JSON file, or return default if it is missing or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def pretty_json(obj: Any) -> str:
+    """Indented JSON for printing (non-string dict keys allowed)."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def ttl_get(cache: Dict[str, List[Any]], key: str) -> Any:
+    """Value cached under key, or CACHE_MISS if missing or expired."""
+    cached = cache.get(key)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    return CACHE_MISS
+
+
+def ttl_put(
+    cache: Dict[str, List[Any]],
+    key: str,
+    value: Any,
+    ttl: float,
+    max_entries: Optional[int] = None
+) -> None:
+    """
+    Store value under key for ttl seconds, dropping expired entries
+    (and the oldest ones beyond max_entries).
+    
+    Args:
+        cache: Cache dict (insertion ordered, oldest first)
+        key: Cache key
+        value: JSON-serializable value
+        ttl: Seconds the value stays valid
+        max_entries: Optional size cap
+    """
+    now = time.time()
+    cache.pop(key, None)
+    cache[key] = [value, now + ttl]
+    
+    for old_key in [old_key for old_key, (_, expires) in cache.items() if expires <= now]:
+        del cache[old_key]
+    if max_entries is not None:
+        for old_key in list(cache)[:max(0, len(cache) - max_entries)]:
+            del cache[old_key]
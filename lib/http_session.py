@@ -0,0 +1,183 @@
+"""
+Shared HTTP session factory with connection pooling and retries
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def create_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 20,
+    total_retries: int = 2,
+    backoff_factor: float = 0.3,
+    allowed_methods: Optional[Iterable[str]] = None,
+    status_forcelist: Iterable[int] = RETRY_STATUS_CODES,
+    read_retries: Optional[int] = None,
+) -> requests.Session:
+    """
+    Create a requests.Session that keeps connections alive and retries transient errors.
+
+    Retries are handled by urllib3 on 429/5xx responses (or status_forcelist) with exponential backoff,
+    waiting at least as long as any Retry-After header asks.
+    Once retries are exhausted the last response is returned as-is, so callers can
+    keep checking status codes themselves.
+
+    Args:
+        pool_connections: Number of per-host connection pools to cache
+        pool_maxsize: Maximum connections kept open per host
+        total_retries: Maximum number of retries per request
+        backoff_factor: Backoff multiplier between retries (seconds)
+        allowed_methods: HTTP methods to retry (defaults to urllib3's idempotent methods)
+        status_forcelist: Response status codes to retry
+        read_retries: Retries after the request was sent but the response didn't arrive
+            (defaults to total_retries; use 0 where a repeat could run the request twice)
+
+    Returns:
+        Configured requests.Session
+    """
+    retry = Retry(
+        total=total_retries,
+        backoff_factor=backoff_factor,
+        read=read_retries,
+        status_forcelist=frozenset(status_forcelist),
+        allowed_methods=frozenset(allowed_methods) if allowed_methods else Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+def create_async_client(max_connections: int = 20) -> "httpx.AsyncClient":
+    """
+    Create an httpx.AsyncClient to share across concurrent requests (the async modules' create_session).
+
+    Args:
+        max_connections: Maximum open (and keep-alive) connections
+
+    Returns:
+        httpx.AsyncClient with HTTP/2 enabled
+    """
+    # The client ignores its own limits/http2 arguments once a transport is given, so they go on the transport
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        ),
+        timeout=30,
+    )
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Seconds a Retry-After header asks us to wait (delta-seconds or HTTP date), if any."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def send_with_retries(
+    send: Callable[[], requests.Response],
+    max_attempts: int = 5,
+    min_wait: float = 2.0,
+    max_wait: float = 30.0,
+) -> requests.Response:
+    """
+    Call send() again on 429/5xx responses and connection errors, with exponential backoff.
+
+    For one-off requests that don't go through a create_session() session. Waits
+    min_wait, 2x, 4x, ... seconds (capped at max_wait), or as long as a Retry-After
+    header asks; responses asking for more than max_wait are returned straight away.
+    Read timeouts are not retried, since the server may still be working on the request.
+    Once attempts are exhausted the last response is returned (or the last
+    connection error raised), so callers can keep checking status codes themselves.
+
+    Args:
+        send: Zero-argument callable making the request, e.g. lambda: requests.get(url)
+        max_attempts: Maximum number of calls to send()
+        min_wait: First backoff delay in seconds
+        max_wait: Longest backoff delay in seconds
+
+    Returns:
+        The first non-retryable response, or the last one
+    """
+    for attempt in range(max_attempts):
+        wait = min(max_wait, min_wait * 2 ** attempt)
+        try:
+            response = send()
+        except requests.ConnectionError:
+            if attempt == max_attempts - 1:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_attempts - 1:
+                return response
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                if retry_after > max_wait:
+                    # e.g. a monthly quota reset; retrying within this call won't help
+                    return response
+                wait = max(wait, retry_after)
+        time.sleep(wait)
+    raise ValueError("max_attempts must be at least 1")
+
+
+def create_rate_limiter(rate: int, period: float = 60.0, burst: Optional[int] = None) -> Callable[[], None]:
+    """
+    Create a token-bucket rate limiter.
+
+    The returned wait() lets up to burst calls through straight away, then blocks
+    callers just long enough to keep to rate calls per period seconds, instead of
+    sleeping a fixed interval after every request. Safe to share between threads.
+
+    Args:
+        rate: Calls allowed per period
+        period: Length of the period in seconds
+        burst: Calls allowed back to back (defaults to rate)
+
+    Returns:
+        wait() function to call before each request
+    """
+    capacity = float(burst or rate)
+    tokens = capacity
+    updated = time.monotonic()
+    lock = threading.Lock()
+
+    def wait() -> None:
+        nonlocal tokens, updated
+        with lock:
+            now = time.monotonic()
+            tokens = min(capacity, tokens + (now - updated) * rate / period)
+            updated = now
+            # Take a token now (possibly going negative) so concurrent callers queue up in order
+            delay = (1 - tokens) * period / rate if tokens < 1 else 0.0
+            tokens -= 1
+        if delay:
+            time.sleep(delay)
+
+    return wait
@@ -3,6 +3,8 @@ PSA API integration for fetching certification data
 """
 import time
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Optional
 import cloudscraper
 import requests
@@ -23,13 +25,43 @@ class PsaCert(TypedDict):
     population_higher: Optional[int]
 
 
-def fetch_psa_cert(cert_number: str, env: dict[str, str]) -> PsaCert:
+# PsaCert fields, in order; everything but "cert" is None when a lookup fails
+_PSA_CERT_KEYS = (
+    "cert", "estimated_value", "year", "brand", "set_name", "player", "card_no",
+    "grade", "subject", "category", "total_population", "population_higher",
+)
+
+
+# Shared cloudscraper session so cert lookups reuse the connection and Cloudflare cookies
+_SCRAPER = None
+_SCRAPER_LOCK = threading.Lock()
+
+
+def _get_scraper():
+    """Return the module-wide cloudscraper session, creating it on first use."""
+    global _SCRAPER
+    if _SCRAPER is None:
+        with _SCRAPER_LOCK:
+            if _SCRAPER is None:
+                _SCRAPER = cloudscraper.create_scraper()
+    return _SCRAPER
+
+
+def _empty_psa(cert_number: str) -> PsaCert:
+    """PsaCert with only the cert number filled in."""
+    result = dict.fromkeys(_PSA_CERT_KEYS)
+    result["cert"] = cert_number
+    return result
+
+
+def fetch_psa_cert(cert_number: str, env: dict[str, str], jitter: bool = True) -> PsaCert:
     """
     Fetch PSA certificate data from PSA API.
     
     Args:
         cert_number: PSA certification number
         env: Environment variables dict with PSA_TOKEN
+        jitter: Sleep 50-150ms before the request (fetch_psa_certs jitters once per batch instead)
         
     Returns:
         PsaCert dictionary with card information
@@ -37,20 +69,7 @@ def fetch_psa_cert(cert_number: str, env: dict[str, str]) -> PsaCert:
     psa_token = env.get("PSA_TOKEN", "")
     
     if not psa_token:
-        return {
-            "cert": cert_number,
-            "estimated_value": None,
-            "year": None,
-            "brand": None,
-            "set_name": None,
-            "player": None,
-            "card_no": None,
-            "grade": None,
-            "subject": None,
-            "category": None,
-            "total_population": None,
-            "population_higher": None,
-        }
+        return _empty_psa(cert_number)
     
     url = f"https://api.psacard.com/publicapi/cert/GetByCertNumber/{cert_number}"
     headers = {
@@ -60,71 +79,32 @@ def fetch_psa_cert(cert_number: str, env: dict[str, str]) -> PsaCert:
     }
     
     # Add small jitter between calls
-    jitter_ms = random.randint(50, 150) / 1000.0
-    time.sleep(jitter_ms)
+    if jitter:
+        jitter_ms = random.randint(50, 150) / 1000.0
+        time.sleep(jitter_ms)
     
     # Use cloudscraper to bypass Cloudflare protection
-    scraper = cloudscraper.create_scraper()
-    scraper.headers.update(headers)
+    scraper = _get_scraper()
     
     max_retries = 2
     for attempt in range(max_retries):
         try:
-            response = scraper.get(url, timeout=30)
+            response = scraper.get(url, headers=headers, timeout=30)
             
             if response.status_code == 401:
                 print(f"[PSA API] Authentication Error (401) - Check your PSA_TOKEN")
-                return {
-                    "cert": cert_number,
-                    "estimated_value": None,
-                    "year": None,
-                    "brand": None,
-                    "set_name": None,
-                    "player": None,
-                    "card_no": None,
-                    "grade": None,
-                    "subject": None,
-                    "category": None,
-                    "total_population": None,
-                    "population_higher": None,
-                }
+                return _empty_psa(cert_number)
             
             if response.status_code == 500:
                 if attempt < max_retries - 1:
                     wait_time = (2 ** attempt) + (0.1 * attempt)
                     time.sleep(wait_time)
                     continue
-                return {
-                    "cert": cert_number,
-                    "estimated_value": None,
-                    "year": None,
-                    "brand": None,
-                    "set_name": None,
-                    "player": None,
-                    "card_no": None,
-                    "grade": None,
-                    "subject": None,
-                    "category": None,
-                    "total_population": None,
-                    "population_higher": None,
-                }
+                return _empty_psa(cert_number)
             
             if response.status_code == 204:
                 # No content
-                return {
-                    "cert": cert_number,
-                    "estimated_value": None,
-                    "year": None,
-                    "brand": None,
-                    "set_name": None,
-                    "player": None,
-                    "card_no": None,
-                    "grade": None,
-                    "subject": None,
-                    "category": None,
-                    "total_population": None,
-                    "population_higher": None,
-                }
+                return _empty_psa(cert_number)
             
             response.raise_for_status()
             data = response.json()
@@ -135,20 +115,7 @@ def fetch_psa_cert(cert_number: str, env: dict[str, str]) -> PsaCert:
                 server_message = data.get("ServerMessage", "")
                 
                 if not is_valid or server_message == "No data found":
-                    return {
-                        "cert": cert_number,
-                        "estimated_value": None,
-                        "year": None,
-                        "brand": None,
-                        "set_name": None,
-                        "player": None,
-                        "card_no": None,
-                        "grade": None,
-                        "subject": None,
-                        "category": None,
-                        "total_population": None,
-                        "population_higher": None,
-                    }
+                    return _empty_psa(cert_number)
             
             # PSA API returns { "PSACert": {...}, "DNACert": {...} }
             psa_cert_data = data.get("PSACert", {})
@@ -175,33 +142,34 @@ def fetch_psa_cert(cert_number: str, env: dict[str, str]) -> PsaCert:
                 time.sleep(wait_time)
                 continue
             print(f"[PSA API] Error fetching cert {cert_number}: {e}")
-            return {
-                "cert": cert_number,
-                "estimated_value": None,
-                "year": None,
-                "brand": None,
-                "set_name": None,
-                "player": None,
-                "card_no": None,
-                "grade": None,
-                "subject": None,
-                "category": None,
-                "total_population": None,
-                "population_higher": None,
-            }
+            return _empty_psa(cert_number)
     
-    return {
-        "cert": cert_number,
-        "estimated_value": None,
-        "year": None,
-        "brand": None,
-        "set_name": None,
-        "player": None,
-        "card_no": None,
-        "grade": None,
-        "subject": None,
-        "category": None,
-        "total_population": None,
-        "population_higher": None,
-    }
+    return _empty_psa(cert_number)
+
 
+def fetch_psa_certs(
+    cert_numbers: list[str],
+    env: dict[str, str],
+    max_workers: int = 8
+) -> dict[str, PsaCert]:
+    """
+    Fetch PSA certificate data for many certs concurrently.
+    
+    Args:
+        cert_numbers: PSA certification numbers (duplicates are fetched once)
+        env: Environment variables dict with PSA_TOKEN
+        max_workers: Number of concurrent PSA API requests
+        
+    Returns:
+        Dict mapping each cert number to its PsaCert
+    """
+    unique_certs = list(dict.fromkeys(cert_numbers))
+    if not unique_certs:
+        return {}
+    
+    # One jitter for the whole batch rather than one per request
+    time.sleep(random.randint(50, 150) / 1000.0)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda cert: fetch_psa_cert(cert, env, jitter=False), unique_certs)
+        return dict(zip(unique_certs, results))
@@ -1,67 +1,140 @@
 """
 Track RapidAPI usage to help manage the 30 requests/month free tier limit
 """
+import atexit
 import os
-import json
-from datetime import datetime, timedelta
-from pathlib import Path
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import orjson
+from lib.file_cache import atomic_write
 
 USAGE_FILE = "data/rapidapi_usage.json"
 
+# Number of recent requests kept in the usage file
+MAX_RECENT_REQUESTS = 50
+
+# Parsed usage file, reused until its mtime changes
+_STATS_CACHE = None
+_STATS_MTIME = 0.0
+_STATS_LOCK = threading.Lock()
+
+# Requests recorded by this process but not yet written to USAGE_FILE
+_PENDING: list[dict] = []
+_FLUSH_REGISTERED = False
+
+# Write queued requests once this many are pending, or once the oldest has waited this many seconds
+# (long-running app servers are usually stopped with SIGTERM, where atexit handlers don't run)
+FLUSH_EVERY_REQUESTS = 5
+FLUSH_INTERVAL = 30.0
+_OLDEST_PENDING = 0.0
+
 
 def get_usage_stats() -> dict:
     """Get current usage statistics"""
-    if not os.path.exists(USAGE_FILE):
+    global _STATS_CACHE, _STATS_MTIME
+    
+    try:
+        mtime = os.stat(USAGE_FILE).st_mtime
+    except FileNotFoundError:
         return {
             "total_requests": 0,
             "requests_this_month": 0,
-            "month_start": datetime.now().strftime("%Y-%m-%d"),
-            "requests": []
+            "month_key": datetime.now().strftime("%Y-%m"),
+            "requests": deque(maxlen=MAX_RECENT_REQUESTS)
         }
     
-    with open(USAGE_FILE, "r") as f:
-        return json.load(f)
+    if _STATS_CACHE is not None and mtime == _STATS_MTIME:
+        return _STATS_CACHE
+    
+    with open(USAGE_FILE, "rb") as f:
+        stats = orjson.loads(f.read())
+    stats["requests"] = deque(stats.get("requests", []), maxlen=MAX_RECENT_REQUESTS)
+    if "month_key" not in stats:
+        # Older files stored the full start date as "month_start" (YYYY-MM-DD)
+        stats["month_key"] = stats.pop("month_start", "")[:7]
+    _STATS_CACHE = stats
+    _STATS_MTIME = mtime
+    return _STATS_CACHE
 
 
 def record_request(query: str, items_returned: int):
-    """Record an API request"""
-    os.makedirs("data", exist_ok=True)
+    """
+    Record an API request.
     
-    stats = get_usage_stats()
-    
-    # Check if we need to reset monthly count
-    month_start = datetime.strptime(stats.get("month_start", datetime.now().strftime("%Y-%m-%d")), "%Y-%m-%d")
+    Requests are queued in memory and written to USAGE_FILE in one go by
+    flush_now(), which runs once FLUSH_EVERY_REQUESTS are queued or the oldest
+    has waited FLUSH_INTERVAL seconds, and again at interpreter exit.
+    """
+    global _FLUSH_REGISTERED, _OLDEST_PENDING
     now = datetime.now()
     
-    # If new month, reset counter
-    if (now - month_start).days > 31:
-        stats["requests_this_month"] = 0
-        stats["month_start"] = now.strftime("%Y-%m-%d")
-    
-    # Record request
-    stats["total_requests"] += 1
-    stats["requests_this_month"] += 1
-    stats["requests"].append({
-        "timestamp": datetime.now().isoformat(),
-        "query": query,
-        "items_returned": items_returned
-    })
-    
-    # Keep only last 50 requests
-    if len(stats["requests"]) > 50:
-        stats["requests"] = stats["requests"][-50:]
+    with _STATS_LOCK:
+        if not _PENDING:
+            _OLDEST_PENDING = time.monotonic()
+        _PENDING.append({
+            "timestamp": now.isoformat(),
+            "query": query,
+            "items_returned": items_returned
+        })
+        if not _FLUSH_REGISTERED:
+            atexit.register(flush_now)
+            _FLUSH_REGISTERED = True
+        
+        # Count this month's requests: saved ones plus everything still queued
+        stats = get_usage_stats()
+        saved_this_month = stats["requests_this_month"] if stats.get("month_key") == now.strftime("%Y-%m") else 0
+        requests_this_month = saved_this_month + len(_PENDING)
+        flush_due = len(_PENDING) >= FLUSH_EVERY_REQUESTS or time.monotonic() - _OLDEST_PENDING >= FLUSH_INTERVAL
     
-    with open(USAGE_FILE, "w") as f:
-        json.dump(stats, f, indent=2)
+    if flush_due:
+        try:
+            flush_now()
+        except OSError as e:
+            # Entries stay queued for the next flush
+            print(f"Warning: Could not save RapidAPI usage: {e}")
     
     # Warn if approaching limit
-    remaining = 30 - stats["requests_this_month"]
+    remaining = 30 - requests_this_month
     if remaining <= 5:
         print(f"⚠️  WARNING: Only {remaining} RapidAPI requests remaining this month!")
 
 
+def flush_now():
+    """Merge queued requests into USAGE_FILE with a single read and write."""
+    global _STATS_CACHE, _STATS_MTIME
+    
+    with _STATS_LOCK:
+        if not _PENDING:
+            return
+        
+        # Merge into a copy so the cached stats stay as saved if the write fails
+        stats = dict(get_usage_stats())
+        stats["requests"] = deque(stats["requests"], maxlen=MAX_RECENT_REQUESTS)
+        
+        for entry in _PENDING:
+            # If new calendar month, reset counter
+            month_key = entry["timestamp"][:7]
+            if stats.get("month_key") != month_key:
+                stats["requests_this_month"] = 0
+                stats["month_key"] = month_key
+            
+            # Record request (the deque drops the oldest beyond MAX_RECENT_REQUESTS)
+            stats["total_requests"] += 1
+            stats["requests_this_month"] += 1
+            stats["requests"].append(entry)
+        
+        atomic_write(USAGE_FILE, orjson.dumps({**stats, "requests": list(stats["requests"])}))
+        
+        _STATS_CACHE = stats
+        _STATS_MTIME = os.stat(USAGE_FILE).st_mtime
+        _PENDING.clear()
+
+
 def print_usage_stats():
     """Print current usage statistics"""
+    flush_now()
     stats = get_usage_stats()
     
     print("\n" + "=" * 70)
@@ -70,7 +143,7 @@ def print_usage_stats():
     print(f"Total requests (all time): {stats['total_requests']}")
     print(f"Requests this month: {stats['requests_this_month']}/30")
     print(f"Remaining this month: {30 - stats['requests_this_month']}")
-    print(f"Month started: {stats.get('month_start', 'N/A')}")
+    print(f"Month: {stats.get('month_key', 'N/A')}")
     
     if stats['requests_this_month'] >= 30:
         print("\n⚠️  MONTHLY LIMIT REACHED - No more requests until next month!")
@@ -9,280 +9,800 @@ Deep Research Agent for PSA Card Pricing
 
 import re
 import json
+import html
 import time
+import asyncio
 import base64
+import hashlib
+import mmap
 import os
-from typing import Optional, Dict, Any, List
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Callable, Dict, Any, List, Tuple
+from urllib.parse import urlsplit
+import orjson
 import requests
 import cloudscraper
-from bs4 import BeautifulSoup
+import lxml.html
+from lib.file_cache import CACHE_MISS, atomic_write, load_json_file, ttl_get, ttl_put
+from lib.http_session import create_session
 
+# Embedded page-state JSON blobs that may carry PSA data (window/var assignments and PSA keys)
+_JSON_MARKERS = ('__INITIAL_STATE__', '__PRELOADED_STATE__', '"psaData"', '"psa"')
+_JSON_ASSIGN_RE = re.compile(r'\s*[=:]\s*\{')
+_JSON_DECODER = json.JSONDecoder()  # stdlib only for raw_decode; everything else goes through orjson
+_MAX_BRACE_WALKBACK = 8
 
-def scrape_psa_estimate_from_ebay(ebay_url: str) -> Optional[float]:
+# Stop reading listing/cert pages past this size; estimates sit well inside it
+MAX_HTML_BYTES = 2_000_000
+
+# Concurrent page fetches allowed per host (eBay/PSA start answering 429 beyond a few)
+MAX_REQUESTS_PER_HOST = 3
+_HOST_SEMAPHORES: Dict[str, threading.Semaphore] = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+EBAY_PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+PSA_PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+# PSA estimates, deep research results and image certs, kept on disk across runs:
+# "<kind>:<key>" -> (result, unix expiry time)
+RESEARCH_CACHE_FILE = "data/research_cache.json"
+_PSA_ESTIMATE_TTL = 24 * 3600  # Cert values barely move within a day
+_NEGATIVE_RESULT_TTL = 3600  # Retry certs with no estimate sooner, but not on every run
+CERT_IMAGE_TTL = 30 * 24 * 3600  # The cert printed on an image never changes
+_RESEARCH_CACHE_MAX = 4096
+_RESEARCH_CACHE: Optional[Dict[str, List[Any]]] = None
+_RESEARCH_CACHE_LOCK = threading.Lock()
+
+# Shared cloudscraper session so page scrapes reuse connections and Cloudflare cookies
+_SCRAPER = None
+_SCRAPER_LOCK = threading.Lock()
+
+# Estimated value keys inside script JSON/JavaScript
+_SCRIPT_ESTIMATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r'"estimatedValue"[:\s]*([\d,]+\.?\d*)',
+        r'"estimated_value"[:\s]*([\d,]+\.?\d*)',
+        r'"estimate"[:\s]*([\d,]+\.?\d*)',
+        r'"psaEstimate"[:\s]*([\d,]+\.?\d*)',
+        r'estimatedValue["\']?\s*[:=]\s*["\']?([\d,]+\.?\d*)',
+    )
+]
+# Case-insensitive keyword checks, so script/element text is never copied just to lowercase it
+_PSA_KEY_RE = re.compile(r'psa', re.IGNORECASE)
+_ESTIMATE_WORD_RE = re.compile(r'estimate', re.IGNORECASE)
+_ELEMENT_ESTIMATE_RE = re.compile(r'estimate|est\. value', re.IGNORECASE)
+_ESTIMATE_JSON_RE = re.compile(r'\{[^}]*estimate[^}]*\}', re.IGNORECASE)
+
+# Estimated value labels in visible page text, one alternation per page type:
+# "<label>: $1,205.93" (value in group 1) or "$1,205.93 (PSA Estimate)" (value in group 2)
+_PSA_ESTIMATE_RE = re.compile(r'PSA\s+Estimate[:\s]*\$?([\d,]+\.?\d*)', re.IGNORECASE)
+_COMBINED_ESTIMATE_RE = re.compile(
+    r'(?:PSA\s+Estimate|Estimated\s+(?:Market\s+)?Value|Est\.\s+Value)[:\s]*\$?([\d,]+\.?\d*)'
+    r'|\$([\d,]+\.?\d*)\s*\(PSA\s+Estimate\)',
+    re.IGNORECASE
+)
+_PSA_PAGE_ESTIMATE_RE = re.compile(
+    r'(?:PSA\s+Estimate|Estimated\s+Value|Est\.\s+Value)[:\s]*\$?([\d,]+\.?\d*)'
+    r'|\$([\d,]+\.?\d*)\s*\(PSA\s+Estimate\)',
+    re.IGNORECASE
+)
+
+# Labels the text patterns anchor on; only a small window of raw HTML around each is scanned
+_ESTIMATE_KEY_RE = re.compile(r'PSA\s+Estimate|Estimated\s+(?:Market\s+)?Value|Est\.\s+Value', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]*>')
+_ESTIMATE_WINDOW_BEFORE = 64  # Room for "$1,205.93 (PSA Estimate)"
+_ESTIMATE_WINDOW_AFTER = 256
+
+# eBay listing pages only need script bodies and one attribute, so they are pulled out without a DOM
+_SCRIPT_BODY_RE = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_PSA_ESTIMATE_ATTR_RE = re.compile(r'''\sdata-psa-estimate\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_DOLLAR_RE = re.compile(r'\$([\d,]+\.?\d*)')
+
+# Keys holding an estimated value in embedded JSON, in priority order
+_ESTIMATE_KEYS = ('estimatedValue', 'estimated_value', 'estimate', 'psaEstimate', 'psa_estimate', 'estimatedMarketValue')
+_ESTIMATE_KEY_SET = frozenset(_ESTIMATE_KEYS)
+
+# Lowercase literals every estimate pattern above needs; pages without any of them are skipped
+_ESTIMATE_HINTS = ('estimat', 'est.')
+
+# Pooled session so OpenRouter calls reuse the TLS connection. Only 429s (rejected before the
+# model runs) and connection failures are retried: after a 502/504 or a read timeout the
+# completion may already have run and been billed, so callers see those responses as-is.
+_OPENROUTER_SESSION = create_session(
+    pool_connections=16,
+    pool_maxsize=32,
+    total_retries=3,
+    allowed_methods=("POST",),
+    status_forcelist=(429,),
+    read_retries=0,
+)
+
+# LLM response parsing
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+INSIGHT_BATCH_SIZE = 8  # Arbitrage opportunities analyzed per LLM request
+_EBAY_PRICE_RE = re.compile(r'eBay[:\s]*\$?([\d,]+\.?\d*)', re.IGNORECASE)
+_MD_JSON_RE = re.compile(r'```json\s*|```\s*$|^```\s*')
+_LISTINGS_JSON_RE = re.compile(r'\{[^{}]*"listings"[^{}]*\[.*?\]\s*\}', re.DOTALL)
+_CERT_NUMBER_RE = re.compile(r'\b(\d{7,9})\b')
+_CERT_CONTEXT_PATTERNS = [
+    re.compile(r'(?:cert|certification|PSA\s*#?|cert\s*#?)[:\s]*(\d{7,9})', re.IGNORECASE),
+    re.compile(r'(\d{7,9})(?:\s*PSA|\s*cert)', re.IGNORECASE),
+]
+_PRICE_RE = re.compile(r'\$?(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)')
+_CARD_NAME_RE = re.compile(r'([A-Z][A-Z\s\-!]+(?:DRAGON|MAGICIAN|GUARDIAN|BEAST|WARRIOR|SPELLCASTER))', re.IGNORECASE)
+
+# Image MIME types by file extension for vision requests (anything else is sent as PNG)
+_IMAGE_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# LLM prompts (str.format templates)
+_INSIGHT_PROMPT = """Analyze this PSA card arbitrage opportunity:
+
+Card: {title}
+PSA Cert: {cert}
+eBay Price: ${price:.2f}
+Shipping: ${shipping:.2f}
+Total Cost: ${total:.2f}
+PSA Estimate: ${psa_estimate:.2f}
+Potential Profit: ${spread:.2f} ({spread_pct:.1f}%)
+
+Provide a brief analysis (2-3 sentences) on:
+1. Whether this is a good arbitrage opportunity
+2. Market factors to consider
+3. Risk assessment
+
+Be concise and actionable."""
+_BATCH_INSIGHT_LINE = (
+    "[{idx}] Card: {title} | PSA Cert: {cert} | "
+    "eBay Price: ${price:.2f} | Shipping: ${shipping:.2f} | Total Cost: ${total:.2f} | "
+    "PSA Estimate: ${psa_estimate:.2f} | Potential Profit: ${spread:.2f} ({spread_pct:.1f}%)"
+)
+_BATCH_INSIGHT_PROMPT = """Analyze these PSA card arbitrage opportunities:
+
+{cards}
+
+For each card, provide a brief analysis (2-3 sentences) on:
+1. Whether this is a good arbitrage opportunity
+2. Market factors to consider
+3. Risk assessment
+
+Be concise and actionable. Return JSON only:
+{{"insights": [{{"idx": 0, "text": "..."}}]}}"""
+_CERT_PROMPT = """Look at this PSA-graded trading card image and extract the PSA certification number.
+
+The certification number is typically:
+- A 7-9 digit number
+- Located on the PSA label/slab
+- Usually near the top or bottom of the label
+- May be labeled as "Cert #", "Certification Number", or just shown as a number
+
+Please extract ONLY the certification number (digits only, no spaces or dashes).
+If you cannot find a certification number, respond with "NOT_FOUND".
+
+Format your response as a JSON object:
+{
+  "cert_number": "12345678" or "NOT_FOUND"
+}"""
+
+
+def _is_cert_number(value: str) -> bool:
+    """True if value is a 7-9 digit PSA cert number (ASCII digits only)."""
+    return 7 <= len(value) <= 9 and value.isascii() and value.isdigit()
+
+
+def _get_scraper():
+    """Return the module-wide cloudscraper session, creating it on first use."""
+    global _SCRAPER
+    if _SCRAPER is None:
+        with _SCRAPER_LOCK:
+            if _SCRAPER is None:
+                _SCRAPER = cloudscraper.create_scraper()
+    return _SCRAPER
+
+
+def _load_cache() -> Dict[str, List[Any]]:
+    """Load the research cache from disk on first use (caller holds the lock)."""
+    global _RESEARCH_CACHE
+    if _RESEARCH_CACHE is None:
+        _RESEARCH_CACHE = load_json_file(RESEARCH_CACHE_FILE, {})
+    return _RESEARCH_CACHE
+
+
+def cache_get(key: str) -> Any:
+    """Cached result for key (which may be None), or CACHE_MISS if missing or expired."""
+    with _RESEARCH_CACHE_LOCK:
+        return ttl_get(_load_cache(), key)
+
+
+def cache_put(key: str, value: Any, ttl: float) -> None:
+    """Store a result in memory and persist the cache to disk."""
+    with _RESEARCH_CACHE_LOCK:
+        cache = _load_cache()
+        ttl_put(cache, key, value, ttl, max_entries=_RESEARCH_CACHE_MAX)
+        try:
+            atomic_write(RESEARCH_CACHE_FILE, orjson.dumps(cache))
+        except (OSError, TypeError) as e:
+            print(f"Warning: Could not save research cache: {e}")
+
+
+def get_cached_estimate(cert_number: str) -> Any:
+    """Cached PSA estimate for a cert (None if none was found), or CACHE_MISS."""
+    return cache_get(f"psa:{cert_number}")
+
+
+def cache_estimate(cert_number: str, estimate: Optional[float]) -> None:
+    """Cache a PSA estimate, or the lack of one for a shorter time."""
+    cache_put(f"psa:{cert_number}", estimate, _PSA_ESTIMATE_TTL if estimate else _NEGATIVE_RESULT_TTL)
+
+
+def image_digest(image_path: str) -> Optional[str]:
+    """SHA-256 of an image file's bytes, or None if it can't be read."""
+    try:
+        with open(image_path, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+    except OSError:
+        return None
+
+
+def _host_slot(url: str) -> threading.Semaphore:
+    """Semaphore limiting concurrent requests to the URL's host."""
+    host = urlsplit(url).netloc
+    with _HOST_SEMAPHORES_LOCK:
+        semaphore = _HOST_SEMAPHORES.get(host)
+        if semaphore is None:
+            semaphore = _HOST_SEMAPHORES[host] = threading.Semaphore(MAX_REQUESTS_PER_HOST)
+    return semaphore
+
+
+def _read_capped(response: requests.Response, max_bytes: int = MAX_HTML_BYTES) -> str:
+    """
+    Read a streamed response body, stopping once max_bytes have arrived.
+    
+    Args:
+        response: Response from a request made with stream=True
+        max_bytes: Maximum number of bytes to read
+        
+    Returns:
+        Decoded (possibly truncated) body
+    """
+    chunks = []
+    total = 0
+    try:
+        for chunk in response.iter_content(65536):
+            chunks.append(chunk)
+            total += len(chunk)
+            if total > max_bytes:
+                break
+    finally:
+        response.close()
+    return b''.join(chunks).decode(response.encoding or 'utf-8', errors='replace')
+
+
+def _find_text_estimate(html_content: str, pattern: re.Pattern) -> Optional[float]:
+    """
+    Find an estimate label in raw HTML and run the estimate pattern on the text around it.
+    
+    Args:
+        html_content: Raw page HTML
+        pattern: Combined estimate pattern (value in group 1 or group 2)
+        
+    Returns:
+        First positive estimate found, or None
+    """
+    for key in _ESTIMATE_KEY_RE.finditer(html_content):
+        window = html_content[max(0, key.start() - _ESTIMATE_WINDOW_BEFORE):key.end() + _ESTIMATE_WINDOW_AFTER]
+        text = html.unescape(_TAG_RE.sub('', window))
+        for match in pattern.finditer(text):
+            try:
+                value = float((match.group(1) or match.group(2)).replace(',', ''))
+            except ValueError:
+                continue
+            if value > 0:
+                return value
+    return None
+
+
+def _decode_json_after(text: str, marker: str):
+    """
+    Yield JSON objects assigned to each occurrence of a marker (e.g. `__INITIAL_STATE__ = {...}`).
+    
+    Args:
+        text: Text to scan (HTML or script source)
+        marker: Literal that precedes the `=`/`:` and the object
+        
+    Yields:
+        Decoded JSON values
+    """
+    idx = text.find(marker)
+    while idx != -1:
+        start = idx + len(marker)
+        assign = _JSON_ASSIGN_RE.match(text, start)
+        if assign:
+            try:
+                obj, start = _JSON_DECODER.raw_decode(text, assign.end() - 1)
+                yield obj
+            except ValueError:
+                pass
+        idx = text.find(marker, start)
+
+
+def _extract_json_objects(text: str, key: str):
+    """
+    Yield the innermost JSON objects that contain a literal `"key"`.
+    
+    Finds each occurrence with str.find, walks back to the nearest `{` that decodes
+    into an object spanning the key, and decodes it with JSONDecoder.raw_decode.
+    
+    Args:
+        text: Text to scan (HTML or script source)
+        key: JSON key to look for
+        
+    Yields:
+        Decoded JSON objects
+    """
+    needle = f'"{key}"'
+    idx = text.find(needle)
+    while idx != -1:
+        next_from = idx + len(needle)
+        start = text.rfind('{', 0, idx)
+        for _ in range(_MAX_BRACE_WALKBACK):
+            if start == -1:
+                break
+            try:
+                obj, end = _JSON_DECODER.raw_decode(text, start)
+            except ValueError:
+                end = -1
+            if end > idx:
+                yield obj
+                next_from = end
+                break
+            start = text.rfind('{', 0, start)
+        idx = text.find(needle, next_from)
+
+
+def _fetch_html(url: str, headers: Dict[str, str]) -> Optional[str]:
+    """
+    Fetch a page with the shared scraper, holding the URL's host slot.
+    
+    Args:
+        url: Page URL
+        headers: Request headers
+        
+    Returns:
+        Decoded (possibly truncated) body, or None on a non-200 response
+    """
+    with _host_slot(url):
+        response = _get_scraper().get(url, headers=headers, timeout=30, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return None
+        return _read_capped(response)
+
+
+def _run_parse(parse_executor: Optional[Executor], parse, html_content: str) -> Optional[float]:
+    """Run a page parser inline, or on parse_executor (e.g. a process pool) when given."""
+    if parse_executor is None:
+        return parse(html_content)
+    return parse_executor.submit(parse, html_content).result()
+
+
+def scrape_psa_estimate_from_ebay(ebay_url: str, parse_executor: Optional[Executor] = None) -> Optional[float]:
     """
     Scrape PSA Estimated Value from eBay listing's "See all" PSA data section.
     eBay loads this data dynamically, so we need to look for it in the page's JavaScript/JSON.
     
     Args:
         ebay_url: eBay listing URL
+        parse_executor: Optional executor (e.g. ProcessPoolExecutor) to parse the page on
         
     Returns:
         Estimated value as float, or None if not found
     """
-    scraper = cloudscraper.create_scraper()
-    scraper.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-    })
-    
     try:
-        response = scraper.get(ebay_url, timeout=30)
-        if response.status_code != 200:
+        html_content = _fetch_html(ebay_url, EBAY_PAGE_HEADERS)
+        if html_content is None:
             return None
         
-        html_content = response.text
+        return _run_parse(parse_executor, parse_ebay_estimate, html_content)
         
-        # Method 1: Look for PSA data in embedded JSON/JavaScript
-        # eBay often embeds data in window.__INITIAL_STATE__ or similar
-        json_patterns = [
-            r'window\.__INITIAL_STATE__\s*=\s*({.+?});',
-            r'window\.__PRELOADED_STATE__\s*=\s*({.+?});',
-            r'var\s+__INITIAL_STATE__\s*=\s*({.+?});',
-            r'"psaData"[:\s]*({.+?})',
-            r'"psa"[:\s]*({.+?})',
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, html_content, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                try:
-                    data = json.loads(match)
-                    # Recursively search for estimated value
-                    estimate = find_estimated_value_in_dict(data)
-                    if estimate:
-                        return estimate
-                except (json.JSONDecodeError, ValueError):
-                    continue
+    except Exception as e:
+        # Silently fail - we'll fall back to PSA website scraping
+        return None
+
+
+def parse_ebay_estimate(html_content: str) -> Optional[float]:
+    """
+    Find the PSA Estimated Value in an eBay listing page.
+    
+    Args:
+        html_content: Listing page HTML
         
-        # Method 2: Look for PSA data in script tags with specific patterns
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for script in soup.find_all('script'):
-            if not script.string:
-                continue
-                
-            script_text = script.string
-            
-            # Look for PSA-related JSON objects
-            if 'psa' in script_text.lower():
-                # Try to find estimated value patterns
-                estimate_patterns = [
-                    r'"estimatedValue"[:\s]*([\d,]+\.?\d*)',
-                    r'"estimated_value"[:\s]*([\d,]+\.?\d*)',
-                    r'"estimate"[:\s]*([\d,]+\.?\d*)',
-                    r'"psaEstimate"[:\s]*([\d,]+\.?\d*)',
-                    r'estimatedValue["\']?\s*[:=]\s*["\']?([\d,]+\.?\d*)',
-                ]
-                
-                for pattern in estimate_patterns:
-                    matches = re.findall(pattern, script_text, re.IGNORECASE)
-                    for match in matches:
-                        try:
-                            value_str = match.replace(',', '')
-                            value = float(value_str)
-                            if value > 0:
-                                return value
-                        except (ValueError, AttributeError):
-                            continue
-                
-                # Try to extract full JSON objects
-                json_matches = re.findall(r'\{[^{}]*"estimatedValue"[^{}]*\}', script_text, re.IGNORECASE | re.DOTALL)
-                for json_str in json_matches:
+    Returns:
+        Estimated value as float, or None if not found
+    """
+    # Skip the whole pipeline when the page has no PSA/estimate data at all
+    hc_lower = html_content.lower()
+    has_psa = 'psa' in hc_lower
+    if not has_psa and not any(hint in hc_lower for hint in _ESTIMATE_HINTS):
+        return None
+    
+    # Method 1: Look for PSA data in embedded JSON/JavaScript
+    # eBay often embeds data in window.__INITIAL_STATE__ or similar
+    for marker in _JSON_MARKERS:
+        for data in _decode_json_after(html_content, marker):
+            # Recursively search for estimated value
+            estimate = find_estimated_value_in_dict(data)
+            if estimate:
+                return estimate
+    
+    # Method 2: Look for PSA data in script tags with specific patterns
+    # Script bodies are sliced straight out of the HTML; no tree is built for the listing page
+    for script_match in (_SCRIPT_BODY_RE.finditer(html_content) if has_psa else ()):
+        script_text = script_match.group(1)
+        # Look for PSA-related JSON objects
+        if _PSA_KEY_RE.search(script_text):
+            # Try to find estimated value patterns
+            for pattern in _SCRIPT_ESTIMATE_PATTERNS:
+                matches = pattern.findall(script_text)
+                for match in matches:
                     try:
-                        data = json.loads(json_str)
-                        if 'estimatedValue' in data:
-                            value = float(str(data['estimatedValue']).replace(',', ''))
-                            if value > 0:
-                                return value
-                    except (json.JSONDecodeError, ValueError, KeyError):
+                        value_str = match.replace(',', '')
+                        value = float(value_str)
+                        if value > 0:
+                            return value
+                    except (ValueError, AttributeError):
                         continue
-        
-        # Method 3: Look for text patterns in the HTML (might be in hidden divs)
-        text = soup.get_text()
-        estimate_patterns = [
-            r'PSA\s+Estimate[:\s]*\$?([\d,]+\.?\d*)',
-            r'Estimated\s+Value[:\s]*\$?([\d,]+\.?\d*)',
-            r'Est\.\s+Value[:\s]*\$?([\d,]+\.?\d*)',
-            r'\$([\d,]+\.?\d*)\s*\(PSA\s+Estimate\)',
-            r'Estimated\s+Market\s+Value[:\s]*\$?([\d,]+\.?\d*)',
-        ]
-        
-        for pattern in estimate_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
+            
+            # Try to extract full JSON objects
+            for data in _extract_json_objects(script_text, 'estimatedValue'):
                 try:
-                    value_str = match.group(1).replace(',', '')
-                    value = float(value_str)
-                    if value > 0:
-                        return value
-                except (ValueError, AttributeError):
+                    if 'estimatedValue' in data:
+                        value = float(str(data['estimatedValue']).replace(',', ''))
+                        if value > 0:
+                            return value
+                except ValueError:
                     continue
-        
-        # Method 4: Look for data attributes in HTML elements
-        for elem in soup.find_all(['div', 'span', 'td', 'th', 'p'], attrs={'data-psa-estimate': True}):
-            try:
-                value = float(elem.get('data-psa-estimate', '').replace(',', ''))
-                if value > 0:
-                    return value
-            except (ValueError, AttributeError):
-                continue
-        
-        return None
-        
-    except Exception as e:
-        # Silently fail - we'll fall back to PSA website scraping
-        return None
+    
+    # Method 3: Look for text patterns in the HTML (might be in hidden divs)
+    estimate = _find_text_estimate(html_content, _COMBINED_ESTIMATE_RE)
+    if estimate:
+        return estimate
+    
+    # Method 4: Look for data attributes in HTML elements
+    for attr_match in (_PSA_ESTIMATE_ATTR_RE.finditer(html_content) if has_psa else ()):
+        attr_value = html.unescape(next(group for group in attr_match.groups() if group is not None))
+        try:
+            value = float(attr_value.replace(',', ''))
+            if value > 0:
+                return value
+        except (ValueError, AttributeError):
+            continue
+    
+    return None
 
 
 def find_estimated_value_in_dict(data: dict, depth: int = 0) -> Optional[float]:
     """
-    Recursively search a dictionary for estimated value fields.
+    Search a dictionary (and nested dicts/lists) for estimated value fields.
+    
+    Walks the tree depth-first with an explicit stack, checking parents before children.
     
     Args:
         data: Dictionary to search
-        depth: Current recursion depth (max 5 to avoid infinite loops)
+        depth: Starting depth (nesting below depth 5 is not searched)
         
     Returns:
         Estimated value as float, or None if not found
     """
-    if depth > 5:  # Prevent infinite recursion
-        return None
-    
-    if not isinstance(data, dict):
-        return None
-    
-    # Check common keys
-    for key in ['estimatedValue', 'estimated_value', 'estimate', 'psaEstimate', 'psa_estimate', 'estimatedMarketValue']:
-        if key in data:
-            try:
-                value = data[key]
+    stack = [(data, depth)]
+    while stack:
+        node, node_depth = stack.pop()
+        if node_depth > 5 or not isinstance(node, dict):  # Prevent runaway nesting
+            continue
+        
+        # Check common keys (in priority order) only when at least one is present
+        if not _ESTIMATE_KEY_SET.isdisjoint(node):
+            for key in _ESTIMATE_KEYS:
+                if key not in node:
+                    continue
+                value = node[key]
                 if isinstance(value, (int, float)):
                     if value > 0:
                         return float(value)
                 elif isinstance(value, str):
-                    value_str = value.replace(',', '').replace('$', '')
-                    value_float = float(value_str)
+                    try:
+                        value_float = float(value.replace(',', '').replace('$', ''))
+                    except ValueError:
+                        continue
                     if value_float > 0:
                         return value_float
-            except (ValueError, TypeError):
-                continue
-    
-    # Recursively search nested dictionaries
-    for value in data.values():
-        if isinstance(value, dict):
-            result = find_estimated_value_in_dict(value, depth + 1)
-            if result:
-                return result
-        elif isinstance(value, list):
-            for item in value:
-                if isinstance(item, dict):
-                    result = find_estimated_value_in_dict(item, depth + 1)
-                    if result:
-                        return result
+        
+        # Push nested dicts (and dicts inside lists) reversed so they pop in document order
+        children = []
+        for value in node.values():
+            if isinstance(value, dict):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, dict))
+        stack.extend((child, node_depth + 1) for child in reversed(children))
     
     return None
 
 
-def scrape_psa_estimate(cert_number: str, ebay_url: Optional[str] = None) -> Optional[float]:
+def scrape_psa_estimate(
+    cert_number: str,
+    ebay_url: Optional[str] = None,
+    force_refresh: bool = False,
+    parse_executor: Optional[Executor] = None
+) -> Optional[float]:
     """
     Scrape PSA cert page to find EstimatedValue.
     Tries eBay first (if URL provided), then falls back to PSA website.
+    Results are cached on disk per cert: 24 hours for estimates, 1 hour when none was found.
     
     Args:
         cert_number: PSA certification number
         ebay_url: Optional eBay listing URL to try first
+        force_refresh: Scrape again even if a cached estimate exists
+        parse_executor: Optional executor (e.g. ProcessPoolExecutor) to parse pages on
         
     Returns:
         Estimated value as float, or None if not found
     """
+    if not force_refresh:
+        estimate = get_cached_estimate(cert_number)
+        if estimate is not CACHE_MISS:
+            return estimate
+    
+    estimate = _scrape_psa_estimate(cert_number, ebay_url, parse_executor)
+    cache_estimate(cert_number, estimate)
+    return estimate
+
+
+def _scrape_psa_estimate(
+    cert_number: str,
+    ebay_url: Optional[str] = None,
+    parse_executor: Optional[Executor] = None
+) -> Optional[float]:
+    """Scrape the PSA estimate for a cert without consulting the cache."""
     # Method 1: Try eBay listing first (more reliable)
     if ebay_url:
-        estimate = scrape_psa_estimate_from_ebay(ebay_url)
+        estimate = scrape_psa_estimate_from_ebay(ebay_url, parse_executor)
         if estimate:
             return estimate
     
     # Method 2: Fall back to PSA website
     url = f"https://www.psacard.com/cert/{cert_number}/psa"
     
-    scraper = cloudscraper.create_scraper()
-    scraper.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    })
-    
     try:
-        response = scraper.get(url, timeout=30)
-        if response.status_code != 200:
+        html_content = _fetch_html(url, PSA_PAGE_HEADERS)
+        if html_content is None:
             return None
         
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return _run_parse(parse_executor, parse_psa_page_estimate, html_content)
         
-        # Look for PSA Estimate in various formats
-        # Common patterns: "$1,205.93", "PSA Estimate: $1,205.93", etc.
-        text = soup.get_text()
-        
-        # Pattern 1: Look for "PSA Estimate" followed by price
-        estimate_patterns = [
-            r'PSA\s+Estimate[:\s]*\$?([\d,]+\.?\d*)',
-            r'Estimated\s+Value[:\s]*\$?([\d,]+\.?\d*)',
-            r'Est\.\s+Value[:\s]*\$?([\d,]+\.?\d*)',
-            r'\$([\d,]+\.?\d*)\s*\(PSA\s+Estimate\)',
-        ]
+    except Exception as e:
+        print(f"Error scraping PSA estimate for cert {cert_number}: {e}")
+        return None
+
+
+def parse_psa_page_estimate(html_content: str) -> Optional[float]:
+    """
+    Find the estimated value in a PSA cert page.
+    
+    Args:
+        html_content: Cert page HTML
         
-        for pattern in estimate_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
+    Returns:
+        Estimated value as float, or None if not found
+    """
+    # Skip parsing when the page has no estimate at all
+    hc_lower = html_content.lower()
+    has_estimate = 'estimate' in hc_lower
+    if not has_estimate and 'est.' not in hc_lower:
+        return None
+    
+    # Look for PSA Estimate in various formats
+    # Common patterns: "$1,205.93", "PSA Estimate: $1,205.93", etc.
+    
+    # Pattern 1: Look for "PSA Estimate" followed by price (no parse needed)
+    estimate = _find_text_estimate(html_content, _PSA_PAGE_ESTIMATE_RE)
+    if estimate:
+        return estimate
+    
+    # Parse HTML
+    tree = lxml.html.fromstring(html_content)
+    
+    # Pattern 2: Look for price in specific HTML elements
+    # Check for data attributes or specific classes
+    for elem in tree.xpath('//span | //div | //td | //th'):
+        text_elem = elem.text_content()
+        if _ELEMENT_ESTIMATE_RE.search(text_elem):
+            # Look for price in nearby elements
+            price_match = _DOLLAR_RE.search(text_elem)
+            if price_match:
                 try:
-                    value_str = match.group(1).replace(',', '')
+                    value_str = price_match.group(1).replace(',', '')
                     return float(value_str)
+                except ValueError:
+                    continue
+    
+    # Pattern 3: Look for JSON data in script tags
+    for script_text in (tree.xpath('//script/text()') if has_estimate else ()):
+        if _ESTIMATE_WORD_RE.search(script_text):
+            # Try to extract JSON
+            json_match = _ESTIMATE_JSON_RE.search(script_text)
+            if json_match:
+                try:
+                    data = orjson.loads(json_match.group(0))
+                    if 'estimate' in data or 'estimatedValue' in data:
+                        value = data.get('estimate') or data.get('estimatedValue')
+                        if value:
+                            return float(str(value).replace(',', ''))
                 except (ValueError, AttributeError):
                     continue
+    
+    return None
+
+
+def openrouter_headers(
+    openrouter_api_key: str,
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Dict[str, str]:
+    """OpenRouter request headers, with the optional ranking headers when given."""
+    headers = {
+        "Authorization": f"Bearer {openrouter_api_key}",
+        "Content-Type": "application/json",
+    }
+    
+    if site_url:
+        headers["HTTP-Referer"] = site_url
+    if site_name:
+        headers["X-Title"] = site_name
+    return headers
+
+
+def _stream_chat_completion(
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    timeout: float,
+    stop_when: Optional[Callable[[str], bool]] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Run an OpenRouter chat completion as a server-sent event stream.
+    
+    Only the content/reasoning deltas are kept, so the full response body is never
+    buffered and re-parsed.
+    
+    Args:
+        headers: Request headers (Authorization, Content-Type, ...)
+        data: Chat completion payload (stream is switched on here)
+        timeout: Connect/read timeout in seconds
+        stop_when: Optional check called with each new content delta (so it can keep
+            its own state instead of rescanning the content so far); once it returns True
+            the stream is closed early, so the model stops generating
         
-        # Pattern 2: Look for price in specific HTML elements
-        # Check for data attributes or specific classes
-        for elem in soup.find_all(['span', 'div', 'td', 'th']):
-            text_elem = elem.get_text()
-            if 'estimate' in text_elem.lower() or 'est. value' in text_elem.lower():
-                # Look for price in nearby elements
-                price_match = re.search(r'\$([\d,]+\.?\d*)', text_elem)
-                if price_match:
-                    try:
-                        value_str = price_match.group(1).replace(',', '')
-                        return float(value_str)
-                    except ValueError:
-                        continue
-        
-        # Pattern 3: Look for JSON data in script tags
-        for script in soup.find_all('script'):
-            if script.string and 'estimate' in script.string.lower():
-                # Try to extract JSON
-                json_match = re.search(r'\{[^}]*estimate[^}]*\}', script.string, re.IGNORECASE)
-                if json_match:
-                    try:
-                        data = json.loads(json_match.group(0))
-                        if 'estimate' in data or 'estimatedValue' in data:
-                            value = data.get('estimate') or data.get('estimatedValue')
-                            if value:
-                                return float(str(value).replace(',', ''))
-                    except (json.JSONDecodeError, ValueError, AttributeError):
-                        continue
-        
-        return None
+    Returns:
+        (content, reasoning) strings, or None if the request failed
+    """
+    content_parts = []
+    reasoning_parts = []
+    
+    with _OPENROUTER_SESSION.post(
+        url=OPENROUTER_URL,
+        headers=headers,
+        data=orjson.dumps({**data, "stream": True}),
+        timeout=timeout,
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            print(f"OpenRouter API error: {response.status_code} - {response.text}")
+            return None
         
-    except Exception as e:
-        print(f"Error scraping PSA estimate for cert {cert_number}: {e}")
+        for line in response.iter_lines():
+            # Skip blank separators and ": OPENROUTER PROCESSING" keep-alive comments
+            if not line.startswith(b'data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == b'[DONE]':
+                break
+            
+            chunk = orjson.loads(payload)
+            if "error" in chunk:
+                print(f"OpenRouter API error: {chunk['error']}")
+                return None
+            
+            choices = chunk.get("choices")
+            if not choices:
+                continue
+            delta = choices[0].get("delta") or {}
+            if delta.get("reasoning"):
+                reasoning_parts.append(delta["reasoning"])
+            if delta.get("content"):
+                content_parts.append(delta["content"])
+                if stop_when is not None and stop_when(delta["content"]):
+                    break
+    
+    return "".join(content_parts), "".join(reasoning_parts)
+
+
+def _json_object_closer() -> Callable[[str], bool]:
+    """
+    Incremental check for a complete top-level JSON object in streamed text.
+    
+    Returns:
+        feed(delta) function; returns True once the text fed so far contains a complete
+        top-level JSON object (braces inside strings ignored). Each character is scanned once.
+    """
+    depth = 0
+    started = in_string = escaped = False
+    
+    def feed(delta: str) -> bool:
+        nonlocal depth, started, in_string, escaped
+        if not started:
+            start = delta.find('{')
+            if start < 0:
+                return False
+            started = True
+            delta = delta[start:]
+        for char in delta:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return True
+        return False
+    
+    return feed
+
+
+def _parse_listing(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Title, price, URL and shipping of a Browse API item summary.
+    
+    Args:
+        item: Item summary from a search response
+    
+    Returns:
+        Listing dict, or None if the item isn't priced in USD
+    """
+    price_obj = item.get("price", {})
+    if price_obj.get("currency") != "USD":
         return None
+    
+    # An empty shippingOptions list counts as free shipping
+    shipping_options = item.get("shippingOptions") or [{}]
+    return {
+        "title": item.get("title", ""),
+        "price": float(price_obj.get("value", 0)),
+        "url": item.get("itemWebUrl", ""),
+        "shipping": float(shipping_options[0].get("shippingCost", {}).get("value", 0)),
+    }
 
 
 def search_ebay_listings(
@@ -341,26 +861,30 @@ def search_ebay_listings(
         
         response = requests.get(url, headers=headers, params=params, timeout=30)
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             for item in data.get("itemSummaries", []):
-                price_obj = item.get("price", {})
-                if price_obj.get("currency") == "USD":
-                    price = float(price_obj.get("value", 0))
-                    results["active_listings"].append({
-                        "title": item.get("title", ""),
-                        "price": price,
-                        "url": item.get("itemWebUrl", ""),
-                        "shipping": float(item.get("shippingOptions", [{}])[0].get("shippingCost", {}).get("value", 0)),
-                    })
+                listing = _parse_listing(item)
+                if listing:
+                    results["active_listings"].append(listing)
         
         # Note: Sold listings require a different endpoint or web scraping
         # For now, we'll use active listings as a proxy
         
-        if results["active_listings"]:
-            prices = [item["price"] for item in results["active_listings"]]
-            results["average_price"] = sum(prices) / len(prices)
-            results["min_price"] = min(prices)
-            results["max_price"] = max(prices)
+        active_listings = results["active_listings"]
+        if active_listings:
+            # Average/min/max in a single pass over the listings
+            total = 0.0
+            min_price = max_price = active_listings[0]["price"]
+            for item in active_listings:
+                price = item["price"]
+                total += price
+                if price < min_price:
+                    min_price = price
+                elif price > max_price:
+                    max_price = price
+            results["average_price"] = total / len(active_listings)
+            results["min_price"] = min_price
+            results["max_price"] = max_price
             
     except Exception as e:
         print(f"Error searching eBay: {e}")
@@ -374,10 +898,12 @@ def deep_research_pricing(
     openrouter_api_key: str,
     ebay_oauth: Optional[str] = None,
     site_url: Optional[str] = None,
-    site_name: Optional[str] = None
+    site_name: Optional[str] = None,
+    force_refresh: bool = False
 ) -> Optional[Dict[str, Any]]:
     """
     Use OpenRouter deep research model to find card pricing and arbitrage opportunities.
+    Results are cached on disk per cert and card details (failures for a shorter time).
     
     Args:
         cert_number: PSA certification number
@@ -385,6 +911,7 @@ def deep_research_pricing(
         openrouter_api_key: OpenRouter API key
         site_url: Optional site URL for OpenRouter rankings
         site_name: Optional site name for OpenRouter rankings
+        force_refresh: Research again even if a cached result exists
         
     Returns:
         Dictionary with research results including pricing and arbitrage opportunities
@@ -392,6 +919,27 @@ def deep_research_pricing(
     if not openrouter_api_key:
         return None
     
+    card_hash = hashlib.sha256(orjson.dumps(card_info, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()[:16]
+    cache_key = f"research:{cert_number}:{card_hash}"
+    if not force_refresh:
+        research = cache_get(cache_key)
+        if research is not CACHE_MISS:
+            return research
+    
+    research = _deep_research_pricing(cert_number, card_info, openrouter_api_key, ebay_oauth, site_url, site_name)
+    cache_put(cache_key, research, _PSA_ESTIMATE_TTL if research else _NEGATIVE_RESULT_TTL)
+    return research
+
+
+def _deep_research_pricing(
+    cert_number: str,
+    card_info: Dict[str, Any],
+    openrouter_api_key: str,
+    ebay_oauth: Optional[str] = None,
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Run the deep research for a card without consulting the cache."""
     # Build research prompt
     card_description = f"""
     PSA Certification: {cert_number}
@@ -434,15 +982,7 @@ Please find:
 
 Provide a detailed analysis with specific prices and sources."""
 
-    headers = {
-        "Authorization": f"Bearer {openrouter_api_key}",
-        "Content-Type": "application/json",
-    }
-    
-    if site_url:
-        headers["HTTP-Referer"] = site_url
-    if site_name:
-        headers["X-Title"] = site_name
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
     
     data = {
         "model": "openai/o4-mini-deep-research",
@@ -457,16 +997,10 @@ Provide a detailed analysis with specific prices and sources."""
     }
     
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=120  # Deep research may take longer
-        )
+        completion = _stream_chat_completion(headers, data, timeout=120)  # Deep research may take longer
         
-        if response.status_code == 200:
-            result = response.json()
-            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        if completion is not None:
+            content, _ = completion
             
             # Try to extract pricing information from the response
             pricing_info = {
@@ -478,7 +1012,7 @@ Provide a detailed analysis with specific prices and sources."""
             }
             
             # Extract PSA Estimate from research
-            psa_match = re.search(r'PSA\s+Estimate[:\s]*\$?([\d,]+\.?\d*)', content, re.IGNORECASE)
+            psa_match = _PSA_ESTIMATE_RE.search(content)
             if psa_match:
                 try:
                     pricing_info["psa_estimate"] = float(psa_match.group(1).replace(',', ''))
@@ -486,7 +1020,7 @@ Provide a detailed analysis with specific prices and sources."""
                     pass
             
             # Extract eBay prices from AI response
-            ebay_matches = re.findall(r'eBay[:\s]*\$?([\d,]+\.?\d*)', content, re.IGNORECASE)
+            ebay_matches = _EBAY_PRICE_RE.findall(content)
             for match in ebay_matches:
                 try:
                     pricing_info["ebay_sold_prices"].append(float(match.replace(',', '')))
@@ -504,7 +1038,6 @@ Provide a detailed analysis with specific prices and sources."""
             
             return pricing_info
         else:
-            print(f"OpenRouter API error: {response.status_code} - {response.text}")
             return None
             
     except Exception as e:
@@ -546,15 +1079,7 @@ Return JSON:
 
 Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
 
-    headers = {
-        "Authorization": f"Bearer {openrouter_api_key}",
-        "Content-Type": "application/json",
-    }
-    
-    if site_url:
-        headers["HTTP-Referer"] = site_url
-    if site_name:
-        headers["X-Title"] = site_name
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
     
     # Try a model better suited for structured output
     # o4-mini-deep-research may not output content properly, try gpt-4o-mini instead
@@ -571,18 +1096,10 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
     }
     
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=180  # Deep research may take longer
-        )
+        completion = _stream_chat_completion(headers, data, timeout=180)  # Deep research may take longer
         
-        if response.status_code == 200:
-            result = response.json()
-            message = result.get("choices", [{}])[0].get("message", {})
-            content = message.get("content", "")
-            reasoning = message.get("reasoning", "")
+        if completion is not None:
+            content, reasoning = completion
             
             # o4-mini-deep-research may put output in reasoning field
             if not content and reasoning:
@@ -591,17 +1108,14 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
             # Try to parse JSON response
             try:
                 # Clean up content - remove markdown code blocks, whitespace
-                content = re.sub(r'```json\s*', '', content)
-                content = re.sub(r'```\s*$', '', content)
-                content = re.sub(r'^```\s*', '', content)
-                content = content.strip()
+                content = _MD_JSON_RE.sub('', content).strip()
                 
                 # Try to extract JSON object if wrapped in text
-                json_match = re.search(r'\{[^{}]*"listings"[^{}]*\[.*?\]\s*\}', content, re.DOTALL)
+                json_match = _LISTINGS_JSON_RE.search(content)
                 if json_match:
                     content = json_match.group(0)
                 
-                parsed = json.loads(content)
+                parsed = orjson.loads(content)
                 
                 # Handle different response formats
                 if isinstance(parsed, dict):
@@ -618,7 +1132,7 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                     if isinstance(listing, dict) and listing.get("cert_number"):
                         # Ensure cert_number is string and clean
                         cert = str(listing.get("cert_number", "")).strip()
-                        if cert and re.match(r'^\d{7,9}$', cert):
+                        if _is_cert_number(cert):
                             cleaned_listings.append({
                                 "title": listing.get("title", ""),
                                 "cert_number": cert,
@@ -631,7 +1145,7 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                             })
                 
                 return cleaned_listings
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 # If JSON parsing fails, try to extract listings from text
                 print(f"Warning: Could not parse AI response as JSON: {e}")
                 print(f"Content length: {len(content)} chars")
@@ -644,19 +1158,18 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                 listings = []
                 
                 # Pattern 1: Look for any 7-9 digit numbers (potential cert numbers)
-                all_numbers = re.findall(r'\b(\d{7,9})\b', content)
+                # One pass records where each number first appears, so context lookups need no rescans
+                cert_spans = {}
+                for number_match in _CERT_NUMBER_RE.finditer(content):
+                    cert_spans.setdefault(number_match.group(1), number_match.span(1))
+                all_numbers = list(cert_spans)
                 print(f"Found {len(all_numbers)} potential cert numbers: {all_numbers[:20]}")
                 
                 # Pattern 2: Look for cert numbers with context
                 # Try to find patterns like "cert 12345678" or "PSA #12345678" or "certification number: 12345678"
-                cert_patterns = [
-                    r'(?:cert|certification|PSA\s*#?|cert\s*#?)[:\s]*(\d{7,9})',
-                    r'(\d{7,9})(?:\s*PSA|\s*cert)',
-                ]
-                
                 cert_matches = []
-                for pattern in cert_patterns:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
+                for pattern in _CERT_CONTEXT_PATTERNS:
+                    matches = pattern.findall(content)
                     cert_matches.extend(matches)
                 
                 # Also try all 7-9 digit numbers as potential certs
@@ -664,29 +1177,26 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                     cert_matches = all_numbers[:limit]
                 
                 # Remove duplicates while preserving order
-                seen = set()
-                unique_certs = []
-                for cert in cert_matches:
-                    if cert not in seen:
-                        seen.add(cert)
-                        unique_certs.append(cert)
+                unique_certs = list(dict.fromkeys(cert_matches))
                 
                 print(f"Using {len(unique_certs)} cert numbers: {unique_certs[:10]}")
                 
                 # For each cert, try to extract price and other info from nearby text
                 for cert in unique_certs[:limit]:
                     # Find context around this cert number
-                    cert_index = content.find(cert)
-                    if cert_index == -1:
-                        continue
+                    span = cert_spans.get(cert)
+                    if span is None:
+                        # Context patterns can capture digits that aren't a standalone number
+                        cert_index = content.find(cert)
+                        if cert_index == -1:
+                            continue
+                        span = (cert_index, cert_index + len(cert))
                     
                     # Extract 500 chars before and after
-                    start = max(0, cert_index - 500)
-                    end = min(len(content), cert_index + len(cert) + 500)
-                    context = content[start:end]
+                    context = content[max(0, span[0] - 500):span[1] + 500]
                     
                     # Try to extract price
-                    price_match = re.search(r'\$?(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', context)
+                    price_match = _PRICE_RE.search(context)
                     price = 0
                     if price_match:
                         try:
@@ -696,7 +1206,7 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                             pass
                     
                     # Try to extract title/card name
-                    title_match = re.search(r'([A-Z][A-Z\s\-!]+(?:DRAGON|MAGICIAN|GUARDIAN|BEAST|WARRIOR|SPELLCASTER))', context, re.IGNORECASE)
+                    title_match = _CARD_NAME_RE.search(context)
                     card_name = title_match.group(1).strip() if title_match else ""
                     
                     listings.append({
@@ -712,7 +1222,6 @@ Only PSA 10, 1st Edition, Buy It Now. Return JSON only."""
                 
                 return listings
         else:
-            print(f"OpenRouter API error: {response.status_code} - {response.text}")
             return []
             
     except Exception as e:
@@ -726,13 +1235,16 @@ def analyze_arbitrage_opportunities(
     tax_rate: float = 0.09,
     site_url: Optional[str] = None,
     site_name: Optional[str] = None,
-    model: str = "moonshotai/kimi-k2-thinking"
+    model: str = "moonshotai/kimi-k2-thinking",
+    max_workers: int = 10,
+    use_async: bool = False,
+    parse_processes: int = 0
 ) -> List[Dict[str, Any]]:
     """
     Analyze listings for arbitrage opportunities with LLM insights.
     
     For each listing:
-    1. Scrape PSA cert page for EstimatedValue
+    1. Scrape PSA cert page for EstimatedValue (all listings are scraped concurrently)
     2. Calculate all-in cost (price + shipping + tax)
     3. Calculate spread (PSA Estimate - all-in cost)
     4. Use LLM to analyze and provide insights on opportunities
@@ -744,23 +1256,46 @@ def analyze_arbitrage_opportunities(
         site_url: Optional site URL for OpenRouter
         site_name: Optional site name for OpenRouter
         model: LLM model to use (default: moonshotai/kimi-k2-thinking)
+        max_workers: Number of concurrent PSA estimate scrapes
+        use_async: Scrape pages and request LLM insights concurrently on httpx clients instead
+            of the thread pool (faster, but without cloudscraper's Cloudflare handling)
+        parse_processes: Parse fetched pages on a pool of this many processes (0 parses in-line);
+            worth it for large batches, where parsing would otherwise contend for the GIL
         
     Returns:
         List of arbitrage opportunities with spread calculations and LLM insights
     """
     opportunities = []
+    listings = [listing for listing in listings if listing.get("cert_number")]
+    if not listings:
+        return opportunities
     
-    for listing in listings:
-        cert_number = listing.get("cert_number")
-        if not cert_number:
-            continue
-        
+    # Step 1: Scrape PSA estimates concurrently (try eBay first if URL available)
+    print(f"Scraping PSA estimates for {len(listings)} certs...")
+    parse_executor = ProcessPoolExecutor(max_workers=parse_processes) if parse_processes else None
+    try:
+        if use_async:
+            from lib.research_agent_async import scrape_psa_estimates_async
+            psa_estimates = asyncio.run(scrape_psa_estimates_async(listings, parse_executor=parse_executor))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                psa_estimates = list(executor.map(
+                    lambda listing: scrape_psa_estimate(
+                        listing["cert_number"],
+                        ebay_url=listing.get("url") or None,
+                        parse_executor=parse_executor
+                    ),
+                    listings
+                ))
+    finally:
+        if parse_executor is not None:
+            parse_executor.shutdown()
+    
+    insight_candidates = []
+    for listing, psa_estimate in zip(listings, psa_estimates):
+        cert_number = listing["cert_number"]
         print(f"Analyzing cert {cert_number}...")
         
-        # Step 1: Scrape PSA estimate (try eBay first if URL available)
-        ebay_url = listing.get("url", "")
-        psa_estimate = scrape_psa_estimate(cert_number, ebay_url=ebay_url if ebay_url else None)
-        
         # Step 2: Calculate costs
         price = listing.get("price", 0)
         shipping = listing.get("shipping", 0)
@@ -797,23 +1332,9 @@ def analyze_arbitrage_opportunities(
             "ai_insights": None,
         }
         
-        # Step 5: Use LLM for deeper analysis if this is an arbitrage opportunity
+        # Step 5 (below): queue arbitrage opportunities for LLM analysis
         if is_arbitrage and openrouter_api_key and psa_estimate:
-            try:
-                print(f"  🤖 Getting AI insights for cert {cert_number}...")
-                ai_insights = get_llm_arbitrage_insights(
-                    listing=listing,
-                    psa_estimate=psa_estimate,
-                    spread=spread,
-                    spread_pct=spread_pct,
-                    openrouter_api_key=openrouter_api_key,
-                    model=model,
-                    site_url=site_url,
-                    site_name=site_name
-                )
-                opportunity["ai_insights"] = ai_insights
-            except Exception as e:
-                print(f"  ⚠️ LLM analysis failed: {e}")
+            insight_candidates.append((opportunity, (listing, psa_estimate, spread, spread_pct)))
         
         opportunities.append(opportunity)
         
@@ -824,9 +1345,117 @@ def analyze_arbitrage_opportunities(
             else:
                 print(f"  [No arbitrage] Spread = ${spread:.2f} (PSA Est: ${psa_estimate:.2f} < Cost: ${all_in_cost:.2f})")
     
+    # Step 5: Use LLM for deeper analysis, several opportunities per request
+    if insight_candidates:
+        print(f"🤖 Getting AI insights for {len(insight_candidates)} arbitrage opportunities...")
+        cards = [card for _, card in insight_candidates]
+        if use_async:
+            from lib.research_agent_async import get_arbitrage_insights_async
+            insights = asyncio.run(get_arbitrage_insights_async(cards, openrouter_api_key, model, site_url, site_name))
+        else:
+            insights = get_arbitrage_insights(cards, openrouter_api_key, model, site_url, site_name)
+        for (opportunity, _), ai_insights in zip(insight_candidates, insights):
+            opportunity["ai_insights"] = ai_insights
+    
     return opportunities
 
 
+def get_arbitrage_insights(
+    cards: List[Tuple[Dict[str, Any], float, float, float]],
+    openrouter_api_key: str,
+    model: str = "moonshotai/kimi-k2-thinking",
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> List[Optional[str]]:
+    """
+    Get LLM insights on many arbitrage opportunities, INSIGHT_BATCH_SIZE per request.
+    Cards a batch fails to cover fall back to a single-card request.
+    
+    Args:
+        cards: (listing, psa_estimate, spread, spread_pct) for each opportunity
+        openrouter_api_key: OpenRouter API key
+        model: LLM model to use
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+        
+    Returns:
+        Insights in the same order as cards (None where none could be generated)
+    """
+    insights = []
+    for start in range(0, len(cards), INSIGHT_BATCH_SIZE):
+        batch = cards[start:start + INSIGHT_BATCH_SIZE]
+        batch_insights = get_llm_arbitrage_insights_batch(
+            batch,
+            openrouter_api_key=openrouter_api_key,
+            model=model,
+            site_url=site_url,
+            site_name=site_name
+        ) or [None] * len(batch)
+        
+        for (listing, psa_estimate, spread, spread_pct), ai_insights in zip(batch, batch_insights):
+            if ai_insights is None:
+                try:
+                    ai_insights = get_llm_arbitrage_insights(
+                        listing=listing,
+                        psa_estimate=psa_estimate,
+                        spread=spread,
+                        spread_pct=spread_pct,
+                        openrouter_api_key=openrouter_api_key,
+                        model=model,
+                        site_url=site_url,
+                        site_name=site_name
+                    )
+                except Exception as e:
+                    print(f"  ⚠️ LLM analysis failed for cert {listing.get('cert_number')}: {e}")
+            insights.append(ai_insights)
+    return insights
+
+
+def _insight_fields(
+    listing: Dict[str, Any],
+    psa_estimate: float,
+    spread: float,
+    spread_pct: float
+) -> Dict[str, Any]:
+    """Values for the arbitrage insight prompt templates, reading each listing field once."""
+    price = listing.get('price', 0)
+    shipping = listing.get('shipping', 0)
+    return {
+        "title": listing.get('title', 'Unknown'),
+        "cert": listing.get('cert_number', 'N/A'),
+        "price": price,
+        "shipping": shipping,
+        "total": price + shipping,
+        "psa_estimate": psa_estimate,
+        "spread": spread,
+        "spread_pct": spread_pct,
+    }
+
+
+def arbitrage_insight_payload(
+    listing: Dict[str, Any],
+    psa_estimate: float,
+    spread: float,
+    spread_pct: float,
+    model: str
+) -> Dict[str, Any]:
+    """Chat completion payload asking for insights on one arbitrage opportunity."""
+    prompt = _INSIGHT_PROMPT.format_map(_insight_fields(listing, psa_estimate, spread, spread_pct))
+    
+    data = {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.7,
+        "max_tokens": 300,
+    }
+    return data
+
+
 def get_llm_arbitrage_insights(
     listing: Dict[str, Any],
     psa_estimate: float,
@@ -853,32 +1482,39 @@ def get_llm_arbitrage_insights(
     Returns:
         AI insights string or None
     """
-    prompt = f"""Analyze this PSA card arbitrage opportunity:
-
-Card: {listing.get('title', 'Unknown')}
-PSA Cert: {listing.get('cert_number', 'N/A')}
-eBay Price: ${listing.get('price', 0):.2f}
-Shipping: ${listing.get('shipping', 0):.2f}
-Total Cost: ${listing.get('price', 0) + listing.get('shipping', 0):.2f}
-PSA Estimate: ${psa_estimate:.2f}
-Potential Profit: ${spread:.2f} ({spread_pct:.1f}%)
-
-Provide a brief analysis (2-3 sentences) on:
-1. Whether this is a good arbitrage opportunity
-2. Market factors to consider
-3. Risk assessment
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
+    data = arbitrage_insight_payload(listing, psa_estimate, spread, spread_pct, model)
+    
+    try:
+        response = _OPENROUTER_SESSION.post(
+            url=OPENROUTER_URL,
+            headers=headers,
+            data=orjson.dumps(data),
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+            return content.strip() if content else None
+        else:
+            print(f"  OpenRouter API error: {response.status_code} - {response.text}")
+            return None
+    except Exception as e:
+        print(f"  Error calling LLM: {e}")
+        return None
 
-Be concise and actionable."""
 
-    headers = {
-        "Authorization": f"Bearer {openrouter_api_key}",
-        "Content-Type": "application/json",
-    }
-    
-    if site_url:
-        headers["HTTP-Referer"] = site_url
-    if site_name:
-        headers["X-Title"] = site_name
+def arbitrage_batch_payload(
+    cards: List[Tuple[Dict[str, Any], float, float, float]],
+    model: str
+) -> Dict[str, Any]:
+    """Chat completion payload asking for insights on several arbitrage opportunities."""
+    cards_text = "\n".join(
+        _BATCH_INSIGHT_LINE.format(idx=idx, **_insight_fields(*card))
+        for idx, card in enumerate(cards)
+    )
+    prompt = _BATCH_INSIGHT_PROMPT.format(cards=cards_text)
     
     data = {
         "model": model,
@@ -889,26 +1525,81 @@ Be concise and actionable."""
             }
         ],
         "temperature": 0.7,
-        "max_tokens": 300,
+        "max_tokens": 300 * len(cards),
+        "response_format": {"type": "json_object"},
     }
+    return data
+
+
+def parse_batch_insights(content: Optional[str], count: int) -> List[Optional[str]]:
+    """
+    Parse a batched insights reply ({"insights": [{"idx": 0, "text": "..."}]}).
+    
+    Args:
+        content: Model reply
+        count: Number of cards in the batch
+        
+    Returns:
+        Insights by card index (None for any the reply skipped)
+    
+    Raises:
+        orjson.JSONDecodeError: If the reply isn't JSON
+    """
+    parsed = orjson.loads(_MD_JSON_RE.sub('', content or '').strip())
+    
+    insights: List[Optional[str]] = [None] * count
+    for entry in parsed.get("insights", []):
+        try:
+            idx = int(entry.get("idx"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        text = entry.get("text")
+        if 0 <= idx < count and isinstance(text, str) and text.strip():
+            insights[idx] = text.strip()
+    return insights
+
+
+def get_llm_arbitrage_insights_batch(
+    cards: List[Tuple[Dict[str, Any], float, float, float]],
+    openrouter_api_key: str,
+    model: str = "moonshotai/kimi-k2-thinking",
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Optional[List[Optional[str]]]:
+    """
+    Get LLM insights on several arbitrage opportunities with a single request.
+    
+    Args:
+        cards: (listing, psa_estimate, spread, spread_pct) for each opportunity
+        openrouter_api_key: OpenRouter API key
+        model: LLM model to use
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+        
+    Returns:
+        Insights in the same order as cards (None for any the model skipped),
+        or None if the request failed
+    """
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
+    data = arbitrage_batch_payload(cards, model)
     
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
+        response = _OPENROUTER_SESSION.post(
+            url=OPENROUTER_URL,
             headers=headers,
-            json=data,
-            timeout=30
+            data=orjson.dumps(data),
+            timeout=60
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            return content.strip() if content else None
-        else:
+        if response.status_code != 200:
             print(f"  OpenRouter API error: {response.status_code} - {response.text}")
             return None
+        
+        result = orjson.loads(response.content)
+        content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        return parse_batch_insights(content, len(cards))
     except Exception as e:
-        print(f"  Error calling LLM: {e}")
+        print(f"  Error calling LLM (batch): {e}")
         return None
 
 
@@ -952,25 +1643,18 @@ def get_card_pricing(
     return None
 
 
-def extract_cert_from_image(
+def cert_image_request(
     image_path: str,
     openrouter_api_key: str,
-    model: str = "anthropic/claude-opus-4.5",  # Claude Opus 4.5
+    model: str,
     site_url: Optional[str] = None,
     site_name: Optional[str] = None
-) -> Optional[str]:
+) -> Optional[Tuple[Dict[str, str], Dict[str, Any]]]:
     """
-    Extract PSA certification number from a card image using OpenRouter vision models.
+    Build the OpenRouter vision request for extracting a cert number from an image.
     
-    Args:
-        image_path: Path to the image file (PNG, JPG, etc.)
-        openrouter_api_key: OpenRouter API key
-        model: Vision model to use (default: claude-opus-4.5, alternatives: gpt-4o, gpt-4o-mini)
-        site_url: Optional site URL for OpenRouter
-        site_name: Optional site name for OpenRouter
-        
     Returns:
-        PSA certification number as string, or None if not found
+        (headers, payload), or None if the key is missing or the image can't be read
     """
     if not openrouter_api_key:
         print("Error: OPENROUTER_API_KEY not provided")
@@ -980,52 +1664,23 @@ def extract_cert_from_image(
         print(f"Error: Image file not found: {image_path}")
         return None
     
-    # Read and encode image as base64
+    # mmap can't map an empty file, and there would be no cert to read anyway
+    if os.path.getsize(image_path) == 0:
+        print(f"Error: Image file is empty: {image_path}")
+        return None
+    
+    # Read and encode image as base64 (encoded straight from a memory map, without copying the file into RAM)
     try:
-        with open(image_path, 'rb') as image_file:
-            image_data = image_file.read()
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+        with open(image_path, 'rb') as image_file, mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_data:
+            base64_image = base64.b64encode(image_data).decode('ascii')
     except Exception as e:
         print(f"Error reading image file: {e}")
         return None
     
     # Determine image MIME type from file extension
-    ext = os.path.splitext(image_path)[1].lower()
-    mime_types = {
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp',
-    }
-    mime_type = mime_types.get(ext, 'image/png')
-    
-    # Create prompt
-    prompt = """Look at this PSA-graded trading card image and extract the PSA certification number.
-
-The certification number is typically:
-- A 7-9 digit number
-- Located on the PSA label/slab
-- Usually near the top or bottom of the label
-- May be labeled as "Cert #", "Certification Number", or just shown as a number
-
-Please extract ONLY the certification number (digits only, no spaces or dashes).
-If you cannot find a certification number, respond with "NOT_FOUND".
-
-Format your response as a JSON object:
-{
-  "cert_number": "12345678" or "NOT_FOUND"
-}"""
-    
-    headers = {
-        "Authorization": f"Bearer {openrouter_api_key}",
-        "Content-Type": "application/json",
-    }
+    mime_type = _IMAGE_MIME_TYPES.get(os.path.splitext(image_path)[1].lower(), 'image/png')
     
-    if site_url:
-        headers["HTTP-Referer"] = site_url
-    if site_name:
-        headers["X-Title"] = site_name
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
     
     # Prepare message with image
     data = {
@@ -1036,7 +1691,7 @@ Format your response as a JSON object:
                 "content": [
                     {
                         "type": "text",
-                        "text": prompt
+                        "text": _CERT_PROMPT
                     },
                     {
                         "type": "image_url",
@@ -1050,52 +1705,89 @@ Format your response as a JSON object:
         "max_tokens": 200,
         "response_format": {"type": "json_object"}  # Request JSON format
     }
+    return headers, data
+
+
+def parse_cert_response(content: str) -> Optional[str]:
+    """
+    Pull the cert number out of a vision model reply.
     
+    Args:
+        content: Model reply (JSON object, possibly fenced, or plain text)
+        
+    Returns:
+        PSA certification number as string, or None if not found
+    """
+    # Try to parse JSON response
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=60
-        )
+        # Clean up content
+        content = _MD_JSON_RE.sub('', content).strip()
         
-        if response.status_code == 200:
-            result = response.json()
-            message = result.get("choices", [{}])[0].get("message", {})
-            content = message.get("content", "")
-            
-            # Try to parse JSON response
-            try:
-                # Clean up content
-                content = re.sub(r'```json\s*', '', content)
-                content = re.sub(r'```\s*$', '', content)
-                content = re.sub(r'^```\s*', '', content)
-                content = content.strip()
-                
-                parsed = json.loads(content)
-                cert_number = parsed.get("cert_number", "")
-                
-                if cert_number and cert_number != "NOT_FOUND":
-                    # Validate it's a 7-9 digit number
-                    if re.match(r'^\d{7,9}$', cert_number):
-                        return cert_number
-                    else:
-                        print(f"Warning: Extracted cert number doesn't match expected format: {cert_number}")
-                        return None
-                else:
-                    print("Model could not find certification number in image")
-                    return None
-                    
-            except json.JSONDecodeError:
-                # Try to extract cert number from plain text
-                cert_match = re.search(r'\b(\d{7,9})\b', content)
-                if cert_match:
-                    return cert_match.group(1)
-                print(f"Could not parse response as JSON: {content[:200]}")
+        parsed = orjson.loads(content)
+        cert_number = parsed.get("cert_number", "")
+        
+        if cert_number and cert_number != "NOT_FOUND":
+            # Validate it's a 7-9 digit number
+            if _is_cert_number(cert_number):
+                return cert_number
+            else:
+                print(f"Warning: Extracted cert number doesn't match expected format: {cert_number}")
                 return None
         else:
-            print(f"OpenRouter API error: {response.status_code} - {response.text[:200]}")
+            print("Model could not find certification number in image")
+            return None
+            
+    except orjson.JSONDecodeError:
+        # Try to extract cert number from plain text
+        cert_match = _CERT_NUMBER_RE.search(content)
+        if cert_match:
+            return cert_match.group(1)
+        print(f"Could not parse response as JSON: {content[:200]}")
+        return None
+
+
+def extract_cert_from_image(
+    image_path: str,
+    openrouter_api_key: str,
+    model: str = "anthropic/claude-opus-4.5",  # Claude Opus 4.5
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Optional[str]:
+    """
+    Extract PSA certification number from a card image using OpenRouter vision models.
+    
+    Args:
+        image_path: Path to the image file (PNG, JPG, etc.)
+        openrouter_api_key: OpenRouter API key
+        model: Vision model to use (default: claude-opus-4.5, alternatives: gpt-4o, gpt-4o-mini)
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+        
+    Returns:
+        PSA certification number as string, or None if not found
+    """
+    # Certs found in an image are cached by the image's content hash
+    digest = image_digest(image_path)
+    if digest:
+        cert_number = cache_get(f"cert_image:{digest}")
+        if cert_number is not CACHE_MISS:
+            return cert_number
+    
+    request = cert_image_request(image_path, openrouter_api_key, model, site_url, site_name)
+    if request is None:
+        return None
+    headers, data = request
+    
+    try:
+        # Streamed so the request can be dropped as soon as the JSON object closes
+        completion = _stream_chat_completion(headers, data, timeout=60, stop_when=_json_object_closer())
+        if completion is None:
             return None
+        
+        cert_number = parse_cert_response(completion[0])
+        if cert_number and digest:
+            cache_put(f"cert_image:{digest}", cert_number, CERT_IMAGE_TTL)
+        return cert_number
             
     except Exception as e:
         print(f"Error calling OpenRouter API: {e}")
@@ -0,0 +1,345 @@
+"""
+Research Agent (async)
+asyncio/httpx variants of the PSA estimate scrapers and OpenRouter calls in lib.research_agent.
+All requests in a batch share one AsyncClient (HTTP/2 keep-alive), with a cap on concurrent requests per host.
+Unlike the cloudscraper session used by the sync scrapers, httpx does not solve Cloudflare challenges.
+"""
+import asyncio
+import weakref
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+import orjson
+from lib.file_cache import CACHE_MISS
+from lib.http_session import create_async_client
+from lib.research_agent import (
+    CERT_IMAGE_TTL,
+    EBAY_PAGE_HEADERS,
+    INSIGHT_BATCH_SIZE,
+    MAX_HTML_BYTES,
+    MAX_REQUESTS_PER_HOST,
+    OPENROUTER_URL,
+    PSA_PAGE_HEADERS,
+    arbitrage_batch_payload,
+    arbitrage_insight_payload,
+    cache_estimate,
+    cache_get,
+    cache_put,
+    cert_image_request,
+    get_cached_estimate,
+    image_digest,
+    openrouter_headers,
+    parse_batch_insights,
+    parse_cert_response,
+    parse_ebay_estimate,
+    parse_psa_page_estimate,
+)
+
+# Concurrent OpenRouter requests per batch of insight calls
+_MAX_LLM_REQUESTS = 8
+
+# Per-host semaphores for each event loop (asyncio primitives can't be shared across loops)
+_HOST_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def _host_slot(url: str) -> asyncio.Semaphore:
+    """Semaphore limiting concurrent requests to the URL's host on the running event loop."""
+    semaphores = _HOST_SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    host = urlsplit(url).netloc
+    semaphore = semaphores.get(host)
+    if semaphore is None:
+        semaphore = semaphores[host] = asyncio.Semaphore(MAX_REQUESTS_PER_HOST)
+    return semaphore
+
+
+async def _fetch_html(client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> Optional[str]:
+    """
+    Fetch a page, stopping once MAX_HTML_BYTES have arrived.
+    
+    Args:
+        client: Shared AsyncClient
+        url: Page URL
+        headers: Request headers
+    
+    Returns:
+        Decoded (possibly truncated) body, or None on a non-200 response
+    """
+    chunks = []
+    total = 0
+    async with _host_slot(url):
+        async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+            if response.status_code != 200:
+                return None
+            async for chunk in response.aiter_bytes(65536):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total > MAX_HTML_BYTES:
+                    break
+            encoding = response.encoding or 'utf-8'
+    return b''.join(chunks).decode(encoding, errors='replace')
+
+
+async def _run_parse(parse_executor: Optional[Executor], parse, html_content: str) -> Optional[float]:
+    """Run a page parser on a worker thread, or on parse_executor (e.g. a process pool), without blocking the loop."""
+    if parse_executor is None:
+        return await asyncio.to_thread(parse, html_content)
+    return await asyncio.get_running_loop().run_in_executor(parse_executor, parse, html_content)
+
+
+async def scrape_psa_estimate_async(
+    cert_number: str,
+    client: httpx.AsyncClient,
+    ebay_url: Optional[str] = None,
+    force_refresh: bool = False,
+    parse_executor: Optional[Executor] = None
+) -> Optional[float]:
+    """
+    Async version of scrape_psa_estimate using a shared httpx.AsyncClient.
+    Tries eBay first (if URL provided), then falls back to PSA website.
+    
+    Args:
+        cert_number: PSA certification number
+        client: Shared AsyncClient (see create_async_client)
+        ebay_url: Optional eBay listing URL to try first
+        force_refresh: Scrape again even if a cached estimate exists
+        parse_executor: Optional executor (e.g. ProcessPoolExecutor) to parse pages on
+    
+    Returns:
+        Estimated value as float, or None if not found
+    """
+    if not force_refresh:
+        estimate = get_cached_estimate(cert_number)
+        if estimate is not CACHE_MISS:
+            return estimate
+    
+    estimate = None
+    
+    # Method 1: Try eBay listing first (more reliable)
+    if ebay_url:
+        try:
+            html_content = await _fetch_html(client, ebay_url, EBAY_PAGE_HEADERS)
+            estimate = await _run_parse(parse_executor, parse_ebay_estimate, html_content) if html_content else None
+        except Exception:
+            # Silently fail - we'll fall back to PSA website scraping
+            estimate = None
+    
+    # Method 2: Fall back to PSA website
+    if not estimate:
+        url = f"https://www.psacard.com/cert/{cert_number}/psa"
+        try:
+            html_content = await _fetch_html(client, url, PSA_PAGE_HEADERS)
+            estimate = await _run_parse(parse_executor, parse_psa_page_estimate, html_content) if html_content else None
+        except Exception as e:
+            print(f"Error scraping PSA estimate for cert {cert_number}: {e}")
+            return None
+    
+    await asyncio.to_thread(cache_estimate, cert_number, estimate)
+    return estimate
+
+
+async def scrape_psa_estimates_async(
+    listings: List[Dict[str, Any]],
+    client: Optional[httpx.AsyncClient] = None,
+    parse_executor: Optional[Executor] = None
+) -> List[Optional[float]]:
+    """
+    Scrape PSA estimates for many listings concurrently on one AsyncClient.
+    
+    Args:
+        listings: Card listings with cert_number (and optional eBay url)
+        client: Optional shared AsyncClient; a temporary one is created if omitted
+        parse_executor: Optional executor (e.g. ProcessPoolExecutor) to parse pages on
+    
+    Returns:
+        PSA estimates in the same order as listings (None where not found)
+    """
+    if not listings:
+        return []
+    
+    async def run(http_client: httpx.AsyncClient) -> List[Optional[float]]:
+        return list(await asyncio.gather(*(
+            scrape_psa_estimate_async(
+                listing["cert_number"],
+                http_client,
+                ebay_url=listing.get("url") or None,
+                parse_executor=parse_executor
+            )
+            for listing in listings
+        )))
+    
+    if client is not None:
+        return await run(client)
+    async with create_async_client() as http_client:
+        return await run(http_client)
+
+
+async def _post_chat(
+    client: httpx.AsyncClient,
+    headers: Dict[str, str],
+    data: Dict[str, Any],
+    timeout: float
+) -> Optional[str]:
+    """
+    Run an OpenRouter chat completion and return the reply text.
+    
+    Args:
+        client: Shared AsyncClient
+        headers: Request headers (see openrouter_headers)
+        data: Chat completion payload
+        timeout: Request timeout in seconds
+    
+    Returns:
+        Message content, or None on a non-200 response
+    """
+    response = await client.post(OPENROUTER_URL, headers=headers, content=orjson.dumps(data), timeout=timeout)
+    if response.status_code != 200:
+        print(f"  OpenRouter API error: {response.status_code} - {response.text[:200]}")
+        return None
+    result = orjson.loads(response.content)
+    return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+
+async def get_llm_arbitrage_insights_async(
+    card: Tuple[Dict[str, Any], float, float, float],
+    openrouter_api_key: str,
+    client: httpx.AsyncClient,
+    model: str = "moonshotai/kimi-k2-thinking",
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Optional[str]:
+    """
+    Async version of get_llm_arbitrage_insights.
+    
+    Args:
+        card: (listing, psa_estimate, spread, spread_pct) for the opportunity
+        openrouter_api_key: OpenRouter API key
+        client: Shared AsyncClient
+        model: LLM model to use
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+    
+    Returns:
+        AI insights string or None
+    """
+    try:
+        content = await _post_chat(
+            client,
+            openrouter_headers(openrouter_api_key, site_url, site_name),
+            arbitrage_insight_payload(*card, model),
+            timeout=30
+        )
+    except Exception as e:
+        print(f"  Error calling LLM: {e}")
+        return None
+    return content.strip() if content else None
+
+
+async def get_arbitrage_insights_async(
+    cards: List[Tuple[Dict[str, Any], float, float, float]],
+    openrouter_api_key: str,
+    model: str = "moonshotai/kimi-k2-thinking",
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None
+) -> List[Optional[str]]:
+    """
+    Async version of get_arbitrage_insights: batches are requested concurrently
+    (at most _MAX_LLM_REQUESTS at a time), then any cards a batch failed to cover
+    fall back to concurrent single-card requests.
+    
+    Args:
+        cards: (listing, psa_estimate, spread, spread_pct) for each opportunity
+        openrouter_api_key: OpenRouter API key
+        model: LLM model to use
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+        client: Optional shared AsyncClient; a temporary one is created if omitted
+    
+    Returns:
+        Insights in the same order as cards (None where none could be generated)
+    """
+    if not cards:
+        return []
+    
+    headers = openrouter_headers(openrouter_api_key, site_url, site_name)
+    
+    async def run(http_client: httpx.AsyncClient) -> List[Optional[str]]:
+        semaphore = asyncio.Semaphore(_MAX_LLM_REQUESTS)
+        
+        async def batch_insights(batch) -> List[Optional[str]]:
+            async with semaphore:
+                try:
+                    content = await _post_chat(http_client, headers, arbitrage_batch_payload(batch, model), timeout=60)
+                    if content is not None:
+                        return parse_batch_insights(content, len(batch))
+                except Exception as e:
+                    print(f"  Error calling LLM (batch): {e}")
+            return [None] * len(batch)
+        
+        async def single_insights(card) -> Optional[str]:
+            async with semaphore:
+                return await get_llm_arbitrage_insights_async(
+                    card, openrouter_api_key, http_client, model, site_url, site_name
+                )
+        
+        batches = [cards[start:start + INSIGHT_BATCH_SIZE] for start in range(0, len(cards), INSIGHT_BATCH_SIZE)]
+        insights = [
+            ai_insights
+            for batch_result in await asyncio.gather(*(batch_insights(batch) for batch in batches))
+            for ai_insights in batch_result
+        ]
+        
+        missing = [i for i, ai_insights in enumerate(insights) if ai_insights is None]
+        for i, ai_insights in zip(missing, await asyncio.gather(*(single_insights(cards[i]) for i in missing))):
+            insights[i] = ai_insights
+        return insights
+    
+    if client is not None:
+        return await run(client)
+    async with create_async_client() as http_client:
+        return await run(http_client)
+
+
+async def extract_cert_from_image_async(
+    image_path: str,
+    openrouter_api_key: str,
+    client: httpx.AsyncClient,
+    model: str = "anthropic/claude-opus-4.5",
+    site_url: Optional[str] = None,
+    site_name: Optional[str] = None
+) -> Optional[str]:
+    """
+    Async version of extract_cert_from_image, so several images can be read concurrently.
+    
+    Args:
+        image_path: Path to the image file (PNG, JPG, etc.)
+        openrouter_api_key: OpenRouter API key
+        client: Shared AsyncClient
+        model: Vision model to use
+        site_url: Optional site URL for OpenRouter
+        site_name: Optional site name for OpenRouter
+    
+    Returns:
+        PSA certification number as string, or None if not found
+    """
+    digest = await asyncio.to_thread(image_digest, image_path)
+    if digest:
+        cert_number = await asyncio.to_thread(cache_get, f"cert_image:{digest}")
+        if cert_number is not CACHE_MISS:
+            return cert_number
+    
+    request = await asyncio.to_thread(cert_image_request, image_path, openrouter_api_key, model, site_url, site_name)
+    if request is None:
+        return None
+    headers, data = request
+    
+    try:
+        content = await _post_chat(client, headers, data, timeout=60)
+    except Exception as e:
+        print(f"Error calling OpenRouter API: {e}")
+        return None
+    cert_number = parse_cert_response(content) if content is not None else None
+    if cert_number and digest:
+        await asyncio.to_thread(cache_put, f"cert_image:{digest}", cert_number, CERT_IMAGE_TTL)
+    return cert_number
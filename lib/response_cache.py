@@ -0,0 +1,138 @@
+"""
+On-disk cache of API responses for the RapidAPI test scripts
+Repeat runs within the TTL are answered locally instead of spending the free tier's monthly quota.
+"""
+import base64
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+import httpx
+import orjson
+import requests
+from requests.structures import CaseInsensitiveDict
+from lib.file_cache import CACHE_MISS, atomic_write, load_json_file, ttl_get, ttl_put
+
+API_RESPONSE_CACHE_FILE = "data/api_response_cache.json"
+API_RESPONSE_TTL = 3600
+
+# Cached bodies are stored decoded, so these no longer describe them
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+_RESPONSE_CACHE: Optional[Dict[str, List[Any]]] = None
+
+
+def _load_cache() -> Dict[str, List[Any]]:
+    """Load the response cache from disk on first use."""
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = load_json_file(API_RESPONSE_CACHE_FILE, {})
+    return _RESPONSE_CACHE
+
+
+def _cache_key(url: str, params: Optional[Dict[str, Any]]) -> str:
+    """Cache key for an endpoint and its query parameters (in any order)."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+def _cache_get(key: str) -> Optional[List[Any]]:
+    """[status_code, headers, base64 body] cached for key, or None if missing or expired."""
+    cached = ttl_get(_load_cache(), key)
+    return None if cached is CACHE_MISS else cached
+
+
+def _cache_put(key: str, status_code: int, headers: Dict[str, str], content: bytes, ttl: float) -> None:
+    """Store a response in memory and persist the cache to disk."""
+    cache = _load_cache()
+    ttl_put(cache, key, [
+        status_code,
+        {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS},
+        base64.b64encode(content).decode('ascii'),
+    ], ttl)
+    try:
+        atomic_write(API_RESPONSE_CACHE_FILE, orjson.dumps(cache))
+    except OSError as e:
+        print(f"Warning: Could not save API response cache: {e}")
+
+
+def cached_get(
+    get: Callable[..., requests.Response],
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    ttl: float = API_RESPONSE_TTL,
+    refresh: bool = False,
+    **kwargs
+) -> requests.Response:
+    """
+    GET url through get (requests.get or a Session's get), reusing a cached 200 response.
+    Only 200 responses are cached; response.from_cache tells callers which they got.
+    
+    Args:
+        get: Function making the request, called as get(url, params=params, **kwargs)
+        url: Endpoint URL
+        params: Query parameters (part of the cache key)
+        ttl: Seconds a cached response stays valid
+        refresh: Skip the cache and store a fresh response
+        **kwargs: Passed through to get (headers, timeout, ...)
+    
+    Returns:
+        The cached or fresh response
+    """
+    key = _cache_key(url, params)
+    cached = None if refresh else _cache_get(key)
+    if cached is None:
+        response = get(url, params=params, **kwargs)
+        if response.status_code == 200:
+            _cache_put(key, response.status_code, response.headers, response.content, ttl)
+        response.from_cache = False
+        return response
+    
+    response = requests.Response()
+    response.status_code = cached[0]
+    response.headers = CaseInsensitiveDict(cached[1])
+    response._content = base64.b64decode(cached[2])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = key
+    response.from_cache = True
+    return response
+
+
+async def cached_get_async(
+    get: Callable[..., Awaitable[httpx.Response]],
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    ttl: float = API_RESPONSE_TTL,
+    refresh: bool = False,
+    **kwargs
+) -> httpx.Response:
+    """
+    Async version of cached_get for an httpx.AsyncClient's get.
+    
+    Args:
+        get: Coroutine function making the request, called as get(url, params=params, **kwargs)
+        url: Endpoint URL
+        params: Query parameters (part of the cache key)
+        ttl: Seconds a cached response stays valid
+        refresh: Skip the cache and store a fresh response
+        **kwargs: Passed through to get (headers, timeout, ...)
+    
+    Returns:
+        The cached or fresh response
+    """
+    key = _cache_key(url, params)
+    cached = None if refresh else _cache_get(key)
+    if cached is None:
+        response = await get(url, params=params, **kwargs)
+        if response.status_code == 200:
+            _cache_put(key, response.status_code, response.headers, response.content, ttl)
+        response.from_cache = False
+        return response
+    
+    response = httpx.Response(
+        cached[0],
+        headers=cached[1],
+        content=base64.b64decode(cached[2]),
+        request=httpx.Request("GET", key),
+    )
+    response.from_cache = True
+    return response
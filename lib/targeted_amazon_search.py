@@ -2,7 +2,12 @@
 Generate targeted Amazon search queries based on eBay item details
 """
 from typing import Optional, Dict, Any
-import re
+from lib.title_features import extract_luxury_features
+
+# Title keywords added to luxury queries, in query order
+_PRODUCT_KEYWORDS = ("boot", "shoe", "bag", "handbag", "sneaker")
+_MATERIAL_KEYWORDS = ("leather", "suede")
+_STYLE_KEYWORDS = ("western", "lug", "ankle", "knee")
 
 
 def generate_targeted_amazon_query(ebay_item: Dict[str, Any], item_type: str) -> Optional[str]:
@@ -20,44 +25,28 @@ def generate_targeted_amazon_query(ebay_item: Dict[str, Any], item_type: str) ->
 
     if item_type == "luxury":
         brand = ebay_item.get("brand")
-        title = ebay_item.get("title", "").lower()
+        features = extract_luxury_features(ebay_item.get("title", ""))
+        keywords = features["keywords"]
         condition = ebay_item.get("condition", "").lower()
 
         if brand:
             query_parts.append(brand)
         
         # Extract key product terms from title
-        if "boot" in title:
-            query_parts.append("boot")
-        if "shoe" in title:
-            query_parts.append("shoe")
-        if "bag" in title:
-            query_parts.append("bag")
-        if "handbag" in title:
-            query_parts.append("handbag")
-        if "sneaker" in title:
-            query_parts.append("sneaker")
+        query_parts.extend(keyword for keyword in _PRODUCT_KEYWORDS if keyword in keywords)
         
         # Add size if available
-        size_match = next((s for s in ["7.5", "7", "8", "9", "10", "11"] if s in title), None)
-        if size_match:
-            query_parts.append(f"size {size_match}")
+        if features["size"]:
+            query_parts.append(f"size {features['size']}")
         
         # Add material if available
-        if "leather" in title:
-            query_parts.append("leather")
-        if "suede" in title:
-            query_parts.append("suede")
+        query_parts.extend(keyword for keyword in _MATERIAL_KEYWORDS if keyword in keywords)
         
         # Add style keywords
-        if "western" in title:
-            query_parts.append("western")
-        if "lug" in title:
-            query_parts.append("lug")
-        if "ankle" in title:
-            query_parts.append("ankle")
-        if "knee" in title or "knee-high" in title:
-            query_parts.append("knee high")
+        query_parts.extend(
+            "knee high" if keyword == "knee" else keyword
+            for keyword in _STYLE_KEYWORDS if keyword in keywords
+        )
 
     elif item_type == "trading_cards":
         card_name = ebay_item.get("card_name")
@@ -5,6 +5,17 @@ This optimizes the search to find the same items on Facebook Marketplace
 
 from typing import List
 import re
+import numpy as np
+from lib.title_features import extract_luxury_features
+
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+
+# Title keywords, in order of preference when a title has several
+_PRODUCT_KEYWORDS = ("boot", "shoe", "bag", "handbag", "wallet", "belt", "jacket", "coat")
+_MATERIAL_KEYWORDS = ("leather", "suede", "canvas", "fabric")
+
+# Below this many items NumPy's call overhead outweighs the vectorized min/max
+_NUMPY_MIN_ITEMS = 32
 
 
 def extract_key_terms_from_ebay_items(ebay_items: list, item_type: str = "luxury") -> str:
@@ -22,90 +33,67 @@ def extract_key_terms_from_ebay_items(ebay_items: list, item_type: str = "luxury
         return ""
     
     if item_type == "trading_cards":
-        # For trading cards, extract: card name, year, set, PSA grade
-        card_names = set()
-        years = set()
-        sets = set()
+        # For trading cards, extract: card name, year, set, PSA grade (first found of each)
+        card_name = year = set_abbr = None
         
         for item in ebay_items:
-            card_name = item.get("card_name", "")
-            if card_name:
+            if not card_name and item.get("card_name"):
                 # Clean up card name (remove special chars, keep main name)
-                clean_name = re.sub(r'[^\w\s]', '', card_name).strip()
+                clean_name = _NON_WORD_RE.sub('', item["card_name"]).strip()
                 if clean_name and len(clean_name) > 2:
-                    card_names.add(clean_name.split()[0])  # First word (e.g., "Blue-Eyes")
+                    card_name = clean_name.split()[0]  # First word (e.g., "Blue-Eyes")
             
-            year = item.get("year", "")
-            if year:
-                years.add(year)
+            if not year and item.get("year"):
+                year = item["year"]
             
-            set_name = item.get("set_name", "")
-            if set_name:
+            if not set_abbr and item.get("set_name"):
                 # Extract set abbreviation (e.g., "LOB" from "Legend of Blue Eyes")
-                set_abbr = set_name.split()[0] if set_name else ""
-                if set_abbr and len(set_abbr) <= 5:  # Likely an abbreviation
-                    sets.add(set_abbr)
+                set_words = item["set_name"].split()
+                if set_words and len(set_words[0]) <= 5:  # Likely an abbreviation
+                    set_abbr = set_words[0]
+            
+            if card_name and year and set_abbr:
+                break
         
         # Build query: "PSA 10 [card name] [year] [set]"
         query_parts = ["PSA 10"]
-        if card_names:
-            query_parts.append(list(card_names)[0])  # Use first card name
-        if years:
-            query_parts.append(list(years)[0])
-        if sets:
-            query_parts.append(list(sets)[0])
+        query_parts.extend(part for part in (card_name, year, set_abbr) if part)
         
         return " ".join(query_parts) if len(query_parts) > 1 else "PSA 10"
     
     else:  # luxury items
-        # For luxury items, extract: brand, product type, size, material
-        brands = set()
-        product_types = set()
-        sizes = set()
-        materials = set()
+        # For luxury items, extract: brand, product type, size, material (first found of each)
+        brand = product_type = size = material = None
         
         for item in ebay_items:
-            brand = item.get("brand", "")
-            if brand:
-                brands.add(brand)
-            
-            title = item.get("title", "").lower()
-            
-            # Extract product type from title (boots, shoes, bag, etc.)
-            product_keywords = ["boot", "shoe", "bag", "handbag", "wallet", "belt", "jacket", "coat"]
-            for keyword in product_keywords:
-                if keyword in title:
-                    product_types.add(keyword)
-                    break
+            if not brand and item.get("brand"):
+                brand = item["brand"]
             
-            # Extract size
-            size_match = re.search(r'\b(size|sz)[\s:]*(\d+(?:\.\d+)?)', title)
-            if size_match:
-                sizes.add(size_match.group(2))
+            if not (product_type and size and material):
+                features = extract_luxury_features(item.get("title", ""))
+                keywords = features["keywords"]
+                
+                # Extract product type from title (boots, shoes, bag, etc.)
+                if not product_type:
+                    product_type = next((keyword for keyword in _PRODUCT_KEYWORDS if keyword in keywords), None)
+                
+                # Extract size
+                if not size:
+                    size = features["labeled_size"]
+                
+                # Extract material
+                if not material:
+                    material = next((keyword for keyword in _MATERIAL_KEYWORDS if keyword in keywords), None)
             
-            # Extract material
-            material_keywords = ["leather", "suede", "canvas", "fabric"]
-            for keyword in material_keywords:
-                if keyword in title:
-                    materials.add(keyword)
-                    break
+            if brand and product_type and size and material:
+                break
         
         # Build query: "[brand] [product type] [size] [material]"
-        query_parts = []
-        
-        if brands:
-            # Use most common brand or first one
-            brand_list = list(brands)
-            query_parts.append(brand_list[0])
-        
-        if product_types:
-            query_parts.append(list(product_types)[0])
-        
-        if sizes:
-            query_parts.append(f"size {list(sizes)[0]}")
-        
-        if materials:
-            query_parts.append(list(materials)[0])
+        query_parts = [
+            part
+            for part in (brand, product_type, f"size {size}" if size else None, material)
+            if part
+        ]
         
         return " ".join(query_parts) if query_parts else ""
     
@@ -146,17 +134,20 @@ def get_price_range_from_ebay_items(ebay_items: list) -> tuple[float, float]:
     if not ebay_items:
         return 50.0, 5000.0  # Default range
     
-    prices = []
-    for item in ebay_items:
-        price = item.get("price", 0) + item.get("shipping", 0)
-        if price > 0:
-            prices.append(price)
-    
-    if not prices:
-        return 50.0, 5000.0
-    
-    min_price = min(prices)
-    max_price = max(prices)
+    totals = (item.get("price", 0) + item.get("shipping", 0) for item in ebay_items)
+    if len(ebay_items) < _NUMPY_MIN_ITEMS:
+        prices = [price for price in totals if price > 0]
+        if not prices:
+            return 50.0, 5000.0
+        min_price = min(prices)
+        max_price = max(prices)
+    else:
+        prices = np.fromiter(totals, dtype=np.float64, count=len(ebay_items))
+        prices = prices[prices > 0]
+        if not prices.size:
+            return 50.0, 5000.0
+        min_price = float(prices.min())
+        max_price = float(prices.max())
     
     # Add buffer: 20% below min, 50% above max to catch similar items
     min_price_filter = max(10, min_price * 0.8)
@@ -1,14 +1,59 @@
 """
 Test script to explore RapidAPI Amazon Data API endpoints and response structure
 """
-import http.client
+import functools
 import json
 import os
+import sys
+import orjson
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.http_session import create_session
+
 load_dotenv(".env.local")
 
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "")
+RAPIDAPI_HOST = "realtime-amazon-data.p.rapidapi.com"
+
+# One pooled session for every endpoint probe, so each attempt reuses the TLS connection
+SESSION = create_session(pool_maxsize=8)
+
+# Product search endpoint variations based on RapidAPI documentation
+# The /product-search endpoint exists but uses "keyword" instead of "query"
+SEARCH_ENDPOINTS = [
+    "/product-search?keyword={query}&country=us&page=1",
+    "/product-search?query={query}&country=us&page=1",
+    "/search?query={query}&country=us&page=1",
+    "/product/search?query={query}&country=us&page=1",
+    "/products/search?query={query}&country=us&page=1",
+]
+# Search endpoint that last worked, tried first on later runs
+SEARCH_ENDPOINT_CACHE_FILE = "data/amazon_search_endpoint.json"
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_search_endpoint():
+    """Return the search endpoint saved by a previous successful run, if any."""
+    try:
+        with open(SEARCH_ENDPOINT_CACHE_FILE, encoding="utf-8") as f:
+            endpoint = json.load(f).get("endpoint")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return endpoint if endpoint in SEARCH_ENDPOINTS else None
+
+
+def _save_search_endpoint(endpoint: str):
+    """Remember the search endpoint that worked for the next run."""
+    try:
+        os.makedirs(os.path.dirname(SEARCH_ENDPOINT_CACHE_FILE), exist_ok=True)
+        with open(SEARCH_ENDPOINT_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"endpoint": endpoint}, f)
+    except OSError as e:
+        print(f"Warning: Could not save search endpoint: {e}")
+    _cached_search_endpoint.cache_clear()
+
 
 def test_amazon_product_search(query: str = "Gucci boot"):
     """Test the Product Search endpoint"""
@@ -16,35 +61,28 @@ def test_amazon_product_search(query: str = "Gucci boot"):
     print(f"Testing Amazon Product Search: '{query}'")
     print(f"{'='*70}")
     
-    conn = http.client.HTTPSConnection("realtime-amazon-data.p.rapidapi.com")
-    
     headers = {
         'x-rapidapi-key': RAPIDAPI_KEY,
-        'x-rapidapi-host': "realtime-amazon-data.p.rapidapi.com"
+        'x-rapidapi-host': RAPIDAPI_HOST
     }
     
-    # Try different endpoint variations based on RapidAPI documentation
-    # The /product-search endpoint exists but uses "keyword" instead of "query"
+    # Try the endpoint that worked last time first; discover again only if it fails
     query_encoded = query.replace(' ', '%20')
-    endpoints_to_try = [
-        f"/product-search?keyword={query_encoded}&country=us&page=1",
-        f"/product-search?query={query_encoded}&country=us&page=1",
-        f"/search?query={query_encoded}&country=us&page=1",
-        f"/product/search?query={query_encoded}&country=us&page=1",
-        f"/products/search?query={query_encoded}&country=us&page=1",
-    ]
+    cached_endpoint = _cached_search_endpoint()
+    endpoints_to_try = SEARCH_ENDPOINTS
+    if cached_endpoint:
+        endpoints_to_try = [cached_endpoint] + [e for e in SEARCH_ENDPOINTS if e != cached_endpoint]
     
-    for endpoint in endpoints_to_try:
+    for endpoint_template in endpoints_to_try:
+        endpoint = endpoint_template.format(query=query_encoded)
         print(f"\nTrying endpoint: {endpoint}")
         try:
-            conn.request("GET", endpoint, headers=headers)
-            res = conn.getresponse()
-            data = res.read()
+            res = SESSION.get(f"https://{RAPIDAPI_HOST}{endpoint}", headers=headers, timeout=10)
             
-            print(f"Status Code: {res.status}")
+            print(f"Status Code: {res.status_code}")
             
-            if res.status == 200:
-                response_data = json.loads(data.decode("utf-8"))
+            if res.status_code == 200:
+                response_data = orjson.loads(res.content)
                 print(f"✅ SUCCESS! Response structure:")
                 print(json.dumps(response_data, indent=2)[:2000])
                 
@@ -57,12 +95,17 @@ def test_amazon_product_search(query: str = "Gucci boot"):
                             print(f"\nFirst item keys: {list(response_data['data'][0].keys())}")
                             print(f"\nFirst item sample:")
                             print(json.dumps(response_data["data"][0], indent=2)[:1000])
+                if endpoint_template != cached_endpoint:
+                    _save_search_endpoint(endpoint_template)
                 break
-            elif res.status == 404:
+            elif res.status_code == 404:
                 print(f"❌ Not found, trying next endpoint...")
                 continue
+            elif endpoint_template == cached_endpoint and res.status_code >= 500:
+                print(f"❌ Saved endpoint failed, rediscovering...")
+                continue
             else:
-                print(f"Error Response: {data.decode('utf-8')[:500]}")
+                print(f"Error Response: {res.text[:500]}")
                 break
         except Exception as e:
             print(f"Error: {e}")
@@ -74,12 +117,10 @@ def test_amazon_product_search(query: str = "Gucci boot"):
     print(f"{'='*70}")
     try:
         endpoint = "/best-sellers?category=shoes&country=us&page=1"
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read()
+        res = SESSION.get(f"https://{RAPIDAPI_HOST}{endpoint}", headers=headers, timeout=10)
         
-        if res.status == 200:
-            response_data = json.loads(data.decode("utf-8"))
+        if res.status_code == 200:
+            response_data = orjson.loads(res.content)
             print(f"\nBest Sellers Response Structure:")
             print(json.dumps(response_data, indent=2)[:2000])
             
@@ -89,8 +130,6 @@ def test_amazon_product_search(query: str = "Gucci boot"):
                 print(json.dumps(response_data["products"][0], indent=2)[:1500])
     except Exception as e:
         print(f"Error: {e}")
-    finally:
-        conn.close()
 
 
 def test_amazon_product_details(asin: str = "B08XYZ123"):
@@ -99,11 +138,9 @@ def test_amazon_product_details(asin: str = "B08XYZ123"):
     print(f"Testing Amazon Product Details: ASIN '{asin}'")
     print(f"{'='*70}")
     
-    conn = http.client.HTTPSConnection("realtime-amazon-data.p.rapidapi.com")
-    
     headers = {
         'x-rapidapi-key': RAPIDAPI_KEY,
-        'x-rapidapi-host': "realtime-amazon-data.p.rapidapi.com"
+        'x-rapidapi-host': RAPIDAPI_HOST
     }
     
     # Try different endpoint variations for product details
@@ -113,32 +150,27 @@ def test_amazon_product_details(asin: str = "B08XYZ123"):
         f"/products/{asin}?country=us",
     ]
     
-    try:
-        for endpoint in endpoints_to_try:
-            print(f"\nTrying endpoint: {endpoint}")
-            try:
-                conn.request("GET", endpoint, headers=headers)
-                res = conn.getresponse()
-                data = res.read()
-                
-                print(f"Status Code: {res.status}")
-                
-                if res.status == 200:
-                    response_data = json.loads(data.decode("utf-8"))
-                    print(f"✅ SUCCESS! Response structure:")
-                    print(json.dumps(response_data, indent=2)[:2000])
-                    break
-                elif res.status == 404:
-                    print(f"❌ Not found")
-                    continue
-                else:
-                    print(f"Error Response: {data.decode('utf-8')[:500]}")
-                    break
-            except Exception as e:
-                print(f"Error: {e}")
+    for endpoint in endpoints_to_try:
+        print(f"\nTrying endpoint: {endpoint}")
+        try:
+            res = SESSION.get(f"https://{RAPIDAPI_HOST}{endpoint}", headers=headers, timeout=10)
+            
+            print(f"Status Code: {res.status_code}")
+            
+            if res.status_code == 200:
+                response_data = orjson.loads(res.content)
+                print(f"✅ SUCCESS! Response structure:")
+                print(json.dumps(response_data, indent=2)[:2000])
+                break
+            elif res.status_code == 404:
+                print(f"❌ Not found")
                 continue
-    finally:
-        conn.close()
+            else:
+                print(f"Error Response: {res.text[:500]}")
+                break
+        except Exception as e:
+            print(f"Error: {e}")
+            continue
 
 
 if __name__ == "__main__":
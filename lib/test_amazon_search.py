@@ -1,32 +1,40 @@
 """
 Quick test of Amazon product search endpoint
 """
-import http.client
 import json
 import os
+import sys
+import orjson
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.http_session import create_session
+
 load_dotenv(".env.local")
 
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "")
+RAPIDAPI_HOST = "realtime-amazon-data.p.rapidapi.com"
 
-conn = http.client.HTTPSConnection("realtime-amazon-data.p.rapidapi.com")
+# Pooled session that keeps the connection alive and retries 429/5xx responses
+SESSION = create_session(pool_maxsize=8)
 
 headers = {
     'x-rapidapi-key': RAPIDAPI_KEY,
-    'x-rapidapi-host': "realtime-amazon-data.p.rapidapi.com"
+    'x-rapidapi-host': RAPIDAPI_HOST
 }
 
 # Test product search
 print("Testing /product-search endpoint...")
-conn.request("GET", "/product-search?keyword=coffee%20machine&country=us&page=1&sort=Featured", headers=headers)
-
-res = conn.getresponse()
-data = res.read()
-
-print(f"\nStatus Code: {res.status}")
-if res.status == 200:
-    response_data = json.loads(data.decode("utf-8"))
+res = SESSION.get(
+    f"https://{RAPIDAPI_HOST}/product-search?keyword=coffee%20machine&country=us&page=1&sort=Featured",
+    headers=headers,
+    timeout=10
+)
+
+print(f"\nStatus Code: {res.status_code}")
+if res.status_code == 200:
+    response_data = orjson.loads(res.content)
     print(f"\n✅ SUCCESS!")
     print(f"Response keys: {list(response_data.keys())}")
     
@@ -41,7 +49,5 @@ if res.status == 200:
             print(f"\nFirst product structure:")
             print(json.dumps(response_data['products'][0], indent=2))
 else:
-    print(f"\n❌ Error: {data.decode('utf-8')[:500]}")
-
-conn.close()
+    print(f"\n❌ Error: {res.text[:500]}")
 
@@ -1,80 +1,115 @@
 """
 Test script to check if Amazon has a trending items endpoint via RapidAPI
 """
-import http.client
+import asyncio
 import json
 import os
+import sys
+import httpx
+import orjson
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.http_session import create_async_client
+from lib.response_cache import cached_get_async
+
 load_dotenv(".env.local")
 
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY", "")
+RAPIDAPI_HOST = "realtime-amazon-data.p.rapidapi.com"
 
-def test_amazon_endpoints():
-    """Test various Amazon endpoints to find trending items"""
-    conn = http.client.HTTPSConnection("realtime-amazon-data.p.rapidapi.com")
-    
+# Endpoint probes in flight at once
+MAX_CONCURRENT_PROBES = 8
+
+# Endpoint variations that might serve trending items
+ENDPOINTS = (
+    "/trending?country=us",
+    "/trending-items?country=us",
+    "/trending-products?country=us",
+    "/popular?country=us",
+    "/popular-items?country=us",
+    "/hot-items?country=us",
+    "/hot-products?country=us",
+    "/best-sellers?category=all&country=us&page=1",  # We know this works
+)
+
+
+async def _probe(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    endpoint: str,
+    headers: dict,
+    refresh: bool
+) -> httpx.Response:
+    """GET one endpoint (or its cached response), waiting for a free probe slot."""
+    async with semaphore:
+        return await cached_get_async(client.get, f"https://{RAPIDAPI_HOST}{endpoint}", refresh=refresh, headers=headers, timeout=10)
+
+
+async def test_amazon_endpoints(refresh: bool = False, verbose: bool = False):
+    """
+    Test various Amazon endpoints to find trending items (all probed concurrently, 200s cached for an hour).
+    Sample items are only pretty-printed when verbose is set.
+    """
     headers = {
         'x-rapidapi-key': RAPIDAPI_KEY,
-        'x-rapidapi-host': "realtime-amazon-data.p.rapidapi.com"
+        'x-rapidapi-host': RAPIDAPI_HOST
     }
     
-    # Test different endpoint variations for trending items
-    endpoints_to_try = [
-        "/trending?country=us",
-        "/trending-items?country=us",
-        "/trending-products?country=us",
-        "/popular?country=us",
-        "/popular-items?country=us",
-        "/hot-items?country=us",
-        "/hot-products?country=us",
-        "/best-sellers?category=all&country=us&page=1",  # We know this works
-    ]
-    
     print("=" * 70)
     print("Testing Amazon Trending/Popular Items Endpoints")
     print("=" * 70)
     
-    for endpoint in endpoints_to_try:
+    # Fire every probe at once on one keep-alive client; results are reported in list order
+    async with create_async_client(max_connections=MAX_CONCURRENT_PROBES) as client:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+        responses = await asyncio.gather(
+            *(_probe(client, semaphore, endpoint, headers, refresh) for endpoint in ENDPOINTS),
+            return_exceptions=True
+        )
+    
+    for endpoint, res in zip(ENDPOINTS, responses):
         print(f"\nTesting: {endpoint}")
         try:
-            conn.request("GET", endpoint, headers=headers)
-            res = conn.getresponse()
-            data = res.read()
+            if isinstance(res, Exception):
+                raise res
             
-            print(f"Status Code: {res.status}")
+            print(f"Status Code: {res.status_code}{' (cached)' if res.from_cache else ''}")
             
-            if res.status == 200:
-                response_data = json.loads(data.decode("utf-8"))
+            if res.status_code == 200:
+                response_data = orjson.loads(res.content)
                 print(f"✅ SUCCESS!")
                 print(f"Response keys: {list(response_data.keys())}")
                 
                 # Check for products/items/data
                 if "products" in response_data:
                     print(f"Found 'products' array with {len(response_data['products'])} items")
-                    if len(response_data['products']) > 0:
+                    if verbose and len(response_data['products']) > 0:
                         print(f"First item: {json.dumps(response_data['products'][0], indent=2)[:500]}")
                 elif "items" in response_data:
                     print(f"Found 'items' array with {len(response_data['items'])} items")
                 elif "data" in response_data:
                     print(f"Found 'data' array with {len(response_data['data'])} items")
                 elif "trending" in response_data:
-                    print(f"Found 'trending' data: {json.dumps(response_data['trending'], indent=2)[:500]}")
+                    print("Found 'trending' data")
+                    if verbose:
+                        print(json.dumps(response_data['trending'], indent=2)[:500])
                 
                 break  # Found working endpoint
-            elif res.status == 404:
+            elif res.status_code == 404:
                 print(f"❌ Not found")
             else:
-                print(f"Response: {data.decode('utf-8')[:200]}")
+                print(f"Response: {res.text[:200]}")
         except Exception as e:
             print(f"Error: {e}")
-    
-    conn.close()
 
 if __name__ == "__main__":
     if not RAPIDAPI_KEY:
         print("ERROR: RAPIDAPI_KEY not found in environment")
         exit(1)
     
-    test_amazon_endpoints()
+    # Pass --refresh to probe the API even where a cached response exists,
+    # and --verbose to print sample items
+    asyncio.run(test_amazon_endpoints(refresh="--refresh" in sys.argv, verbose="--verbose" in sys.argv))
 
@@ -7,9 +7,11 @@ Tests various queries and documents response structure
 
 import os
 import sys
-import json
 import time
-from dotenv import load_dotenv
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import ijson
+import orjson
 import requests
 
 # Fix Unicode encoding for Windows
@@ -21,16 +23,35 @@ if sys.platform == 'win32':
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.config import load_env
+from lib.file_cache import pretty_json
+from lib.http_session import send_with_retries
 
+# Read .env/.env.local once per run rather than on every search
+_ENV = load_env()
 
-def test_apify_sync_search(query: str, location: str = "Los Angeles, CA", max_items: int = 10):
+# Item fields that may echo the start URL or search query an item was scraped for
+_ITEM_SOURCE_FIELDS = ("searchQuery", "facebookUrl", "inputUrl", "url")
+
+
+def _item_query(item: Dict[str, Any], sources: Dict[str, str]) -> Optional[str]:
+    """Query whose start URL (or query text) an item reports, or None if it can't be told."""
+    for field in _ITEM_SOURCE_FIELDS:
+        value = item.get(field)
+        if isinstance(value, str) and value in sources:
+            return sources[value]
+    return None
+
+
+def test_apify_sync_search(queries: List[str], location: str = "Los Angeles, CA", max_items: int = 10):
     """
     Test Apify's synchronous Facebook Marketplace search endpoint.
+    All queries go into one actor run (one startUrl each), so the actor only boots once.
     
     Uses: POST /v2/acts/apify~facebook-marketplace-scraper/run-sync-get-dataset-items
+    Items are streamed to data/apify_test_response_<ts>.jsonl; returns item counts per
+    query (None for items that can't be matched to one), or None on error.
     """
-    env = load_env()
-    api_token = env.get("APIFY_API_TOKEN")
+    api_token = _ENV.get("APIFY_API_TOKEN")
     
     if not api_token:
         print("Error: APIFY_API_TOKEN not found in environment")
@@ -49,32 +70,32 @@ def test_apify_sync_search(query: str, location: str = "Los Angeles, CA", max_it
     # Facebook Marketplace URLs typically look like:
     # https://www.facebook.com/marketplace/search/?query=QUERY
     import urllib.parse
-    encoded_query = urllib.parse.quote(query)
-    marketplace_url = f"https://www.facebook.com/marketplace/search/?query={encoded_query}"
+    marketplace_urls = [
+        f"https://www.facebook.com/marketplace/search/?query={urllib.parse.quote(query)}"
+        for query in queries
+    ]
+    # Map each start URL (and the query text itself) back to its query for grouping results
+    sources = {**{query: query for query in queries}, **dict(zip(marketplace_urls, queries))}
     
     # Apify input payload - requires startUrls
     payload = {
-        "startUrls": [
-            {
-                "url": marketplace_url
-            }
-        ],
-        "maxItems": max_items,
+        "startUrls": [{"url": marketplace_url} for marketplace_url in marketplace_urls],
+        "maxItems": max_items * len(queries),
     }
     
     print(f"\n{'='*70}")
     print(f"Testing Apify Facebook Marketplace API")
     print(f"{'='*70}")
-    print(f"Query: {query}")
+    print(f"Queries: {', '.join(queries)}")
     print(f"Location: {location}")
     print(f"Max Items: {max_items}")
     print(f"\nSending request to Apify...")
     
     try:
         print(f"Request URL: {url}")
-        print(f"Payload: {json.dumps(payload, indent=2)}")
+        print(f"Payload: {pretty_json(payload)}")
         print(f"\nNote: Facebook Marketplace scraping can take 2-5 minutes...")
-        response = requests.post(url, params=params, json=payload, timeout=300)  # 5 minute timeout
+        response = send_with_retries(lambda: requests.post(url, params=params, json=payload, timeout=300, stream=True))  # 5 minute timeout
         
         # Print response details before raising
         if response.status_code != 200:
@@ -84,46 +105,45 @@ def test_apify_sync_search(query: str, location: str = "Los Angeles, CA", max_it
         
         response.raise_for_status()
         
-        data = response.json()
-        
         print(f"\nResponse Status: {response.status_code}")
-        print(f"Response Type: {type(data)}")
         
-        if isinstance(data, list):
-            print(f"Number of items returned: {len(data)}")
-            
-            if len(data) > 0:
-                print(f"\n{'='*70}")
-                print("Sample Item Structure:")
-                print(f"{'='*70}")
-                sample = data[0]
-                print(json.dumps(sample, indent=2, ensure_ascii=False))
-                
-                print(f"\n{'='*70}")
-                print("Available Fields in Response:")
-                print(f"{'='*70}")
-                for key in sample.keys():
-                    value = sample[key]
-                    value_type = type(value).__name__
-                    if isinstance(value, str) and len(value) > 50:
-                        value_preview = value[:50] + "..."
-                    else:
-                        value_preview = value
-                    print(f"  {key}: {value_type} = {value_preview}")
-                
-                # Save full response to file for analysis
-                output_file = f"data/apify_test_response_{int(time.time())}.json"
-                os.makedirs("data", exist_ok=True)
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                print(f"\nFull response saved to: {output_file}")
-            else:
-                print("\nNo items returned in response")
+        # Stream the dataset straight to disk one item per line instead of holding it all in memory
+        output_file = f"data/apify_test_response_{int(time.time())}.jsonl"
+        os.makedirs("data", exist_ok=True)
+        item_count = 0
+        query_counts = Counter()
+        response.raw.decode_content = True  # ijson reads the raw stream, so undo gzip ourselves
+        with response, open(output_file, "wb") as f:
+            for item in ijson.items(response.raw, "item", use_float=True):
+                f.write(orjson.dumps(item) + b"\n")
+                item_count += 1
+                query_counts[_item_query(item, sources)] += 1
+                if item_count == 1:
+                    print(f"\n{'='*70}")
+                    print("Sample Item Structure:")
+                    print(f"{'='*70}")
+                    print(pretty_json(item))
+                    
+                    print(f"\n{'='*70}")
+                    print("Available Fields in Response:")
+                    print(f"{'='*70}")
+                    for key in item.keys():
+                        value = item[key]
+                        value_type = type(value).__name__
+                        if isinstance(value, str) and len(value) > 50:
+                            value_preview = value[:50] + "..."
+                        else:
+                            value_preview = value
+                        print(f"  {key}: {value_type} = {value_preview}")
+        
+        print(f"\nNumber of items returned: {item_count}")
+        if item_count > 0:
+            print(f"\nFull response saved to: {output_file}")
         else:
-            print(f"\nUnexpected response format:")
-            print(json.dumps(data, indent=2, ensure_ascii=False))
+            os.remove(output_file)
+            print("\nNo items returned in response")
         
-        return data
+        return dict(query_counts)
         
     except requests.exceptions.HTTPError as e:
         print(f"\nHTTP Error: {e}")
@@ -132,7 +152,7 @@ def test_apify_sync_search(query: str, location: str = "Los Angeles, CA", max_it
             print(f"Response: {e.response.text}")
             try:
                 error_json = e.response.json()
-                print(f"Error Details: {json.dumps(error_json, indent=2)}")
+                print(f"Error Details: {pretty_json(error_json)}")
             except:
                 pass
         return None
@@ -149,8 +169,7 @@ def test_async_search(query: str, location: str = "Los Angeles, CA", max_items:
     
     Uses: POST /v2/acts/apify~facebook-marketplace-scraper/runs
     """
-    env = load_env()
-    api_token = env.get("APIFY_API_TOKEN")
+    api_token = _ENV.get("APIFY_API_TOKEN")
     
     if not api_token:
         print("Error: APIFY_API_TOKEN not found in environment")
@@ -173,7 +192,7 @@ def test_async_search(query: str, location: str = "Los Angeles, CA", max_items:
     print(f"\nSending async request...")
     
     try:
-        response = requests.post(url, params=params, json=payload, timeout=30)
+        response = send_with_retries(lambda: requests.post(url, params=params, json=payload, timeout=30))
         response.raise_for_status()
         
         data = response.json()
@@ -182,7 +201,7 @@ def test_async_search(query: str, location: str = "Los Angeles, CA", max_items:
         print(f"Run ID: {data.get('data', {}).get('id')}")
         print(f"Status: {data.get('data', {}).get('status')}")
         print(f"\nFull response:")
-        print(json.dumps(data, indent=2, ensure_ascii=False))
+        print(pretty_json(data))
         
         return data
         
@@ -195,9 +214,6 @@ def test_async_search(query: str, location: str = "Los Angeles, CA", max_items:
 
 def main():
     """Run test queries"""
-    load_dotenv(".env")
-    load_dotenv(".env.local", override=True)
-    
     # Test queries
     test_queries = [
         ("PSA 10 yugioh 1st edition", "Los Angeles, CA"),
@@ -209,17 +225,17 @@ def main():
     print("Starting Apify Facebook Marketplace API Tests")
     print("=" * 70)
     
-    for query, location in test_queries:
-        print(f"\n\nTesting query: {query}")
-        result = test_apify_sync_search(query, location, max_items=5)
-        
-        if result:
-            print(f"\n[SUCCESS] Successfully retrieved {len(result) if isinstance(result, list) else 'data'} for: {query}")
+    queries = [query for query, _ in test_queries]
+    query_counts = test_apify_sync_search(queries, test_queries[0][1], max_items=5)
+    
+    for query in queries:
+        count = query_counts.get(query) if query_counts is not None else None
+        if count:
+            print(f"\n[SUCCESS] Successfully retrieved {count} items for: {query}")
         else:
             print(f"\n[FAILED] Failed to retrieve data for: {query}")
-        
-        # Wait between requests to avoid rate limiting
-        time.sleep(2)
+    if query_counts and query_counts.get(None):
+        print(f"\n{query_counts[None]} items could not be matched to a query")
     
     print(f"\n\n{'='*70}")
     print("Test Complete!")
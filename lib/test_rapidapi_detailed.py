@@ -6,9 +6,8 @@ Detailed test for RapidAPI Facebook Marketplace - test different queries to see
 
 import os
 import sys
-import json
+import orjson
 from dotenv import load_dotenv
-import requests
 
 # Fix Unicode encoding for Windows
 if sys.platform == 'win32':
@@ -17,6 +16,10 @@ if sys.platform == 'win32':
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from lib.config import load_env
+from lib.file_cache import pretty_json
+from lib.http_session import create_session, send_with_retries
+from lib.response_cache import cached_get
+
 
 load_dotenv(".env")
 load_dotenv(".env.local", override=True)
@@ -34,6 +37,14 @@ headers = {
     "x-rapidapi-key": api_key
 }
 
+# One keep-alive session for every call in this script. Retries go through send_with_retries
+# rather than urllib3, which would sleep out any Retry-After (e.g. a monthly quota reset).
+SESSION = create_session(pool_connections=4, pool_maxsize=10, total_retries=0)
+SESSION.headers.update(headers)
+
+# Responses are cached on disk for an hour; pass --refresh to call the API anyway
+REFRESH = "--refresh" in sys.argv
+
 # Test with a broader query that's more likely to have results
 test_queries = [
     ("boots", "los angeles"),  # Very broad
@@ -56,13 +67,13 @@ for query, city in test_queries:
     print(f"\n{'='*70}")
     print(f"Query: '{query}' in {city}")
     print(f"{'='*70}")
-    print(f"Params: {json.dumps(params, indent=2)}")
+    print(f"Params: {pretty_json(params)}")
     print("\nSending request...")
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = send_with_retries(lambda: cached_get(SESSION.get, url, params=params, refresh=REFRESH, timeout=30))
         
-        print(f"Status Code: {response.status_code}")
+        print(f"Status Code: {response.status_code}{' (cached)' if response.from_cache else ''}")
         
         # Check rate limit headers
         remaining = response.headers.get('X-RateLimit-Requests-Remaining', 'N/A')
@@ -79,7 +90,7 @@ for query, city in test_queries:
                     print(f"\n{'='*70}")
                     print("FIRST ITEM STRUCTURE (Full):")
                     print(f"{'='*70}")
-                    print(json.dumps(data[0], indent=2, ensure_ascii=False))
+                    print(pretty_json(data[0]))
                     
                     print(f"\n{'='*70}")
                     print("FIELD ANALYSIS:")
@@ -97,14 +108,14 @@ for query, city in test_queries:
                     # Save to file
                     output_file = f"data/rapidapi_response_{query.replace(' ', '_')}.json"
                     os.makedirs("data", exist_ok=True)
-                    with open(output_file, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2, ensure_ascii=False)
+                    with open(output_file, "wb") as f:
+                        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
                     print(f"\n✅ Full response saved to: {output_file}")
                 else:
                     print("\n⚠️  No items returned for this query")
             elif isinstance(data, dict):
                 print(f"\nResponse is a dictionary:")
-                print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+                print(pretty_json(data)[:1000])
             else:
                 print(f"\nUnexpected response type: {data}")
         else:
@@ -8,7 +8,6 @@ import os
 import sys
 import json
 from dotenv import load_dotenv
-import requests
 
 # Fix Unicode encoding for Windows
 if sys.platform == 'win32':
@@ -17,6 +16,8 @@ if sys.platform == 'win32':
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from lib.config import load_env
+from lib.http_session import create_session, send_with_retries
+from lib.response_cache import cached_get
 
 load_dotenv(".env")
 load_dotenv(".env.local", override=True)
@@ -34,6 +35,14 @@ headers = {
     "x-rapidapi-key": api_key
 }
 
+# One keep-alive session for every call in this script. Retries go through send_with_retries
+# rather than urllib3, which would sleep out any Retry-After (e.g. a monthly quota reset).
+SESSION = create_session(pool_connections=4, pool_maxsize=10, total_retries=0)
+SESSION.headers.update(headers)
+
+# Responses are cached on disk for an hour; pass --refresh to call the API anyway
+REFRESH = "--refresh" in sys.argv
+
 print("Testing RapidAPI Facebook Marketplace Endpoints")
 print("=" * 70)
 print("⚠️  This will use multiple API calls - testing strategically")
@@ -57,8 +66,8 @@ params = {
 print(f"Testing with filters: {json.dumps(params, indent=2)}")
 
 try:
-    response = requests.get(f"{base_url}/search", headers=headers, params=params, timeout=30)
-    print(f"Status: {response.status_code}")
+    response = send_with_retries(lambda: cached_get(SESSION.get, f"{base_url}/search", params=params, refresh=REFRESH, timeout=30))
+    print(f"Status: {response.status_code}{' (cached)' if response.from_cache else ''}")
     remaining = response.headers.get('X-RateLimit-Requests-Remaining', 'N/A')
     print(f"Remaining requests: {remaining}")
     
@@ -83,7 +92,7 @@ test_params = {
 }
 
 try:
-    search_response = requests.get(f"{base_url}/search", headers=headers, params=test_params, timeout=30)
+    search_response = send_with_retries(lambda: cached_get(SESSION.get, f"{base_url}/search", params=test_params, refresh=REFRESH, timeout=30))
     if search_response.status_code == 200:
         search_data = search_response.json()
         if isinstance(search_data, list) and len(search_data) > 0:
@@ -92,8 +101,8 @@ try:
             
             # Now try to get detailed info
             detail_params = {"id": item_id}
-            detail_response = requests.get(f"{base_url}/product", headers=headers, params=detail_params, timeout=30)
-            print(f"Get Product By ID Status: {detail_response.status_code}")
+            detail_response = send_with_retries(lambda: cached_get(SESSION.get, f"{base_url}/product", params=detail_params, refresh=REFRESH, timeout=30))
+            print(f"Get Product By ID Status: {detail_response.status_code}{' (cached)' if detail_response.from_cache else ''}")
             remaining = detail_response.headers.get('X-RateLimit-Requests-Remaining', 'N/A')
             print(f"Remaining requests: {remaining}")
             
@@ -122,8 +131,8 @@ test_url = "https://www.facebook.com/marketplace/item/1480717813586756"  # From
 url_params = {"url": test_url}
 
 try:
-    url_response = requests.get(f"{base_url}/product/url", headers=headers, params=url_params, timeout=30)
-    print(f"Get Product By URL Status: {url_response.status_code}")
+    url_response = send_with_retries(lambda: cached_get(SESSION.get, f"{base_url}/product/url", params=url_params, refresh=REFRESH, timeout=30))
+    print(f"Get Product By URL Status: {url_response.status_code}{' (cached)' if url_response.from_cache else ''}")
     remaining = url_response.headers.get('X-RateLimit-Requests-Remaining', 'N/A')
     print(f"Remaining requests: {remaining}")
     
@@ -7,9 +7,8 @@ Tests various queries and documents response structure
 
 import os
 import sys
-import json
 import time
-from dotenv import load_dotenv
+import orjson
 import requests
 
 # Fix Unicode encoding for Windows
@@ -21,6 +20,15 @@ if sys.platform == 'win32':
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.config import load_env
+from lib.file_cache import pretty_json
+from lib.http_session import create_rate_limiter, send_with_retries
+from lib.response_cache import cached_get
+
+# Read .env/.env.local once per run rather than on every search
+_ENV = load_env()
+
+# Paces searches to 30 a minute while letting short runs go back to back
+_wait_for_request_slot = create_rate_limiter(rate=30, period=60.0, burst=5)
 
 
 def extract_city_from_location(location: str) -> str:
@@ -33,14 +41,14 @@ def extract_city_from_location(location: str) -> str:
     return city
 
 
-def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_items: int = 1):
+def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_items: int = 1, refresh: bool = False):
     """
     Test RapidAPI's Facebook Marketplace search endpoint.
     
     Uses: GET https://facebook-marketplace1.p.rapidapi.com/search
+    Responses are cached on disk for an hour unless refresh is set.
     """
-    env = load_env()
-    api_key = env.get("RAPIDAPI_KEY")
+    api_key = _ENV.get("RAPIDAPI_KEY")
     
     if not api_key:
         print("Error: RAPIDAPI_KEY not found in environment")
@@ -72,10 +80,10 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
     print(f"Max Items: {max_items}")
     print(f"\nSending request to RapidAPI...")
     print(f"URL: {url}")
-    print(f"Params: {json.dumps(params, indent=2)}")
+    print(f"Params: {pretty_json(params)}")
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = send_with_retries(lambda: cached_get(requests.get, url, params=params, refresh=refresh, headers=headers, timeout=30))
         
         # Print response details before raising
         if response.status_code != 200:
@@ -87,7 +95,7 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
         
         data = response.json()
         
-        print(f"\nResponse Status: {response.status_code}")
+        print(f"\nResponse Status: {response.status_code}{' (cached)' if response.from_cache else ''}")
         print(f"Response Type: {type(data)}")
         
         if isinstance(data, list):
@@ -98,7 +106,7 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
                 print("Sample Item Structure:")
                 print(f"{'='*70}")
                 sample = data[0]
-                print(json.dumps(sample, indent=2, ensure_ascii=False))
+                print(pretty_json(sample))
                 
                 print(f"\n{'='*70}")
                 print("Available Fields in Response:")
@@ -115,8 +123,8 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
                 # Save full response to file for analysis
                 output_file = f"data/rapidapi_test_response_{int(time.time())}.json"
                 os.makedirs("data", exist_ok=True)
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                with open(output_file, "wb") as f:
+                    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
                 print(f"\nFull response saved to: {output_file}")
             else:
                 print("\nNo items returned in response")
@@ -126,18 +134,18 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
                 items = data["data"]
                 print(f"Response has 'data' field with {len(items) if isinstance(items, list) else 'non-list'} items")
                 print(f"\nFull response structure:")
-                print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+                print(pretty_json(data)[:1000])
             elif "results" in data:
                 items = data["results"]
                 print(f"Response has 'results' field with {len(items) if isinstance(items, list) else 'non-list'} items")
                 print(f"\nFull response structure:")
-                print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+                print(pretty_json(data)[:1000])
             else:
                 print(f"\nResponse structure:")
-                print(json.dumps(data, indent=2, ensure_ascii=False))
+                print(pretty_json(data))
         else:
             print(f"\nUnexpected response format:")
-            print(json.dumps(data, indent=2, ensure_ascii=False)[:500])
+            print(pretty_json(data)[:500])
         
         return data
         
@@ -148,7 +156,7 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
             print(f"Response: {e.response.text}")
             try:
                 error_json = e.response.json()
-                print(f"Error Details: {json.dumps(error_json, indent=2)}")
+                print(f"Error Details: {pretty_json(error_json)}")
             except:
                 pass
         return None
@@ -161,8 +169,8 @@ def test_rapidapi_search(query: str, location: str = "Los Angeles, CA", max_item
 
 def main():
     """Run test queries"""
-    load_dotenv(".env")
-    load_dotenv(".env.local", override=True)
+    # Cached responses are reused for an hour; pass --refresh to call the API anyway
+    refresh = "--refresh" in sys.argv
     
     # IMPORTANT: Free tier has only 30 requests/month - use sparingly!
     # Only test ONE query to conserve API calls
@@ -177,7 +185,8 @@ def main():
     
     for query, location in test_queries:
         print(f"\n\nTesting query: {query}")
-        result = test_rapidapi_search(query, location, max_items=5)
+        _wait_for_request_slot()
+        result = test_rapidapi_search(query, location, max_items=5, refresh=refresh)
         
         if result:
             if isinstance(result, list):
@@ -187,8 +196,6 @@ def main():
         else:
             print(f"\n[FAILED] Failed to retrieve data for: {query}")
         
-        # Wait between requests to avoid rate limiting
-        time.sleep(2)
     
     print(f"\n\n{'='*70}")
     print("Test Complete!")
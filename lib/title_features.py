@@ -0,0 +1,78 @@
+"""
+Shared title feature extraction for targeted Amazon and Facebook Marketplace queries
+"""
+from typing import TypedDict, Optional, FrozenSet
+import functools
+import re
+
+# Every keyword either query builder looks for; each builder picks its own subset and order
+PRODUCT_KEYWORDS = ("boot", "shoe", "bag", "handbag", "sneaker", "wallet", "belt", "jacket", "coat")
+MATERIAL_KEYWORDS = ("leather", "suede", "canvas", "fabric")
+STYLE_KEYWORDS = ("western", "lug", "ankle", "knee")
+
+# Shoe sizes we search for ("17" or "2017" is not a size 7, "8.5" is not an 8)
+_SIZE_RE = re.compile(r'\b(7\.5|7|8|9|10|11)(?!\.\d)\b')
+# Sizes written with a label ("size 9", "sz: 10.5")
+_LABELED_SIZE_RE = re.compile(r'\b(size|sz)[\s:]*(\d+(?:\.\d+)?)')
+
+
+def _trie_pattern(words) -> str:
+    """
+    Build a regex alternation for words with shared prefixes factored out
+    ("b(?:ag|elt|oot)"), so each title position is checked against one branch per
+    character instead of every keyword. Where one word is a prefix of another the
+    longer one matches.
+    
+    Args:
+        words: Literal words to match
+    
+    Returns:
+        Regex source (no capturing groups)
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{pattern})?" if "" in node else pattern
+    
+    return build(trie)
+
+
+# Lookahead so overlapping keywords ("handbag" and "bag") are all found in one pass
+_KEYWORD_RE = re.compile("(?=(" + _trie_pattern(PRODUCT_KEYWORDS + MATERIAL_KEYWORDS + STYLE_KEYWORDS) + "))")
+
+
+class LuxuryFeatures(TypedDict):
+    keywords: FrozenSet[str]
+    size: Optional[str]
+    labeled_size: Optional[str]
+
+
+@functools.lru_cache(maxsize=4096)
+def extract_luxury_features(title: str) -> LuxuryFeatures:
+    """
+    Scan a luxury item title once for query keywords and sizes.
+    Cached per title, since the same eBay item is usually searched on both Amazon and Facebook.
+    
+    Args:
+        title: Item title (any case)
+    
+    Returns:
+        Keywords found (substring matches), first shoe size, and first labeled size
+    """
+    title = title.lower()
+    size_match = _SIZE_RE.search(title)
+    labeled_size_match = _LABELED_SIZE_RE.search(title)
+    return {
+        "keywords": frozenset(_KEYWORD_RE.findall(title)),
+        "size": size_match.group(1) if size_match else None,
+        "labeled_size": labeled_size_match.group(2) if labeled_size_match else None,
+    }
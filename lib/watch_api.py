@@ -8,7 +8,7 @@ from typing import TypedDict, Optional, Dict, Any
 import requests
 import cloudscraper
 from bs4 import BeautifulSoup
-from lib.ebay_sold_listings import get_market_price_from_sold_listings
+from lib.ebay_sold_listings import get_market_price_from_sold_listings, get_market_prices_bulk
 from lib.watch_database_api import (
     search_watches_by_name,
     search_reference,
@@ -955,6 +955,45 @@ def get_watch_reference_price(
     except Exception as e:
         print(f"  Warning: eBay sold listings search failed: {e}")
     
+    return _get_fallback_reference_price(watch_info, env, use_watchcharts)
+
+
+def get_watch_reference_prices(
+    watch_infos: list[WatchInfo],
+    env: dict[str, str],
+    use_watchcharts: bool = False
+) -> list[Optional[float]]:
+    """
+    Get reference prices for many watches, searching eBay sold listings for all of them concurrently.
+    Watches without a sold-listings price go through the same fallbacks as get_watch_reference_price.
+    
+    Args:
+        watch_infos: WatchInfo dictionaries with watch metadata
+        env: Environment variables dict
+        use_watchcharts: Whether to try WatchCharts API if available (scraping is always tried)
+    
+    Returns:
+        Reference prices in the same order as watch_infos (None where not found)
+    """
+    # Method 1: eBay sold listings (primary), one concurrent batch
+    try:
+        market_prices = get_market_prices_bulk(watch_infos, env)
+    except Exception as e:
+        print(f"  Warning: eBay sold listings search failed: {e}")
+        market_prices = [None] * len(watch_infos)
+    
+    return [
+        market_price or _get_fallback_reference_price(watch_info, env, use_watchcharts)
+        for watch_info, market_price in zip(watch_infos, market_prices)
+    ]
+
+
+def _get_fallback_reference_price(
+    watch_info: WatchInfo,
+    env: dict[str, str],
+    use_watchcharts: bool
+) -> Optional[float]:
+    """Reference price from the sources after eBay sold listings (WatchCharts, then AI)."""
     # Method 2: WatchCharts web scraping (free, always try)
     try:
         scraped_price = scrape_watchcharts_price(watch_info)
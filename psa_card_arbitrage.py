@@ -8,7 +8,7 @@ import os
 from dotenv import load_dotenv
 from lib.config import load_env
 from lib.ebay_api import search_ebay_generic, EbayItem
-from lib.psa_api import fetch_psa_cert
+from lib.psa_api import fetch_psa_cert, fetch_psa_certs
 from lib.research_agent import scrape_psa_estimate, analyze_arbitrage_opportunities
 from lib.ebay_oauth import get_oauth_token
 from lib.watch_api import extract_watch_metadata, get_watch_reference_price
@@ -129,10 +129,17 @@ def search():
         psa_checked = 0
         tax_rate = 0.09  # 9% estimated tax rate
         
-        for item in ebay_items:
-            # Try to extract cert number from title or aspects
-            cert_number = extract_cert_from_item(item)
-            
+        # Try to extract cert numbers from titles or aspects
+        cert_numbers = [extract_cert_from_item(item) for item in ebay_items]
+        
+        # Check PSA data for all certs concurrently
+        psa_certs = {}
+        if check_psa:
+            certs_to_check = [cert_number for cert_number in cert_numbers if cert_number]
+            print(f"[DEBUG] Checking {len(certs_to_check)} PSA certs")
+            psa_certs = fetch_psa_certs(certs_to_check, env)
+        
+        for item, cert_number in zip(ebay_items, cert_numbers):
             psa_data = None
             psa_estimate = None
             spread = None
@@ -140,8 +147,7 @@ def search():
             is_undervalued = False
             
             if check_psa and cert_number:
-                print(f"[DEBUG] Checking PSA cert: {cert_number}")
-                psa_data = fetch_psa_cert(cert_number, env)
+                psa_data = psa_certs[cert_number]
                 psa_checked += 1
                 
                 # Scrape PSA estimated value (not available in API, need to scrape)
@@ -409,13 +415,13 @@ def discover_card_types():
                     filters="buyingOptions:{FIXED_PRICE}"
                 )
                 
-                # Check PSA data for each item
-                for item in ebay_items:
-                    cert_number = extract_cert_from_item(item)
-                    
+                # Check PSA data for each item (all certs concurrently)
+                cert_numbers = [extract_cert_from_item(item) for item in ebay_items]
+                psa_certs = fetch_psa_certs([cert_number for cert_number in cert_numbers if cert_number], env)
+                
+                for item, cert_number in zip(ebay_items, cert_numbers):
                     if cert_number:
-                        print(f"[DEBUG] Checking PSA cert: {cert_number}")
-                        psa_data = fetch_psa_cert(cert_number, env)
+                        psa_data = psa_certs[cert_number]
                         discovered_types['total_cards_checked'] += 1
                         
                         if psa_data.get('grade'):
@@ -24,7 +24,7 @@ from lib.ebay_api import search_ebay_generic
 from lib.watch_api import (
     extract_watch_metadata,
     enrich_watch_metadata_with_watch_db,
-    get_watch_reference_price,
+    get_watch_reference_prices,
     get_watch_retail_price,
     get_watchcharts_url
 )
@@ -156,33 +156,34 @@ def analyze_watch_arbitrage(
     openrouter_key = env.get("OPENROUTER_API_KEY", "")
     use_watchcharts = bool(env.get("WATCHCHARTS_API_KEY", ""))
     
-    for item in items:
+    # Get watch info
+    watch_infos = [
+        item.get("watch_info") or {
+            "brand": item.get("brand"),
+            "model": item.get("model"),
+            "model_number": item.get("model_number"),
+            "title": item.get("title"),
+        }
+        for item in items
+    ]
+    
+    # Get market prices (current market value), searching sold listings for all watches at once
+    print(f"  Looking up market prices for {len(items)} watches...")
+    reference_prices = get_watch_reference_prices(
+        watch_infos=watch_infos,
+        env=env,
+        use_watchcharts=use_watchcharts
+    )
+    
+    for item, watch_info, reference_price in zip(items, watch_infos, reference_prices):
         price = item["price"]
         shipping = item["shipping"]
         est_tax = round(tax_rate * price, 2)
         all_in_cost = price + shipping + est_tax
         
-        # Get watch info
-        watch_info = item.get("watch_info", {})
-        if not watch_info:
-            watch_info = {
-                "brand": item.get("brand"),
-                "model": item.get("model"),
-                "model_number": item.get("model_number"),
-                "title": item.get("title"),
-            }
-        
-        # Get reference prices (market and retail)
         title_safe = item['title'][:60].encode('ascii', 'ignore').decode('ascii')
         print(f"  Looking up prices for: {title_safe}...")
         
-        # Get market price (current market value)
-        reference_price = get_watch_reference_price(
-            watch_info=watch_info,
-            env=env,
-            use_watchcharts=use_watchcharts
-        )
-        
         if reference_price:
             print(f"    Found market price: ${reference_price:.2f}")
         else: